@@ -9,9 +9,11 @@ from src.utils.base.libraries import (
     FastAPI,
     Request
 )
-from .routers import users_router, packages_router
+from .routers import users_router, packages_router, health_router
+from src.utils.http import CompressionMiddleware, AdmissionControlMiddleware
 from src.utils.models import All_Exceptions
 from src.database import lifespan
+from src import tasks  # Registers the background job handlers
 
 
 # Initialization
@@ -27,6 +29,21 @@ app = FastAPI(
     lifespan=lifespan
 )
 
+# Shed load before the pools are exhausted (added first so CORS headers still wrap the 503s)
+app.add_middleware(
+    AdmissionControlMiddleware,
+    route_classes=(
+        (r"/health/(live|ready)", "critical"),
+        (r"/users/(login|logout|validate-session)", "critical"),
+        (r"/packages/versioned/[^/]+/download", "critical"),
+        (r"/packages/base/search", "low"),
+        (r"/packages/(base|versioned)/filter", "low"),
+        (r"/packages/changes", "low"),
+        (r"/packages/export", "low"),
+        (r"/packages/versioned-all", "low")
+    )
+)
+
 # Add CROCS middle ware to allow cross origin requests
 app.add_middleware(
     CORSMiddleware,
@@ -41,15 +58,28 @@ app.add_middleware(
     allow_headers=["*"]
 )
 
+# Compress large listing and index payloads (only the allow-listed routes)
+app.add_middleware(
+    CompressionMiddleware,
+    allowed_paths=(
+        r"/packages/base/search",
+        r"/packages/versioned-all",
+        r"/packages/changes",
+        r"/packages/(base|versioned)/[^/]+"
+    )
+)
+
 # Exception handler for wrong input
 @app.exception_handler(All_Exceptions)
 async def input_data_exception_handler(request: Request, exc: All_Exceptions):
     return JSONResponse(
         status_code=exc.status_code,
-        content={"message": f"Oops! {exc.message}"}
+        content={"message": f"Oops! {exc.message}"},
+        headers=exc.headers
     )
 
 
 #    Endpoints    #
 app.include_router(router=users_router, prefix="/users")
 app.include_router(router=packages_router, prefix="/packages")
+app.include_router(router=health_router, prefix="/health")
@@ -4,6 +4,7 @@ All Routers are imported here and are exposed to the main app file
 
 from .users import router as users_router
 from .packages import router as packages_router
+from .health import router as health_router
 
 
 __version__ = "v1.0.0-phoenix-release"
@@ -12,11 +13,13 @@ __version__ = "v1.0.0-phoenix-release"
 __annotations__ = {
     "version": __version__,
     "users_router": "Users router for handling user-related endpoints",
-    "packages_router": "Packages router for handling package-related endpoints"
+    "packages_router": "Packages router for handling package-related endpoints",
+    "health_router": "Health router for the liveness and readiness endpoints"
 }
 
 
 __all__ = [
     "users_router",
-    "packages_router"
+    "packages_router",
+    "health_router"
 ]
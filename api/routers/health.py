@@ -0,0 +1,48 @@
+"""
+Health API Router
+This module contains the liveness and readiness endpoints polled by the load balancer and the container runtime.
+"""
+
+from src.utils.base.libraries import (
+    JSONResponse,
+    APIRouter,
+    status
+)
+from src.database import health_report
+from src.utils.http import admission_controller
+
+
+# Router
+router = APIRouter()
+
+# Health checks must never be cached by a proxy
+NO_STORE = {"Cache-Control": "no-store"}
+
+
+# Liveness
+@router.get("/live", response_class=JSONResponse, tags=["Health"], summary="Check that the worker is alive")
+async def liveness() -> JSONResponse:
+    """
+    Answers as long as the event loop of the worker runs (no database or cache call)
+    """
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={"status": "alive"},
+        headers=NO_STORE
+    )
+
+
+# Readiness
+@router.get("/ready", response_class=JSONResponse, tags=["Health"], summary="Check that the worker can take traffic")
+async def readiness() -> JSONResponse:
+    """
+    Ready once the pools are open and warmed up, with the pool, cache and admission control status
+    """
+    ready, report = health_report()
+    report["admission"] = admission_controller.stats()
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK if ready else status.HTTP_503_SERVICE_UNAVAILABLE,
+        content=report,
+        headers=NO_STORE
+    )
@@ -5,21 +5,63 @@ This module contains the API endpoints for user management, including user regis
 
 from src.utils.base.libraries import (
     JSONResponse,
+    FileResponse,
+    StreamingResponse,
+    Response,
     UploadFile,
     APIRouter,
+    Optional,
     Request,
+    mimetypes,
+    os,
+    base64,
     status
 )
 from src.database import (
     PostgresDep,
+    PostgresPoolDep,
+    get_api_key_details,
     create_base_package,
     get_base_package_details_by_id,
     search_base_packages,
+    parse_metadata_filter,
+    filter_base_packages,
+    filter_versioned_packages,
+    get_owned_base_package_id,
     create_versioned_package,
     get_versioned_package_details,
-    get_all_versioned_packages
+    get_all_versioned_packages,
+    get_package_file_content,
+    get_package_changes,
+    open_catalog_export,
+    download_counter,
+    get_version_download_counts,
+    get_base_download_counts,
+    refresh_package_scores_after_publish
 )
-from src.utils.models import BasePackageForm
+from src.utils.http import (
+    BASE_PACKAGE_POLICY,
+    VERSIONED_PACKAGE_POLICY,
+    PACKAGE_LISTING_POLICY,
+    PACKAGE_SEARCH_POLICY,
+    PACKAGE_CHANGES_POLICY,
+    conditional_headers,
+    conditional_json_response,
+    make_etag,
+    negotiate_encoding
+)
+from src.utils.packages import (
+    inspect_package,
+    package_index_path,
+    seekable_upload_path,
+    save_upload,
+    store_package_file,
+    read_package_file,
+    locate_package_archive,
+    remove_file
+)
+from src.utils.base.constants import PACKAGE_FILE_CACHE_MAX_SIZE
+from src.utils.models import BasePackageForm, All_Exceptions
 from src.main import CurrentUser
 
 
@@ -34,7 +76,7 @@ async def create_new_base_package(data: BasePackageForm, user: CurrentUser, PgDB
     Create a new base package
     """
     # Create the base package in the database
-    await create_base_package(
+    base_package_id = await create_base_package(
         db_session=PgDB,
         user_id=str(user["id"]),
         package_name=data.package_name,
@@ -44,22 +86,16 @@ async def create_new_base_package(data: BasePackageForm, user: CurrentUser, PgDB
 
     return JSONResponse(
         status_code=status.HTTP_201_CREATED,
-        content={"message": "Base package created successfully"}
+        content={"message": "Base package created successfully", "id": base_package_id}
     )
 
 
 # Create a new versioned package
 @router.post("/versioned/upload", response_class=JSONResponse, tags=["Packages"], summary="Create a new versioned package")
-async def create_new_versioned_package(request: Request, file: UploadFile, PgDB: PostgresDep) -> JSONResponse:
+async def create_new_versioned_package(request: Request, file: UploadFile, PgPool: PostgresPoolDep) -> JSONResponse:
     """
-    Create a new versioned package
+    Create a new versioned package from an uploaded `.tar.gz` archive (with `nikl.json` at its root)
     """
-    # TODO: Implement the logic for creating a new versioned package
-    # Accept a file upload along with X-API-Key
-    # Extract the file and get the metadata
-    # Parse it properly and create the versioned package
-    # Store the file in the file system
-
     # Header of X-API-Key is expected to be present in the request
     api_key = request.headers.get("X-API-Key")
     if not api_key:
@@ -67,82 +103,284 @@ async def create_new_versioned_package(request: Request, file: UploadFile, PgDB:
             status_code=status.HTTP_400_BAD_REQUEST,
             content={"message": "API key is required"}
         )
-    
-    # TODO: Base package is assumed to be created already (do a check)
 
-    api_key = api_key.strip()
-    user = {"id": api_key}  # Simulating user retrieval based on API key
+    # No pool connection is held while the archive is received and inspected
+    async with PgPool.get_connection() as PgDB:
+        api_key_details = await get_api_key_details(db_session=PgDB, api_key=api_key.strip())
+    user_id = str(api_key_details["user_id"])
 
-    await create_versioned_package(
-        db_session=PgDB,
-        user_id=str(user["id"]),
-        base_package_id="example_base_package_id",
-        version="1.0.0",
-        file_path="path/to/file",
-        metadata={"example_key": "example_value"}
-    )
+    archive_path = await save_upload(upload=file)
+    seekable_path = seekable_upload_path(archive_path)
+    try:
+        # Validated, described and recompressed as a seekable copy in the inspection process pool (off the event loop)
+        inspection = await inspect_package(archive_path=archive_path, output_path=seekable_path)
+        seek_index = inspection.pop("seek_index")
+        manifest = inspection["manifest"]
+        file_path = package_index_path(package_name=manifest["name"], version=manifest["version"])
+
+        async with PgPool.get_connection() as PgDB:
+            async with PgDB.transaction():
+                base_package_id = await get_owned_base_package_id(db_session=PgDB, package_name=manifest["name"], user_id=user_id)
+                versioned_package_id = await create_versioned_package(
+                    db_session=PgDB,
+                    user_id=user_id,
+                    base_package_id=base_package_id,
+                    version=manifest["version"],
+                    file_path=file_path,
+                    metadata=inspection
+                )
+                # The new version counts in the popularity scores once this job ran (queued with the version)
+                await refresh_package_scores_after_publish(db_session=PgDB)
+                # Moved into the index last, the row is rolled back if it fails
+                await store_package_file(source_path=archive_path, index_path=file_path, seekable_path=seekable_path, seek_index=seek_index)
+    finally:
+        await remove_file(archive_path)
+        await remove_file(seekable_path)
 
     return JSONResponse(
-        status_code=status.HTTP_501_NOT_IMPLEMENTED,
-        content={"message": "This endpoint is not implemented yet"}
+        status_code=status.HTTP_201_CREATED,
+        content={
+            "message": "Versioned package created successfully",
+            "id": versioned_package_id,
+            "version": manifest["version"],
+            "sha256": inspection["sha256"]
+        }
+    )
+
+
+# Changes of the catalog since a sequence number
+@router.get("/changes", response_class=JSONResponse, tags=["Packages"], summary="Get the catalog changes since a sequence number")
+async def get_package_changes_endpoint(request: Request, PgPool: PostgresPoolDep, since: int = 0, limit: int = 100) -> JSONResponse:
+    """
+    Get the changes of the catalog (new base packages and versions) after `since`, in order
+    Start with `since=0` and pass `next_since` back until `has_more` is false, then poll with the last `next_since`
+    """
+    changes = await get_package_changes(db_pool=PgPool, since=since, limit=limit)
+
+    # ETag of the body, an up to date mirror polling with If-None-Match gets a 304
+    return conditional_json_response(
+        request=request,
+        content=changes,
+        policy=PACKAGE_CHANGES_POLICY
+    )
+
+
+# Export the whole catalog
+@router.get("/export", response_class=StreamingResponse, tags=["Packages"], summary="Export the catalog as NDJSON")
+async def export_catalog(request: Request, PgPool: PostgresPoolDep) -> StreamingResponse:
+    """
+    Export every base package with its versions, one JSON object per line (gzip when accepted by the client)
+    """
+    compress = negotiate_encoding(request.headers.get("accept-encoding", ""), available=("gzip",)) == "gzip"
+    # Slot and connection held before the headers are sent (a busy worker or pool is still a 503)
+    stream = await open_catalog_export(db_pool=PgPool, compress=compress)
+
+    headers = {"Cache-Control": "no-store", "Content-Disposition": 'attachment; filename="nikl-packages.ndjson"', "Vary": "Accept-Encoding"}
+    if compress:
+        headers["Content-Encoding"] = "gzip"
+
+    return StreamingResponse(
+        stream,
+        media_type="application/x-ndjson",
+        headers=headers
+    )
+
+
+# Search base packages
+@router.get("/base/search", response_class=JSONResponse, tags=["Packages"], summary="Search base packages")
+async def search_base_packages_endpoint(request: Request, query: str, PgPool: PostgresPoolDep, page: int = 1, limit: int = 10, fields: Optional[str] = None, sort: str = "relevance") -> JSONResponse:
+    """
+    Search base packages by query, `sort` is `relevance` (default), `popularity` or `recent`
+    """
+    # Search for base packages in the database (results cached with stale-while-revalidate)
+    packages, total_count = await search_base_packages(db_pool=PgPool, search_query=query, page=page, page_size=limit, fields=fields, sort=sort)
+
+    return conditional_json_response(
+        request=request,
+        content={"packages": packages, "total_count": total_count, "total_pages": (total_count + limit - 1) // limit},
+        policy=PACKAGE_SEARCH_POLICY
+    )
+
+
+# Filter base packages by metadata
+@router.get("/base/filter", response_class=JSONResponse, tags=["Packages"], summary="Filter base packages by metadata")
+async def filter_base_packages_endpoint(
+    request: Request,
+    PgPool: PostgresPoolDep,
+    contains: Optional[str] = None,
+    has: Optional[str] = None,
+    query: Optional[str] = None,
+    page: int = 1,
+    limit: int = 10,
+    fields: Optional[str] = None
+) -> JSONResponse:
+    """
+    Filter base packages by metadata: `contains` is a JSON object the metadata must contain (e.g. `{"license": "MIT"}`),
+    `has` lists top level keys it must have (e.g. `repository,website`), `query` narrows it like the search
+    """
+    contains_value, has_keys = parse_metadata_filter(contains=contains, has=has)
+    packages, total_count = await filter_base_packages(db_pool=PgPool, contains=contains_value, has=has_keys, search_query=query, page=page, page_size=limit, fields=fields)
+
+    return conditional_json_response(
+        request=request,
+        content={"packages": packages, "total_count": total_count, "total_pages": (total_count + limit - 1) // limit},
+        policy=PACKAGE_SEARCH_POLICY
     )
 
 
 # Get base package details by ID
 @router.get("/base/{package_id}", response_class=JSONResponse, tags=["Packages"], summary="Get base package details by ID")
-async def get_base_package_details(package_id: str, PgDB: PostgresDep) -> JSONResponse:
+async def get_base_package_details(request: Request, package_id: str, PgPool: PostgresPoolDep, fields: Optional[str] = None) -> JSONResponse:
     """
     Get base package details by ID
     """
-    # Fetch the base package details from the database
-    package_details = await get_base_package_details_by_id(db_session=PgDB, package_id=package_id)
+    # Fetch the base package details from the database (identical concurrent lookups share one query)
+    package_details = await get_base_package_details_by_id(db_pool=PgPool, package_id=package_id, fields=fields)
+    if fields is None:
+        package_details = {**package_details, "downloads": await get_base_download_counts(db_pool=PgPool, base_package_id=package_id)}
 
-    return JSONResponse(
-        status_code=status.HTTP_200_OK,
-        content=package_details
+    return conditional_json_response(
+        request=request,
+        content=package_details,
+        policy=BASE_PACKAGE_POLICY
     )
 
 
-# Search base packages
-@router.get("/base/search", response_class=JSONResponse, tags=["Packages"], summary="Search base packages")
-async def search_base_packages_endpoint(query: str, PgDB: PostgresDep, page: int = 1, limit: int = 10) -> JSONResponse:
+# Filter versioned packages by metadata
+@router.get("/versioned/filter", response_class=JSONResponse, tags=["Packages"], summary="Filter versioned packages by metadata")
+async def filter_versioned_packages_endpoint(
+    request: Request,
+    PgPool: PostgresPoolDep,
+    contains: Optional[str] = None,
+    has: Optional[str] = None,
+    base_package_id: Optional[str] = None,
+    page: int = 1,
+    limit: int = 10,
+    fields: Optional[str] = None
+) -> JSONResponse:
     """
-    Search base packages by query
+    Filter versioned packages by metadata (e.g. `contains={"manifest": {"license": "MIT"}}`), optionally of one base package
     """
-    # Search for base packages in the database
-    packages, total_count = await search_base_packages(db_session=PgDB, search_query=query, page=page, page_size=limit)
+    contains_value, has_keys = parse_metadata_filter(contains=contains, has=has)
+    packages, total_count = await filter_versioned_packages(db_pool=PgPool, contains=contains_value, has=has_keys, base_package_id=base_package_id, page=page, page_size=limit, fields=fields)
 
-    return JSONResponse(
-        status_code=status.HTTP_200_OK,
-        content={"packages": packages, "total_count": total_count, "total_pages": (total_count + limit - 1) // limit}
+    return conditional_json_response(
+        request=request,
+        content={"packages": packages, "total_count": total_count, "total_pages": (total_count + limit - 1) // limit},
+        policy=PACKAGE_LISTING_POLICY
     )
 
 
 # Get versioned package details
 @router.get("/versioned/{package_id}", response_class=JSONResponse, tags=["Packages"], summary="Get versioned package details by ID")
-async def get_versioned_package_details_endpoint(package_id: str, PgDB: PostgresDep) -> JSONResponse:
+async def get_versioned_package_details_endpoint(request: Request, package_id: str, PgPool: PostgresPoolDep, fields: Optional[str] = None) -> JSONResponse:
     """
     Get versioned package details by ID
     """
-    # Fetch the versioned package details from the database
-    package_details = await get_versioned_package_details(db_session=PgDB, package_id=package_id)
+    # Fetch the versioned package details from the database (identical concurrent lookups share one query)
+    package_details = await get_versioned_package_details(db_pool=PgPool, package_id=package_id, fields=fields)
+    downloads = None
+    if fields is None:
+        downloads = await get_version_download_counts(db_pool=PgPool, versioned_package_id=package_id)
+        package_details = {**package_details, "downloads": downloads}
 
-    return JSONResponse(
-        status_code=status.HTTP_200_OK,
-        content=package_details
+    # Published versions are immutable, so the ID, the projection and the download counts identify the representation
+    return conditional_json_response(
+        request=request,
+        content=package_details,
+        policy=VERSIONED_PACKAGE_POLICY,
+        last_modified=package_details.get("created_at"),
+        validator=("versioned", package_id, fields, downloads)
+    )
+
+
+# Media types served as they are, other text files are served as plain text (never rendered by a browser)
+FILE_MEDIA_TYPES = {"application/json", "image/png", "image/jpeg", "image/gif", "image/webp"}
+
+
+# Get a single file of a versioned package
+@router.get("/versioned/{package_id}/files/{file_path:path}", response_class=Response, tags=["Packages"], summary="Get a file of a versioned package")
+async def get_versioned_package_file(request: Request, package_id: str, file_path: str, PgPool: PostgresPoolDep) -> Response:
+    """
+    Get a single file (e.g. `README.md`, `nikl.json`) of a versioned package without downloading the archive
+    """
+    # Same cached lookup as the details route, the archive metadata lists every file with its hash
+    package_details = await get_versioned_package_details(db_pool=PgPool, package_id=package_id)
+    file_entry = next((entry for entry in (package_details.get("metadata") or {}).get("files", ()) if entry["path"] == file_path), None)
+    if file_entry is None:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": f"File {file_path} does not exist in this package version"}
+        )
+
+    # Published files never change, so the content hash validates them before anything is read
+    headers, not_modified = conditional_headers(
+        request=request,
+        etag=f'"{file_entry["sha256"]}"',
+        policy=VERSIONED_PACKAGE_POLICY,
+        last_modified=package_details.get("created_at")
+    )
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    # Inflated from the nearest restart point of the archive, small files are cached in Memcached
+    if file_entry["size"] <= PACKAGE_FILE_CACHE_MAX_SIZE:
+        content = base64.b64decode(await get_package_file_content(index_path=package_details["file_path"], member_path=file_path))
+    else:
+        content = await read_package_file(index_path=package_details["file_path"], member_path=file_path)
+
+    media_type = mimetypes.guess_type(file_path)[0]
+    if media_type not in FILE_MEDIA_TYPES:
+        media_type = "text/plain; charset=utf-8" if (media_type or "text/").startswith("text/") else "application/octet-stream"
+    headers["X-Content-Type-Options"] = "nosniff"
+
+    return Response(status_code=status.HTTP_200_OK, content=content, media_type=media_type, headers=headers)
+
+
+# Download the archive of a versioned package
+@router.get("/versioned/{package_id}/download", response_class=FileResponse, tags=["Packages"], summary="Download a versioned package")
+async def download_versioned_package(request: Request, package_id: str, PgPool: PostgresPoolDep) -> Response:
+    """
+    Download the archive (`.tar.gz`) of a versioned package
+    """
+    package_details = await get_versioned_package_details(db_pool=PgPool, package_id=package_id)
+
+    # Published archives never change, the archive hash validates them (a revalidation is not a download)
+    sha256 = (package_details.get("metadata") or {}).get("sha256")
+    headers, not_modified = conditional_headers(
+        request=request,
+        etag=f'"{sha256}"' if sha256 else make_etag("download", package_id),
+        policy=VERSIONED_PACKAGE_POLICY,
+        last_modified=package_details.get("created_at")
+    )
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    archive_path = await locate_package_archive(index_path=package_details["file_path"])
+
+    # Counted in Memcached and flushed into PostgreSQL in batches, no database write per download
+    await download_counter.record(package_id)
+
+    index_path = package_details["file_path"]
+    return FileResponse(
+        path=archive_path,
+        media_type="application/gzip",
+        filename=f"{os.path.basename(os.path.dirname(index_path))}-{os.path.basename(index_path)}",
+        headers=headers
     )
 
 
 # Get all versioned packages
 @router.get("/versioned-all", response_class=JSONResponse, tags=["Packages"], summary="Get all versioned packages")
-async def get_all_versioned_packages_endpoint(base_package_id: str, PgDB: PostgresDep, page: int = 1, limit: int = 10) -> JSONResponse:
+async def get_all_versioned_packages_endpoint(request: Request, base_package_id: str, PgPool: PostgresPoolDep, page: int = 1, limit: int = 10, fields: Optional[str] = None) -> JSONResponse:
     """
     Get all versioned packages with pagination
     """
-    # Fetch all versioned packages from the database
-    packages, total_count = await get_all_versioned_packages(db_session=PgDB, base_package_id=base_package_id, page=page, page_size=limit)
+    # Fetch all versioned packages from the database (identical concurrent lookups share one query)
+    packages, total_count = await get_all_versioned_packages(db_pool=PgPool, base_package_id=base_package_id, page=page, page_size=limit, fields=fields)
 
-    return JSONResponse(
-        status_code=status.HTTP_200_OK,
-        content={"packages": packages, "total_count": total_count, "total_pages": (total_count + limit - 1) // limit}
+    return conditional_json_response(
+        request=request,
+        content={"packages": packages, "total_count": total_count, "total_pages": (total_count + limit - 1) // limit},
+        policy=PACKAGE_LISTING_POLICY
     )
@@ -4,7 +4,6 @@ This module contains the API endpoints for user management, including user regis
 """
 
 from src.utils.base.libraries import (
-    BackgroundTasks,
     JSONResponse,
     APIRouter,
     requests,
@@ -13,7 +12,6 @@ from src.utils.base.libraries import (
     base64,
     status,
     uuid,
-    json,
     logging
 )
 from src.database import (
@@ -27,9 +25,14 @@ from src.database import (
     create_api_key_for_user,
     list_api_keys_for_user,
     edit_api_key_details_by_id,
-    delete_api_key_by_id
+    delete_api_key_by_id,
+    create_user_session,
+    delete_user_session,
+    invalidate_all_user_sessions,
+    list_user_sessions,
+    find_session_id_by_reference
 )
-from src.utils.base.constants import MAX_AGE_OF_CACHE, HCAPTCHA_SECRET_KEY
+from src.utils.base.constants import MAX_AGE_OF_CACHE, SESSION_IDLE_TIMEOUT, HCAPTCHA_SECRET_KEY, BCRYPT_ROUNDS
 from src.utils.models import UserRegForm, UserLoginForm, ApiKeyForm
 from src.main import CurrentUser
 
@@ -65,9 +68,10 @@ def _verify_hcaptcha(remoteip: str, token: str) -> bool:
         return False
 
 
-def _hash_password(password: str) -> str:
+def _hash_password(password: str, rounds: int = BCRYPT_ROUNDS) -> str:
     """
     Hash the base64 encoded password using a secure hashing algorithm
+    rounds: bcrypt cost factor (log2 of the iterations)
     """
     if not password:
         raise ValueError("Password cannot be empty")
@@ -85,12 +89,12 @@ def _hash_password(password: str) -> str:
     # Convert password from Base64 to bytes
     password_bytes = base64.b64decode(s=password)
 
-    return bcrypt.hashpw(password=password_bytes, salt=bcrypt.gensalt()).decode("utf-8")
+    return bcrypt.hashpw(password=password_bytes, salt=bcrypt.gensalt(rounds=rounds)).decode("utf-8")
 
 
 # Create a new user
 @router.post("/register", response_class=JSONResponse, tags=["Users", "Auth"], summary="Create a new user")
-async def create_user(request: Request, data: UserRegForm, bg_task: BackgroundTasks, PgDB: PostgresDep) -> JSONResponse:
+async def create_user(request: Request, data: UserRegForm, PgDB: PostgresDep) -> JSONResponse:
     """
     Create a new user
     """
@@ -112,8 +116,6 @@ async def create_user(request: Request, data: UserRegForm, bg_task: BackgroundTa
         }
     )
 
-    # TODO: Background task to send email verification
-
     return JSONResponse(
         status_code=status.HTTP_201_CREATED,
         content={"message": "User created successfully, please check your email for verification instructions"}
@@ -153,18 +155,17 @@ async def login_user(request: Request, data: UserLoginForm, CacheDB: MemcachedDe
     # Create a new session ID and CSRF token
     session_id, csrf_token = str(uuid.uuid4()), str(uuid.uuid4())
 
-    # Store user session in cache
-    await CacheDB.set(
-        key=session_id.encode("utf-8"),
-        value=json.dumps({
-            "id": str(user["id"]),
-            "user_name": user["user_name"],
-            "email": user["email"],
-            "csrf_token": csrf_token,
-            "is_active": user["is_active"],
-            "created_at": user["created_at"].isoformat()  # Store created_at as ISO format string
-        }).encode("utf-8"),
-        exptime=600  # Set session expiration time (10 minutes)
+    # Store user session in cache (and in the per-user session index)
+    session_cookie = await create_user_session(
+        cache_session=CacheDB,
+        session_id=session_id,
+        user=user,
+        csrf_token=csrf_token,
+        client_info={
+            "ip_address": request.client.host if request.client else None,
+            "user_agent": request.headers.get("User-Agent")
+        },
+        exptime=SESSION_IDLE_TIMEOUT  # Sliding expiration, extended while the session is in use
     )
 
     # Set the session ID and CSRF token in the response cookies
@@ -175,7 +176,7 @@ async def login_user(request: Request, data: UserLoginForm, CacheDB: MemcachedDe
 
     response.set_cookie(
         key="SESSION_ID",
-        value=session_id,
+        value=session_cookie,
         max_age=MAX_AGE_OF_CACHE,
         httponly=True,
         secure=True,
@@ -224,8 +225,8 @@ async def logout_user(user: CurrentUser, CacheDB: MemcachedDep) -> JSONResponse:
     """
     Logout user
     """
-    # Invalidate the session by deleting it from the cache
-    await CacheDB.delete(key=str(user["id"]).encode("utf-8"))
+    # Invalidate the current session by deleting it from the cache
+    await delete_user_session(cache_session=CacheDB, user_id=str(user["id"]), session_id=user["session_id"])
 
     # Clear cookies in the response
     response = JSONResponse(
@@ -251,6 +252,78 @@ async def logout_user(user: CurrentUser, CacheDB: MemcachedDep) -> JSONResponse:
     return response
 
 
+# List active sessions
+@router.get("/sessions", response_class=JSONResponse, tags=["Users", "Auth"], summary="List active sessions")
+async def list_active_sessions(user: CurrentUser, CacheDB: MemcachedDep) -> JSONResponse:
+    """
+    List active sessions of the user
+    """
+    sessions = await list_user_sessions(cache_session=CacheDB, user_id=str(user["id"]), current_session_id=user["session_id"])
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "message": "Active sessions retrieved successfully",
+            "sessions": sessions
+        }
+    )
+
+
+# Logout from all sessions
+@router.delete("/sessions", response_class=JSONResponse, tags=["Users", "Auth"], summary="Logout from all sessions")
+async def logout_all_sessions(user: CurrentUser, CacheDB: MemcachedDep) -> JSONResponse:
+    """
+    Logout user everywhere (invalidates every session, including the current one)
+    """
+    await invalidate_all_user_sessions(cache_session=CacheDB, user_id=str(user["id"]))
+
+    response = JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={"message": "Logged out from all sessions successfully"}
+    )
+
+    response.delete_cookie(
+        key="SESSION_ID",
+        httponly=True,
+        secure=True,
+        samesite="strict",
+        domain=".nekonik.com"
+    )
+    response.delete_cookie(
+        key="IS_SESSION_VALID",
+        httponly=False,
+        secure=True,
+        samesite="strict",
+        domain=".nekonik.com"
+    )
+
+    return response
+
+
+# Revoke a single session
+@router.delete("/sessions/{session_ref}", response_class=JSONResponse, tags=["Users", "Auth"], summary="Revoke a session")
+async def revoke_session(user: CurrentUser, session_ref: str, CacheDB: MemcachedDep) -> JSONResponse:
+    """
+    Revoke one of the user sessions by its reference (as listed in `/sessions`)
+    """
+    session_id = await find_session_id_by_reference(cache_session=CacheDB, user_id=str(user["id"]), session_ref=session_ref)
+    if not session_id:
+        return JSONResponse(
+            status_code=status.HTTP_404_NOT_FOUND,
+            content={"message": "Session not found"}
+        )
+
+    await delete_user_session(cache_session=CacheDB, user_id=str(user["id"]), session_id=session_id)
+
+    return JSONResponse(
+        status_code=status.HTTP_200_OK,
+        content={
+            "message": "Session revoked successfully",
+            "session_ref": session_ref
+        }
+    )
+
+
 # Get user profile details
 @router.get("/profile", response_class=JSONResponse, tags=["Users", "Profile"], summary="Get user profile details")
 async def get_user_profile_details(user: CurrentUser, PgDB: PostgresDep) -> JSONResponse:
@@ -298,8 +371,8 @@ async def delete_user_account(user: CurrentUser, CacheDB: MemcachedDep, PgDB: Po
     # Delete user from the database
     await delete_user_by_id(db_session=PgDB, user_id=str(user["id"]))
 
-    # Invalidate the session by deleting it from the cache
-    await CacheDB.delete(key=str(user["id"]).encode("utf-8"))
+    # Invalidate every session of the user at once
+    await invalidate_all_user_sessions(cache_session=CacheDB, user_id=str(user["id"]))
 
     # Clear cookies in the response
     response = JSONResponse(
@@ -0,0 +1,20 @@
+"""
+Gunicorn worker classes of the API (`-k` in `scripts/entry_point.sh`)
+Loaded by the gunicorn master before the app, so only uvicorn is imported here
+"""
+
+from uvicorn.workers import UvicornWorker
+
+
+class ProductionUvicornWorker(UvicornWorker):
+    """
+    Uvicorn worker pinned to the uvloop event loop and the httptools HTTP parser
+    Fails at boot when they are not installed instead of silently falling back to asyncio / h11,
+    and a failing lifespan (database unreachable) stops the worker instead of serving errors
+    """
+    CONFIG_KWARGS = {
+        "loop": "uvloop",
+        "http": "httptools",
+        "lifespan": "on",
+        "server_header": False
+    }
@@ -0,0 +1,3 @@
+"""
+Benchmarks of the API (load tests and micro-benchmarks), see `benchmarks/README.md`
+"""
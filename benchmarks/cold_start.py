@@ -0,0 +1,193 @@
+"""
+Cold start benchmark of a worker: process start to first served request
+Every run starts a fresh interpreter, so nothing is cached in memory between runs.
+
+Modes:
+- inprocess: The child process imports `api.main`, runs the lifespan (fake or local backends, see
+  `benchmarks/load_test.py`) and serves one request through an ASGI transport. The time is split in
+  interpreter start, imports, lifespan and first request.
+- server: Runs `--command` (e.g. a gunicorn / uvicorn command line) and polls `--url` until it answers.
+- importtime: Runs `python -X importtime -c "import api.main"` and prints the import time per top level package.
+
+Usage:
+    python -m benchmarks.cold_start --runs 10
+    python -m benchmarks.cold_start --mode server --command "uvicorn api.main:app --port 8686" --url http://127.0.0.1:8686/docs
+    python -m benchmarks.cold_start --mode importtime --top 25
+"""
+
+import argparse
+import json
+import os
+import shlex
+import statistics
+import subprocess
+import sys
+import time
+import urllib.error
+import urllib.request
+
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PHASES = ("interpreter_s", "import_s", "lifespan_s", "first_request_s", "total_s")
+
+# Runs in the child interpreter, prints its timings as JSON on the last line
+CHILD_CODE = """
+import time, os, sys, json, asyncio
+entered_at = time.time()
+sys.path.insert(0, os.getcwd())
+from benchmarks.load_test import parse_args, prepare_environment, build_seed, install_fake_backend
+
+args = parse_args(["--users", "1", "--packages", "5", "--versions", "1", "--bcrypt-rounds", "4", "--db-latency", "0", "--cache-latency", "0"])
+prepare_environment(args)
+
+import_started_at = time.perf_counter()
+from api.main import app
+import_seconds = time.perf_counter() - import_started_at
+
+seed = build_seed(args)
+if os.environ["COLD_START_BACKEND"] == "fake":
+    install_fake_backend(args, seed)
+
+async def main():
+    import httpx
+    started_at = time.perf_counter()
+    async with app.router.lifespan_context(app):
+        lifespan_seconds = time.perf_counter() - started_at
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://cold-start") as client:
+            request_started_at = time.perf_counter()
+            response = await client.get(f"/packages/base/{seed['base_packages'][0]['id']}")
+            first_request_seconds = time.perf_counter() - request_started_at
+    return lifespan_seconds, first_request_seconds, response.status_code
+
+lifespan_seconds, first_request_seconds, status_code = asyncio.run(main())
+print(json.dumps({
+    "interpreter_s": entered_at - float(os.environ["COLD_START_SPAWNED_AT"]),
+    "import_s": import_seconds,
+    "lifespan_s": lifespan_seconds,
+    "first_request_s": first_request_seconds,
+    "total_s": time.time() - float(os.environ["COLD_START_SPAWNED_AT"]),
+    "status_code": status_code
+}))
+"""
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Cold start benchmark of a worker")
+    parser.add_argument("--mode", choices=("inprocess", "server", "importtime"), default="inprocess")
+    parser.add_argument("--runs", type=int, default=5, help="Fresh processes to start")
+    parser.add_argument("--backend", choices=("fake", "local"), default="fake", help="inprocess: database / cache backend")
+    parser.add_argument("--command", default=None, help="server: command line starting the server")
+    parser.add_argument("--url", default="http://127.0.0.1:8086/docs", help="server: URL polled until it answers")
+    parser.add_argument("--timeout", type=float, default=60.0, help="server: seconds to wait for the first answer")
+    parser.add_argument("--top", type=int, default=20, help="importtime: imports to print")
+    parser.add_argument("--output", default=None, help="Save the results as JSON")
+    return parser.parse_args(argv)
+
+
+def _child_environment(**extra) -> dict:
+    environment = dict(os.environ, **extra)
+    environment.setdefault("LOG_FILE_PATH", os.path.join("/tmp", "nikl-benchmark-logs.jsonl"))
+    environment.setdefault("STARTUP_PROFILE", "false")
+    return environment
+
+
+def run_inprocess(args: argparse.Namespace) -> list:
+    runs = []
+    for _ in range(args.runs):
+        spawned_at = time.time()
+        completed = subprocess.run(
+            [sys.executable, "-c", CHILD_CODE],
+            cwd=PROJECT_DIR,
+            env=_child_environment(COLD_START_SPAWNED_AT=repr(spawned_at), COLD_START_BACKEND=args.backend),
+            capture_output=True,
+            text=True
+        )
+        if completed.returncode != 0:
+            raise SystemExit(f"Cold start run failed:\n{completed.stderr}")
+        runs.append(json.loads(completed.stdout.strip().splitlines()[-1]))
+    return runs
+
+
+def run_server(args: argparse.Namespace) -> list:
+    if not args.command:
+        raise SystemExit("--command is required in server mode")
+
+    runs = []
+    for _ in range(args.runs):
+        spawned_at = time.time()
+        process = subprocess.Popen(shlex.split(args.command), cwd=PROJECT_DIR, env=_child_environment(), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            status_code = None
+            while time.time() - spawned_at < args.timeout:
+                try:
+                    with urllib.request.urlopen(args.url, timeout=1) as response:
+                        status_code = response.status
+                except urllib.error.HTTPError as e:
+                    status_code = e.code
+                except (urllib.error.URLError, ConnectionError, TimeoutError):
+                    time.sleep(0.01)
+                    continue
+                break
+            if status_code is None:
+                raise SystemExit(f"No answer from {args.url} after {args.timeout}s")
+            runs.append({"total_s": time.time() - spawned_at, "status_code": status_code})
+        finally:
+            process.terminate()
+            process.wait()
+    return runs
+
+
+def run_importtime(args: argparse.Namespace) -> dict:
+    """Import time of `api.main` per top level package (sum of the self times from `-X importtime`)"""
+    completed = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", "import api.main"],
+        cwd=PROJECT_DIR,
+        env=_child_environment(),
+        capture_output=True,
+        text=True
+    )
+    if completed.returncode != 0:
+        raise SystemExit(f"Importing api.main failed:\n{completed.stderr}")
+
+    packages: dict = {}
+    for line in completed.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        head, _, name = line.split("|", 2)
+        # Self times do not overlap, so they add up per package
+        package = name.strip().split(".")[0]
+        packages[package] = packages.get(package, 0) + int(head.split(":")[1])
+
+    ranking = sorted(packages.items(), key=lambda item: -item[1])
+    print(f"{'package':<40}{'ms':>10}")
+    for package, self_us in ranking[:args.top]:
+        print(f"{package:<40}{self_us / 1000:>10.1f}")
+    print(f"\nTotal import time of api.main: {sum(packages.values()) / 1000:.1f}ms")
+    return dict(ranking)
+
+
+def print_summary(runs: list) -> dict:
+    summary = {}
+    print(f"{'phase':<18}{'median ms':>12}{'min ms':>10}{'max ms':>10}")
+    for phase in PHASES:
+        values = [run[phase] for run in runs if phase in run]
+        if not values:
+            continue
+        summary[phase] = {"median": statistics.median(values), "min": min(values), "max": max(values)}
+        print(f"{phase:<18}{summary[phase]['median'] * 1000:>12.1f}{summary[phase]['min'] * 1000:>10.1f}{summary[phase]['max'] * 1000:>10.1f}")
+    return summary
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    if arguments.mode == "importtime":
+        result = {"mode": "importtime", "packages_us": run_importtime(arguments)}
+    else:
+        runs = run_inprocess(arguments) if arguments.mode == "inprocess" else run_server(arguments)
+        result = {"mode": arguments.mode, "config": vars(arguments), "runs": runs, "summary": print_summary(runs)}
+
+    if arguments.output:
+        with open(arguments.output, "w") as output_file:
+            json.dump(result, output_file, indent=2)
+        print(f"\nResults saved to {arguments.output}")
@@ -0,0 +1,450 @@
+"""
+In-memory stand-ins for PostgreSQL (asyncpg pool / connection API) and Memcached (aiomcache client API)
+1. **FakePool / FakeConnection**:
+    - Runs the simple SQL statements issued by the handlers against in-memory tables.
+    - The pool enforces its size and an optional per query latency, so pool sizing can be studied offline.
+2. **FakeMemcached**:
+    - Dictionary backed client with expiry, CAS tokens and an optional per call latency.
+Statements the mini SQL engine does not understand raise `NotImplementedError` with the statement
+"""
+
+from datetime import datetime, timedelta
+import asyncio
+import itertools
+import re
+import time
+
+
+# ======= PostgreSQL stand-in =======
+
+SELECT_RE = re.compile(
+    r"^SELECT (?P<projection>.+?) FROM (?P<table>\w+)"
+    r"(?: LEFT JOIN (?P<joined>\w+) ON (?P=joined)\.(?P<join_key>\w+) = (?P=table)\.id)?"
+    r"(?: WHERE (?P<where>.+?))?"
+    r"(?: ORDER BY (?P<order>.+?))?"
+    r"(?: LIMIT \$(?P<limit>\d+))?(?: OFFSET \$(?P<offset>\d+))?$",
+    re.IGNORECASE | re.DOTALL
+)
+INSERT_RE = re.compile(r"^INSERT INTO (?P<table>\w+) \((?P<columns>[^)]+)\) VALUES \((?P<values>[^)]+)\)(?: RETURNING (?P<returning>\w+))?$", re.IGNORECASE)
+# Batched counters: `INSERT ... SELECT * FROM unnest($1, $2, ...) ON CONFLICT (...) DO UPDATE SET c = table.c + EXCLUDED.c`
+UNNEST_UPSERT_RE = re.compile(
+    r"^INSERT INTO (?P<table>\w+) \((?P<columns>[^)]+)\) SELECT \* FROM unnest\([^)]+\)"
+    r" ON CONFLICT \((?P<conflict>[^)]+)\) DO UPDATE SET (?P<column>\w+) = (?P=table)\.(?P=column) \+ EXCLUDED\.(?P=column)$",
+    re.IGNORECASE
+)
+# Queued jobs: `INSERT ... VALUES ($1, ..., now() + make_interval(secs => $n)) ON CONFLICT (key) WHERE status IN (...) DO NOTHING RETURNING id`
+DELAYED_INSERT_RE = re.compile(
+    r"^INSERT INTO (?P<table>\w+) \((?P<columns>[^)]+)\) VALUES \((?P<values>[^)]+?),? now\(\) \+ make_interval\(secs => \$(?P<delay>\d+)\)\)"
+    r" ON CONFLICT \((?P<conflict>\w+)\) WHERE status IN \((?P<pending>[^)]+)\) DO NOTHING RETURNING (?P<returning>\w+)$",
+    re.IGNORECASE
+)
+# Sum over the rows of a parent: `SELECT [t.group,] SUM(t.c)::BIGINT AS name | COALESCE(SUM(t.c), 0) FROM table t
+# JOIN parent p ON p.id = t.parent_id WHERE p.column = $n [AND t.column >= $n] [GROUP BY t.group ORDER BY t.group]`
+JOIN_SUM_RE = re.compile(
+    r"^SELECT (?:\w+\.(?P<group>\w+), )?(?:SUM\(\w+\.(?P<summed>\w+)\)::BIGINT AS (?P<name>\w+)|COALESCE\(SUM\(\w+\.(?P<coalesced>\w+)\), 0\))"
+    r" FROM (?P<table>\w+) \w+ JOIN (?P<joined>\w+) \w+ ON \w+\.id = \w+\.(?P<join_key>\w+)"
+    r" WHERE \w+\.(?P<joined_column>\w+) = \$(?P<param>\d+)(?: AND \w+\.(?P<since_column>\w+) >= \$(?P<since>\d+))?"
+    r"(?: GROUP BY \w+\.(?P=group) ORDER BY \w+\.(?P=group))?$",
+    re.IGNORECASE
+)
+SUM_PROJECTION_RE = re.compile(r"^COALESCE\(SUM\((?P<column>\w+)\), 0\)$", re.IGNORECASE)
+ADVISORY_LOCK_RE = re.compile(r"^SELECT pg_advisory_(?:xact_)?lock\(\$1\)$", re.IGNORECASE)
+UPDATE_RE = re.compile(r"^UPDATE (?P<table>\w+) SET (?P<assignments>.+?) WHERE (?P<where>.+)$", re.IGNORECASE)
+DELETE_RE = re.compile(r"^DELETE FROM (?P<table>\w+)(?: WHERE (?P<where>.+))?$", re.IGNORECASE)
+CONDITION_RE = re.compile(r"^(?P<column>\w+) (?P<operator>=|>=|ILIKE) \$(?P<param>\d+)$", re.IGNORECASE)
+# `column`, `column ILIKE $n`, `lower(column) = lower($n)` or `COALESCE(joined.column, 0)`, with an optional direction
+ORDER_TERM_RE = re.compile(
+    r"^(?:COALESCE\((?P<coalesced>[\w.]+), 0\)|lower\((?P<lowered>[\w.]+)\) = lower\(\$(?P<equal_param>\d+)\)"
+    r"|(?P<column>[\w.]+)(?: ILIKE \$(?P<param>\d+))?)(?: (?P<direction>ASC|DESC))?$",
+    re.IGNORECASE
+)
+
+# Column defaults of the tables (see docs/*.md)
+TABLE_DEFAULTS = {
+    "users": {"is_active": False},
+    "base_packages": {"latest_version_id": None},
+    "jobs": {"status": "queued", "attempts": 0},
+}
+TIMESTAMP_COLUMNS = {"created_at", "registered_at"}
+# BIGSERIAL columns
+SERIAL_COLUMNS = {"package_changes": "seq", "jobs": "id"}
+
+
+def _normalize(query: str) -> str:
+    return " ".join(query.split())
+
+
+def _param(args: tuple, index: str):
+    return args[int(index) - 1]
+
+
+def _ilike(value, pattern: str) -> bool:
+    if value is None:
+        return False
+    # `%` and `_` are wildcards unless escaped with `\`
+    regex = "".join(
+        re.escape(token[1]) if token.startswith("\\") else ".*" if token == "%" else "." if token == "_" else re.escape(token)
+        for token in re.findall(r"\\.|.", pattern.lower(), re.DOTALL)
+    )
+    return re.match(f"^{regex}$", str(value).lower(), re.DOTALL) is not None
+
+
+def _build_filter(where, args: tuple):
+    """Compile `a = $1 AND b >= $2` / `a ILIKE $1 OR b ILIKE $1` into a row predicate"""
+    if not where:
+        return lambda row: True
+
+    joiner = " OR " if " OR " in where.upper() else " AND "
+    conditions = []
+    for part in re.split(joiner, where, flags=re.IGNORECASE):
+        match = CONDITION_RE.match(part.strip())
+        if not match:
+            raise NotImplementedError(f"Unsupported condition: {part}")
+        column, operator, value = match["column"], match["operator"].upper(), _param(args, match["param"])
+        if operator == "ILIKE":
+            conditions.append(lambda row, c=column, v=value: _ilike(row.get(c), v))
+        elif operator == ">=":
+            conditions.append(lambda row, c=column, v=value: row.get(c) is not None and row.get(c) >= v)
+        else:
+            conditions.append(lambda row, c=column, v=value: str(row.get(c)) == str(v))
+
+    combine = any if joiner == " OR " else all
+    return lambda row: combine(condition(row) for condition in conditions)
+
+
+def _sort_rows(rows: list, order: str, args: tuple) -> None:
+    """Sort rows in place by an `ORDER BY` list (one stable sort per term, the last term first)"""
+    for term in reversed(re.split(r",(?![^()]*\))", order)):
+        match = ORDER_TERM_RE.match(term.strip())
+        if not match:
+            raise NotImplementedError(f"Unsupported order: {term}")
+        if match["coalesced"]:
+            key = lambda row, c=match["coalesced"]: (True, row.get(c) if row.get(c) is not None else 0)
+        elif match["lowered"]:
+            key = lambda row, c=match["lowered"], v=str(_param(args, match["equal_param"])).lower(): (True, str(row.get(c)).lower() == v)
+        elif match["param"]:
+            key = lambda row, c=match["column"], v=_param(args, match["param"]): (True, _ilike(row.get(c), v))
+        else:
+            key = lambda row, c=match["column"]: (row.get(c) is not None, row.get(c))
+        rows.sort(key=key, reverse=(match["direction"] or "").upper() == "DESC")
+
+
+class FakeDatabase:
+    """In-memory tables shared by all the fake connections"""
+    def __init__(self):
+        self.tables: dict = {}
+        self._sequence = itertools.count()
+        self._serials: dict = {}
+
+    def table(self, name: str) -> list:
+        return self.tables.setdefault(name, [])
+
+    def insert(self, table: str, row: dict) -> dict:
+        full_row = dict(TABLE_DEFAULTS.get(table, {}))
+        # TIMESTAMP columns (without time zone), unique so ORDER BY is deterministic
+        created_at = datetime.utcnow() + timedelta(microseconds=next(self._sequence))
+        for column in TIMESTAMP_COLUMNS:
+            full_row.setdefault(column, created_at)
+        if table in SERIAL_COLUMNS:
+            full_row[SERIAL_COLUMNS[table]] = next(self._serials.setdefault(table, itertools.count(1)))
+        full_row.update(row)
+        self.table(table).append(full_row)
+        return full_row
+
+    def run(self, query: str, args: tuple):
+        """Run a statement, returns (rows, status)"""
+        query = _normalize(query)
+
+        # Single process, nothing to serialize
+        if ADVISORY_LOCK_RE.match(query):
+            return [{"pg_advisory_xact_lock": None}], "SELECT 1"
+
+        match = SELECT_RE.match(query)
+        if match:
+            rows = [row for row in self.table(match["table"]) if _build_filter(match["where"], args)(row)]
+            projection = match["projection"].strip()
+            if projection.upper() == "COUNT(*)":
+                return [{"count": len(rows)}], "SELECT 1"
+            sum_match = SUM_PROJECTION_RE.match(projection)
+            if sum_match:
+                return [{"coalesce": sum(row.get(sum_match["column"]) or 0 for row in rows)}], "SELECT 1"
+
+            if match["joined"]:
+                # Columns of the joined row are qualified (`table.column`), missing on rows without a match
+                joined = {str(row.get(match["join_key"])): row for row in self.table(match["joined"])}
+                rows = [
+                    {**row, **{f"{match['joined']}.{column}": value for column, value in joined.get(str(row.get("id")), {}).items()}}
+                    for row in rows
+                ]
+
+            if match["order"]:
+                _sort_rows(rows, order=match["order"], args=args)
+            offset = _param(args, match["offset"]) if match["offset"] else 0
+            if match["limit"]:
+                rows = rows[offset:offset + _param(args, match["limit"])]
+
+            columns = []
+            for item in projection.split(","):
+                source, _, alias = item.strip().partition(" AS ")
+                columns.append((source.strip(), (alias or source).strip()))
+            return [{alias: row.get(source) for source, alias in columns} for row in rows], f"SELECT {len(rows)}"
+
+        match = JOIN_SUM_RE.match(query)
+        if match:
+            return self._join_sum(match, args)
+
+        match = UNNEST_UPSERT_RE.match(query)
+        if match:
+            return self._unnest_upsert(match, args)
+
+        match = DELAYED_INSERT_RE.match(query)
+        if match:
+            return self._delayed_insert(match, args)
+
+        match = INSERT_RE.match(query)
+        if match:
+            columns = [column.strip() for column in match["columns"].split(",")]
+            values = [_param(args, value.strip().lstrip("$")) for value in match["values"].split(",")]
+            row = self.insert(match["table"], dict(zip(columns, values)))
+            return ([{match["returning"]: row.get(match["returning"])}] if match["returning"] else []), "INSERT 0 1"
+
+        match = UPDATE_RE.match(query)
+        if match:
+            rows = [row for row in self.table(match["table"]) if _build_filter(match["where"], args)(row)]
+            for assignment in match["assignments"].split(","):
+                column, _, value = assignment.partition("=")
+                for row in rows:
+                    row[column.strip()] = _param(args, value.strip().lstrip("$"))
+            return [], f"UPDATE {len(rows)}"
+
+        match = DELETE_RE.match(query)
+        if match:
+            predicate = _build_filter(match["where"], args)
+            table = self.table(match["table"])
+            kept = [row for row in table if not predicate(row)]
+            deleted = len(table) - len(kept)
+            table[:] = kept
+            return [], f"DELETE {deleted}"
+
+        raise NotImplementedError(f"Unsupported statement for the in-memory database: {query}")
+
+    def _join_sum(self, match, args: tuple):
+        parent_value = str(_param(args, match["param"]))
+        parent_ids = {str(row["id"]) for row in self.table(match["joined"]) if str(row.get(match["joined_column"])) == parent_value}
+        rows = [row for row in self.table(match["table"]) if str(row.get(match["join_key"])) in parent_ids]
+        if match["since"]:
+            since = _param(args, match["since"])
+            rows = [row for row in rows if row[match["since_column"]] >= since]
+
+        if not match["group"]:
+            return [{"coalesce": sum(row[match["coalesced"] or match["summed"]] for row in rows)}], "SELECT 1"
+        totals = {}
+        for row in rows:
+            totals[row[match["group"]]] = totals.get(row[match["group"]], 0) + row[match["summed"]]
+        return [{match["group"]: group, match["name"]: totals[group]} for group in sorted(totals)], f"SELECT {len(totals)}"
+
+    def _delayed_insert(self, match, args: tuple):
+        columns = [column.strip() for column in match["columns"].split(",")]
+        values = [_param(args, value.strip().lstrip("$")) for value in match["values"].split(",")]
+        row = dict(zip(columns, values + [datetime.utcnow() + timedelta(seconds=_param(args, match["delay"]))]))
+        # Partial unique index: a single pending row per key (NULL keys never conflict)
+        pending = {status.strip().strip("'") for status in match["pending"].split(",")}
+        conflict = row.get(match["conflict"])
+        if conflict is not None and any(item.get(match["conflict"]) == conflict and item.get("status") in pending for item in self.table(match["table"])):
+            return [], "INSERT 0 0"
+        row = self.insert(match["table"], row)
+        return [{match["returning"]: row.get(match["returning"])}], "INSERT 0 1"
+
+    def _unnest_upsert(self, match, args: tuple):
+        columns = [column.strip() for column in match["columns"].split(",")]
+        conflict = [column.strip() for column in match["conflict"].split(",")]
+        table = self.table(match["table"])
+        for values in zip(*args):
+            row = dict(zip(columns, values))
+            existing = next((item for item in table if all(item.get(column) == row[column] for column in conflict)), None)
+            if existing is None:
+                self.insert(match["table"], row)
+            else:
+                existing[match["column"]] += row[match["column"]]
+        return [], f"INSERT 0 {len(args[0]) if args else 0}"
+
+
+class _Transaction:
+    def __init__(self, connection):
+        self.connection = connection
+
+    async def __aenter__(self):
+        self.connection.transaction_depth += 1
+        return self
+
+    async def __aexit__(self, *exc_info):
+        self.connection.transaction_depth -= 1
+        return False
+
+
+class FakeConnection:
+    """Subset of `asyncpg.Connection` used by the handlers"""
+    def __init__(self, database: FakeDatabase, query_latency: float = 0.0):
+        self.database = database
+        self.query_latency = query_latency
+        self.queries = 0
+        self.transaction_depth = 0
+
+    async def _run(self, query: str, args: tuple):
+        self.queries += 1
+        if self.query_latency:
+            await asyncio.sleep(self.query_latency)
+        return self.database.run(query, args)
+
+    async def fetch(self, query: str, *args, timeout=None) -> list:
+        rows, _ = await self._run(query, args)
+        return rows
+
+    async def fetchrow(self, query: str, *args, timeout=None):
+        rows, _ = await self._run(query, args)
+        return rows[0] if rows else None
+
+    async def fetchval(self, query: str, *args, column: int = 0, timeout=None):
+        row = await self.fetchrow(query, *args)
+        return list(row.values())[column] if row else None
+
+    async def execute(self, query: str, *args, timeout=None) -> str:
+        _, status = await self._run(query, args)
+        return status
+
+    async def prepare(self, query: str, timeout=None) -> str:
+        return _normalize(query)
+
+    async def set_type_codec(self, *args, **kwargs) -> None:
+        return None
+
+    def transaction(self, **kwargs) -> _Transaction:
+        return _Transaction(self)
+
+    def is_in_transaction(self) -> bool:
+        return self.transaction_depth > 0
+
+
+class FakePool:
+    """Subset of `asyncpg.Pool`, bounded like the real one"""
+    def __init__(self, database: FakeDatabase, max_size: int, query_latency: float = 0.0):
+        self.database = database
+        self.max_size = max_size
+        self._idle = [FakeConnection(database=database, query_latency=query_latency) for _ in range(max_size)]
+        self._available = asyncio.Semaphore(max_size)
+
+    async def acquire(self, timeout=None) -> FakeConnection:
+        await asyncio.wait_for(self._available.acquire(), timeout=timeout)
+        return self._idle.pop()
+
+    async def release(self, connection: FakeConnection) -> None:
+        self._idle.append(connection)
+        self._available.release()
+
+    def get_size(self) -> int:
+        return self.max_size
+
+    def get_idle_size(self) -> int:
+        return len(self._idle)
+
+    def get_min_size(self) -> int:
+        return self.max_size // 2
+
+    def get_max_size(self) -> int:
+        return self.max_size
+
+    async def close(self) -> None:
+        return None
+
+
+# ======= Memcached stand-in =======
+
+class FakeMemcached:
+    """Subset of `aiomcache.Client` backed by a dictionary (values, expiry and CAS tokens)"""
+    def __init__(self, call_latency: float = 0.0):
+        self.call_latency = call_latency
+        self._items: dict = {}
+        self._cas = itertools.count(1)
+
+    async def _wait(self) -> None:
+        if self.call_latency:
+            await asyncio.sleep(self.call_latency)
+
+    def _live(self, key: bytes):
+        item = self._items.get(key)
+        if item and item[1] and item[1] <= time.time():
+            del self._items[key]
+            return None
+        return item
+
+    def _store(self, key: bytes, value: bytes, exptime: int) -> None:
+        self._items[key] = (value, time.time() + exptime if exptime else 0, next(self._cas))
+
+    async def get(self, key: bytes, default=None):
+        await self._wait()
+        item = self._live(key)
+        return item[0] if item else default
+
+    async def gets(self, key: bytes, default=None):
+        await self._wait()
+        item = self._live(key)
+        return (item[0], item[2]) if item else (default, None)
+
+    async def multi_get(self, *keys: bytes) -> tuple:
+        await self._wait()
+        return tuple((item[0] if item else None) for item in map(self._live, keys))
+
+    async def set(self, key: bytes, value: bytes, exptime: int = 0) -> bool:
+        await self._wait()
+        self._store(key, value, exptime)
+        return True
+
+    async def add(self, key: bytes, value: bytes, exptime: int = 0) -> bool:
+        await self._wait()
+        if self._live(key):
+            return False
+        self._store(key, value, exptime)
+        return True
+
+    async def cas(self, key: bytes, value: bytes, cas_token: int, exptime: int = 0) -> bool:
+        await self._wait()
+        item = self._live(key)
+        if not item or item[2] != cas_token:
+            return False
+        self._store(key, value, exptime)
+        return True
+
+    async def delete(self, key: bytes) -> bool:
+        await self._wait()
+        return self._items.pop(key, None) is not None
+
+    async def _add_to_counter(self, key: bytes, delta: int):
+        item = self._live(key)
+        if not item:
+            return None
+        value = max(0, int(item[0]) + delta)
+        self._items[key] = (str(value).encode("utf-8"), item[1], next(self._cas))
+        return value
+
+    async def incr(self, key: bytes, increment: int = 1):
+        await self._wait()
+        return await self._add_to_counter(key, increment)
+
+    async def decr(self, key: bytes, decrement: int = 1):
+        await self._wait()
+        return await self._add_to_counter(key, -decrement)
+
+    async def touch(self, key: bytes, exptime: int) -> bool:
+        await self._wait()
+        item = self._live(key)
+        if not item:
+            return False
+        self._items[key] = (item[0], time.time() + exptime if exptime else 0, item[2])
+        return True
+
+    async def flush_all(self) -> None:
+        await self._wait()
+        self._items.clear()
+
+    async def close(self) -> None:
+        return None
@@ -0,0 +1,442 @@
+"""
+End-to-end load benchmark of the API
+Drives the real FastAPI `app` of `api/main.py` in-process through an ASGI transport (or a running
+server with `--base-url`) with a weighted mix of requests and reports p50 / p95 / p99 latency and
+throughput per endpoint. Results are saved as JSON so runs can be compared over time.
+
+Backends (`--backend`):
+- fake: In-memory stand-ins of asyncpg and Memcached (`benchmarks/fakes.py`), nothing to run
+- local: The PostgreSQL / Memcached servers configured in the environment (use a scratch database)
+- auto: local when both servers accept connections, fake otherwise
+
+Usage:
+    python -m benchmarks.load_test --concurrency 50 --duration 30 --mix detail=10,listing=4,search=4,login=1,upload=1
+    python -m benchmarks.load_test --backend fake --pool-size 20 --db-latency 2 --label pool-20
+    python -m benchmarks.load_test --compare benchmarks/results/20250101-120000-baseline.json
+"""
+
+import argparse
+import asyncio
+import base64
+import io
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tarfile
+import tempfile
+import time
+import uuid
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+SCENARIOS = ("login", "search", "detail", "listing", "upload")
+DEFAULT_MIX = "detail=10,listing=4,search=4,login=1,upload=1"
+BENCH_NAMESPACE = uuid.UUID("6f1d3c52-4c8e-4a53-9f0e-8c4f3a1b2d10")
+BENCH_PASSWORD = "bench-password"
+SEARCH_WORDS = ("neko", "http", "json", "math", "crypto", "async", "test", "lang")
+
+
+# ======= Configuration =======
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="End-to-end load benchmark of the API")
+    parser.add_argument("--backend", choices=("auto", "fake", "local"), default="auto", help="Database / cache backend for the in-process app")
+    parser.add_argument("--base-url", default=None, help="Benchmark a running server instead of the in-process app")
+    parser.add_argument("--concurrency", type=int, default=20, help="Concurrent virtual clients")
+    parser.add_argument("--duration", type=float, default=15.0, help="Measured seconds")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of traffic before measuring")
+    parser.add_argument("--mix", default=DEFAULT_MIX, help=f"Weighted scenarios out of {', '.join(SCENARIOS)}")
+    parser.add_argument("--skew", type=float, default=3.0, help="Key popularity skew, 1 is uniform, higher concentrates traffic on a few hot packages")
+    parser.add_argument("--pool-size", type=int, default=None, help="POSTGRES_POOL_SIZE of the in-process app")
+    parser.add_argument("--db-latency", type=float, default=1.0, help="Fake backend: milliseconds per SQL statement")
+    parser.add_argument("--cache-latency", type=float, default=0.2, help="Fake backend: milliseconds per Memcached call")
+    parser.add_argument("--users", type=int, default=20, help="Seeded users")
+    parser.add_argument("--packages", type=int, default=200, help="Seeded base packages")
+    parser.add_argument("--versions", type=int, default=5, help="Seeded versions per base package")
+    parser.add_argument("--bcrypt-rounds", type=int, default=12, help="Cost of the seeded password hashes (login cost)")
+    parser.add_argument("--user", default=None, help="With --base-url: existing user to log in with")
+    parser.add_argument("--password", default=None, help="With --base-url: password of that user")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed of the request mix")
+    parser.add_argument("--label", default="run", help="Label of the result file")
+    parser.add_argument("--output", default=None, help="Result file (default benchmarks/results/<time>-<label>.json)")
+    parser.add_argument("--compare", default=None, help="Previous result file to compare with")
+    return parser.parse_args(argv)
+
+
+def parse_mix(mix: str) -> dict:
+    weights = {}
+    for item in mix.split(","):
+        name, _, weight = item.strip().partition("=")
+        if name not in SCENARIOS:
+            raise SystemExit(f"Unknown scenario {name!r}, expected one of {', '.join(SCENARIOS)}")
+        weights[name] = float(weight or 1)
+    return weights
+
+
+def _port_open(host: str, port: int, timeout: float = 0.5) -> bool:
+    try:
+        with socket.create_connection((host, port), timeout=timeout):
+            return True
+    except OSError:
+        return False
+
+
+def _local_servers_available() -> bool:
+    from src.utils.base import libraries  # noqa: F401 (before the constants, the two modules import each other)
+    from src.utils.base.constants import POSTGRES_DB_HOST, POSTGRES_DB_PORT, MEMCACHED_SERVERS
+    from src.database.cache_cluster import parse_servers
+    servers = [(POSTGRES_DB_HOST, int(POSTGRES_DB_PORT))] + parse_servers(MEMCACHED_SERVERS)
+    return all(_port_open(host, port) for host, port in servers)
+
+
+def prepare_environment(args: argparse.Namespace) -> None:
+    """Environment of the in-process app, must run before anything from `src` / `api` is imported"""
+    os.environ.setdefault("LOG_FILE_PATH", os.path.join(tempfile.gettempdir(), "nikl-benchmark-logs.jsonl"))
+    os.environ.setdefault("LOG_LEVEL", "30")
+    # The in-memory database does not run the job queue statements
+    os.environ.setdefault("JOBS_ENABLED", "false")
+    # Archives stored by the upload scenario
+    os.environ.setdefault("PACKAGE_STORAGE_PATH", tempfile.mkdtemp(prefix="nikl-benchmark-packages-"))
+    if args.pool_size:
+        os.environ["POSTGRES_POOL_SIZE"] = str(args.pool_size)
+
+
+# ======= Seed data =======
+
+def _bench_id(kind: str, index: int) -> str:
+    return str(uuid.uuid5(BENCH_NAMESPACE, f"{kind}-{index}"))
+
+
+def build_seed(args: argparse.Namespace) -> dict:
+    """Deterministic users, API keys, base packages and versions"""
+    import bcrypt
+
+    hashed_password = bcrypt.hashpw(BENCH_PASSWORD.encode("utf-8"), bcrypt.gensalt(rounds=args.bcrypt_rounds)).decode("utf-8")
+    users = [
+        {
+            "id": _bench_id("user", index),
+            "user_name": f"bench_user_{index}",
+            "email": f"bench_user_{index}@example.com",
+            "hashed_password": hashed_password,
+            "profile_data": {"full_name": f"Bench User {index}"},
+            "is_active": True
+        } for index in range(args.users)
+    ]
+    base_packages = [
+        {
+            "id": _bench_id("base", index),
+            "package_name": f"{SEARCH_WORDS[index % len(SEARCH_WORDS)]}-package-{index}",
+            "package_description": f"Benchmark package number {index} for the {SEARCH_WORDS[index % len(SEARCH_WORDS)]} ecosystem",
+            "user_id": users[index % len(users)]["id"],
+            "metadata": {"website": "https://example.com", "keywords": [SEARCH_WORDS[index % len(SEARCH_WORDS)]], "index": index}
+        } for index in range(args.packages)
+    ]
+    versioned_packages = [
+        {
+            "id": _bench_id("version", index * args.versions + version),
+            "base_package_id": base_package["id"],
+            "version": f"1.{version}.0",
+            "file_path": f"/packages/{base_package['package_name']}/1.{version}.0.tar.gz",
+            "metadata": {"dependencies": {"std": ">=1.0"}, "version_index": version}
+        } for index, base_package in enumerate(base_packages) for version in range(args.versions)
+    ]
+    # The upload scenario publishes `bench-upload` with the API key of the first user
+    api_keys = [{"id": _bench_id("api_key", 0), "user_id": users[0]["id"], "api_key": "benchmark-api-key", "details": {"name": "benchmark"}}]
+    base_packages.append({
+        "id": _bench_id("base", "upload"),
+        "package_name": "bench-upload",
+        "package_description": "Package published by the upload scenario",
+        "user_id": users[0]["id"],
+        "metadata": {}
+    })
+    return {"users": users, "api_keys": api_keys, "base_packages": base_packages, "versioned_packages": versioned_packages}
+
+
+async def seed_local(seed: dict) -> None:
+    """Insert the seed data into the configured PostgreSQL database (idempotent)"""
+    from src.database.connections import db
+
+    statements = {
+        "users": "INSERT INTO users (id, user_name, email, hashed_password, profile_data, is_active) VALUES ($1, $2, $3, $4, $5, $6) ON CONFLICT (id) DO NOTHING",
+        "api_keys": "INSERT INTO api_keys (id, user_id, api_key, details) VALUES ($1, $2, $3, $4) ON CONFLICT (id) DO NOTHING",
+        "base_packages": "INSERT INTO base_packages (id, package_name, package_description, user_id, metadata) VALUES ($1, $2, $3, $4, $5) ON CONFLICT (id) DO NOTHING",
+        "versioned_packages": "INSERT INTO versioned_packages (id, base_package_id, version, file_path, metadata) VALUES ($1, $2, $3, $4, $5) ON CONFLICT (id) DO NOTHING"
+    }
+    async with db.get_connection() as connection:
+        for table, statement in statements.items():
+            await connection.executemany(statement, [tuple(row.values()) for row in seed[table]])
+
+
+def install_fake_backend(args: argparse.Namespace, seed: dict) -> None:
+    """Point the app pools at the in-memory stand-ins"""
+    from benchmarks.fakes import FakeDatabase, FakePool, FakeMemcached
+    from src.utils.base import libraries  # noqa: F401 (before the constants, the two modules import each other)
+    from src.utils.base.constants import POSTGRES_POOL_SIZE, MEMCACHED_SERVERS
+    from src.database.connections import db, MemcachedClient
+    from src.database.cache_cluster import ShardedMemcachedClient, parse_servers
+
+    database = FakeDatabase()
+    for table, rows in seed.items():
+        for row in rows:
+            database.insert(table, dict(row))
+
+    db.pool = FakePool(database=database, max_size=POSTGRES_POOL_SIZE, query_latency=args.db_latency / 1000)
+
+    # The real sharding / circuit breaker code runs, only the per node clients are replaced
+    MemcachedClient.client = ShardedMemcachedClient(servers=parse_servers(MEMCACHED_SERVERS), breaker=MemcachedClient.breaker)
+    for node in MemcachedClient.client.nodes:
+        node.client = FakeMemcached(call_latency=args.cache_latency / 1000)
+
+
+# ======= Scenarios =======
+
+def _upload_archive() -> bytes:
+    """Small package archive used by the upload scenario"""
+    manifest = json.dumps({"name": "bench-upload", "version": "0.0.1"}).encode("utf-8")
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w:gz") as archive:
+        info = tarfile.TarInfo("nikl.json")
+        info.size = len(manifest)
+        archive.addfile(info, io.BytesIO(manifest))
+    return buffer.getvalue()
+
+
+class Scenarios:
+    """Builds the requests of every scenario from the known ids"""
+    def __init__(self, base_ids: list, version_ids: list, credentials: list, rng: random.Random, skew: float):
+        self.base_ids = base_ids
+        self.version_ids = version_ids
+        self.credentials = credentials
+        self.rng = rng
+        self.skew = skew
+        self.archive = _upload_archive()
+
+    def _pick(self, items: list):
+        # Power law popularity: a few hot keys get most of the traffic
+        return items[int(len(items) * self.rng.random() ** self.skew)]
+
+    def build(self, scenario: str) -> tuple:
+        """Returns (endpoint name, method, path, request kwargs)"""
+        if scenario == "login":
+            user_name, password = self.rng.choice(self.credentials)
+            payload = {"user_name": user_name, "password": base64.b64encode(password.encode("utf-8")).decode("utf-8"), "hcaptcha_token": "benchmark"}
+            return "login", "POST", "/users/login", {"json": payload}
+
+        if scenario == "search":
+            query = self.rng.choice(SEARCH_WORDS)
+            return "search", "GET", "/packages/base/search", {"params": {"query": query, "page": self.rng.randint(1, 3), "limit": 10}}
+
+        if scenario == "detail":
+            if self.version_ids and self.rng.random() < 0.5:
+                return "detail_versioned", "GET", f"/packages/versioned/{self._pick(self.version_ids)}", {}
+            return "detail_base", "GET", f"/packages/base/{self._pick(self.base_ids)}", {}
+
+        if scenario == "listing":
+            return "listing", "GET", "/packages/versioned-all", {"params": {"base_package_id": self._pick(self.base_ids), "page": 1, "limit": 10}}
+
+        return "upload", "POST", "/packages/versioned/upload", {
+            "headers": {"X-API-Key": "benchmark-api-key"},
+            "files": {"file": ("bench-upload-0.0.1.tar.gz", self.archive, "application/gzip")}
+        }
+
+
+async def discover_ids(client) -> tuple:
+    """With --base-url: find package ids through the public API"""
+    response = await client.get("/packages/base/search", params={"query": "", "page": 1, "limit": 100, "fields": "id"})
+    response.raise_for_status()
+    base_ids = [package["id"] for package in response.json()["packages"]]
+    version_ids = []
+    for base_id in base_ids[:20]:
+        response = await client.get("/packages/versioned-all", params={"base_package_id": base_id, "limit": 20, "fields": "id"})
+        if response.status_code == 200:
+            version_ids.extend(package["id"] for package in response.json()["packages"])
+    if not base_ids:
+        raise SystemExit("No base package found on the target server")
+    return base_ids, version_ids
+
+
+# ======= Load generation =======
+
+def percentile(sorted_values: list, fraction: float) -> float:
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(1, int(round(fraction * len(sorted_values) + 0.5)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+async def run_load(client, scenarios: Scenarios, weights: dict, concurrency: int, warmup: float, duration: float) -> dict:
+    """Run the virtual clients, returns the raw samples per endpoint"""
+    names, cumulative = list(weights), []
+    total_weight = 0.0
+    for name in names:
+        total_weight += weights[name]
+        cumulative.append(total_weight)
+
+    samples: dict = {}
+    started_at = time.perf_counter()
+    measure_from = started_at + warmup
+    stop_at = measure_from + duration
+
+    async def virtual_client():
+        while time.perf_counter() < stop_at:
+            scenario = names[next(index for index, bound in enumerate(cumulative) if scenarios.rng.random() * total_weight < bound)]
+            endpoint, method, path, kwargs = scenarios.build(scenario)
+            request_started_at = time.perf_counter()
+            try:
+                response = await client.request(method, path, **kwargs)
+                status = response.status_code
+            except Exception as e:
+                status = type(e).__name__
+            if request_started_at >= measure_from:
+                samples.setdefault(endpoint, []).append((time.perf_counter() - request_started_at, status))
+
+    await asyncio.gather(*(virtual_client() for _ in range(concurrency)))
+    return samples
+
+
+def summarize(samples: dict, duration: float) -> dict:
+    def summary(entries: list) -> dict:
+        latencies = sorted(latency * 1000 for latency, _ in entries)
+        status_codes: dict = {}
+        for _, status in entries:
+            status_codes[str(status)] = status_codes.get(str(status), 0) + 1
+        errors = sum(count for status, count in status_codes.items() if not status.isdigit() or int(status) >= 500)
+        return {
+            "count": len(entries),
+            "errors": errors,
+            "status_codes": status_codes,
+            "throughput_rps": round(len(entries) / duration, 2),
+            "latency_ms": {
+                "mean": round(sum(latencies) / len(latencies), 3) if latencies else 0.0,
+                "p50": round(percentile(latencies, 0.50), 3),
+                "p95": round(percentile(latencies, 0.95), 3),
+                "p99": round(percentile(latencies, 0.99), 3),
+                "max": round(latencies[-1], 3) if latencies else 0.0
+            }
+        }
+
+    return {
+        "endpoints": {endpoint: summary(entries) for endpoint, entries in sorted(samples.items())},
+        "total": summary([entry for entries in samples.values() for entry in entries])
+    }
+
+
+# ======= Reporting =======
+
+def _git_commit() -> str:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def print_report(report: dict) -> None:
+    print(f"\n{'endpoint':<18}{'count':>8}{'errors':>8}{'rps':>10}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}{'max ms':>10}")
+    rows = list(report["results"]["endpoints"].items()) + [("TOTAL", report["results"]["total"])]
+    for endpoint, result in rows:
+        latency = result["latency_ms"]
+        print(f"{endpoint:<18}{result['count']:>8}{result['errors']:>8}{result['throughput_rps']:>10}{latency['p50']:>10}{latency['p95']:>10}{latency['p99']:>10}{latency['max']:>10}")
+
+
+def print_comparison(report: dict, previous_path: str) -> None:
+    with open(previous_path) as previous_file:
+        previous = json.load(previous_file)
+    print(f"\nCompared with {previous_path} ({previous.get('label')}, {previous.get('git_commit')})")
+    print(f"{'endpoint':<18}{'rps':>18}{'p95 ms':>22}{'p99 ms':>22}")
+    current_rows = dict(report["results"]["endpoints"], TOTAL=report["results"]["total"])
+    previous_rows = dict(previous["results"]["endpoints"], TOTAL=previous["results"]["total"])
+    for endpoint, result in current_rows.items():
+        before = previous_rows.get(endpoint)
+        if not before:
+            continue
+        cells = []
+        for now, then in (
+            (result["throughput_rps"], before["throughput_rps"]),
+            (result["latency_ms"]["p95"], before["latency_ms"]["p95"]),
+            (result["latency_ms"]["p99"], before["latency_ms"]["p99"])
+        ):
+            change = f"{(now - then) / then * 100:+.1f}%" if then else "n/a"
+            cells.append(f"{then}->{now} ({change})")
+        print(f"{endpoint:<18}{cells[0]:>18}{cells[1]:>22}{cells[2]:>22}")
+
+
+# ======= Entry point =======
+
+async def main(args: argparse.Namespace) -> dict:
+    import httpx
+
+    weights = parse_mix(args.mix)
+    rng = random.Random(args.seed)
+    config = {key: value for key, value in vars(args).items() if key not in ("password",)}
+
+    if args.base_url:
+        async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+            base_ids, version_ids = await discover_ids(client)
+            credentials = [(args.user, args.password)] if args.user and args.password else []
+            if not credentials:
+                weights.pop("login", None)
+            scenarios = Scenarios(base_ids=base_ids, version_ids=version_ids, credentials=credentials, rng=rng, skew=args.skew)
+            samples = await run_load(client, scenarios, weights, args.concurrency, args.warmup, args.duration)
+        config["backend"] = "remote"
+
+    else:
+        backend = args.backend
+        if backend == "auto":
+            backend = "local" if _local_servers_available() else "fake"
+        config["backend"] = backend
+
+        seed = build_seed(args)
+        if backend == "fake":
+            install_fake_backend(args, seed)
+
+        from api.main import app
+        from src.utils.base.constants import POSTGRES_POOL_SIZE
+        config["pool_size"] = POSTGRES_POOL_SIZE
+
+        async with app.router.lifespan_context(app):
+            if backend == "local":
+                await seed_local(seed)
+
+            scenarios = Scenarios(
+                base_ids=[row["id"] for row in seed["base_packages"] if row["package_name"] != "bench-upload"],
+                version_ids=[row["id"] for row in seed["versioned_packages"]],
+                credentials=[(user["user_name"], BENCH_PASSWORD) for user in seed["users"]],
+                rng=rng,
+                skew=args.skew
+            )
+            transport = httpx.ASGITransport(app=app, client=("127.0.0.1", 50000))
+            async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=60) as client:
+                samples = await run_load(client, scenarios, weights, args.concurrency, args.warmup, args.duration)
+
+    return {
+        "label": args.label,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "git_commit": _git_commit(),
+        "python": sys.version.split()[0],
+        "platform": platform.platform(),
+        "config": config,
+        "results": summarize(samples, args.duration)
+    }
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    prepare_environment(arguments)
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    result = asyncio.run(main(arguments))
+    print_report(result)
+
+    output_path = arguments.output or os.path.join(RESULTS_DIR, f"{time.strftime('%Y%m%d-%H%M%S')}-{arguments.label}.json")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump(result, output_file, indent=2)
+    print(f"\nResults saved to {output_path}")
+
+    if arguments.compare:
+        print_comparison(result, arguments.compare)
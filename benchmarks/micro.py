@@ -0,0 +1,266 @@
+"""
+Micro-benchmarks of the handler level hot paths
+Every benchmark is calibrated to run for about `--min-time` seconds per repeat and repeated `--repeat`
+times, the median and the inter-quartile range of the per call time are reported (robust to outliers),
+together with the allocations of a call (tracemalloc peak and net blocks).
+
+With `--baseline` the run fails (exit code 1) when a median gets slower than the baseline by more
+than `--threshold` (a fraction, 0.10 = 10%).
+
+Usage:
+    python -m benchmarks.micro --label baseline
+    python -m benchmarks.micro --baseline benchmarks/results/micro-<time>-baseline.json --threshold 0.10
+    python -m benchmarks.micro --only session --repeat 9
+"""
+
+import argparse
+import asyncio
+import base64
+import datetime
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+import timeit
+import tracemalloc
+import uuid
+
+
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+BCRYPT_COSTS = (4, 8, 10, 12)
+
+METADATA = {
+    "website": "https://nekonik.com",
+    "repository": "https://github.com/Neko-Nik",
+    "keywords": ["http", "client", "async", "json"],
+    "dependencies": {f"dependency-{index}": f">={index}.0.0" for index in range(20)},
+    "authors": [{"name": "Neko Nik", "email": "admin@nekonik.com"}],
+    "readme": "A reasonably sized package description. " * 20
+}
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Micro-benchmarks of the handler level hot paths")
+    parser.add_argument("--repeat", type=int, default=7, help="Timed repeats per benchmark")
+    parser.add_argument("--min-time", type=float, default=0.2, help="Minimum seconds per repeat (calibration)")
+    parser.add_argument("--only", default=None, help="Run the benchmarks whose name contains this text")
+    parser.add_argument("--rows", type=int, default=100, help="Rows returned by the listing / search handlers")
+    parser.add_argument("--archive-files", type=int, default=200, help="Files in the archive of the inspection benchmark")
+    parser.add_argument("--archive-file-size", type=int, default=16 * 1024, help="Bytes per file in the archive of the inspection benchmark")
+    parser.add_argument("--baseline", default=None, help="Previous result file to check for regressions")
+    parser.add_argument("--threshold", type=float, default=0.10, help="Allowed slowdown of the median against the baseline")
+    parser.add_argument("--label", default="run", help="Label of the result file")
+    parser.add_argument("--output", default=None, help="Result file (default benchmarks/results/micro-<time>-<label>.json)")
+    return parser.parse_args(argv)
+
+
+def prepare_environment() -> None:
+    """Environment of the app modules, must run before anything from `src` / `api` is imported"""
+    os.environ.setdefault("LOG_FILE_PATH", os.path.join(tempfile.gettempdir(), "nikl-benchmark-logs.jsonl"))
+    os.environ.setdefault("LOG_LEVEL", "30")
+    # The in-memory database does not run the job queue statements
+    os.environ.setdefault("JOBS_ENABLED", "false")
+    os.environ.setdefault("SESSION_SIGNING_KEY", "benchmark-signing-key")
+
+
+# ======= Benchmarks =======
+
+def _run_async(coroutine_function, loop: asyncio.AbstractEventLoop):
+    """Synchronous callable running a coroutine function on a shared loop"""
+    return lambda: loop.run_until_complete(coroutine_function())
+
+
+def _build_archive(files: int, file_size: int) -> str:
+    """Package archive with a manifest and `files` source files (compressible text), returns its path"""
+    import io
+    import tarfile
+
+    members = {"nikl.json": json.dumps({"name": "bench-archive", "version": "1.0.0", **METADATA}).encode("utf-8")}
+    line = b"fn add(a: int, b: int) -> int { return a + b }\n"
+    for index in range(files):
+        members[f"src/module_{index}.nk"] = (line * (file_size // len(line) + 1))[:file_size]
+
+    path = os.path.join(tempfile.mkdtemp(prefix="nikl-benchmark-"), "bench-archive-1.0.0.tar.gz")
+    with tarfile.open(path, mode="w:gz") as archive:
+        for name, content in members.items():
+            info = tarfile.TarInfo(name)
+            info.size = len(content)
+            archive.addfile(info, io.BytesIO(content))
+    return path
+
+
+def _scan_member(archive_path: str, member_path: str) -> bytes:
+    """Reference read of one file without a seek index (inflates everything before it)"""
+    import tarfile
+
+    with tarfile.open(archive_path, mode="r|gz") as archive:
+        for member in archive:
+            if member.name == member_path:
+                return archive.extractfile(member).read()
+
+
+def build_benchmarks(args: argparse.Namespace, loop: asyncio.AbstractEventLoop) -> dict:
+    """Name -> zero argument callable"""
+    import inspect
+    import bcrypt
+    import orjson
+    from benchmarks.fakes import FakeDatabase, FakePool
+    from src.database.connections import db, _json_encoder
+    from src.database.package_handler import search_base_packages, get_all_versioned_packages
+    from src.database.session_handler import encode_session, decode_session, create_signed_token, verify_signed_token, session_csrf_matches
+    from src.utils.models import BasePackageForm, UserRegForm
+    from src.utils.packages import InspectionLimits, inspect_package_archive, read_archive_member
+    from api.routers.users import _hash_password
+
+    benchmarks = {}
+
+    # Row to dict mapping of the listing handlers (cache layers unwrapped, zero latency database)
+    database = FakeDatabase()
+    for index in range(args.rows):
+        base_id = str(uuid.uuid4())
+        database.insert("base_packages", {"id": base_id, "package_name": f"json-package-{index}", "package_description": "Benchmark json package", "user_id": "bench", "metadata": METADATA})
+        database.insert("versioned_packages", {"id": str(uuid.uuid4()), "base_package_id": "bench-base", "version": f"1.{index}.0", "file_path": "/tmp/x", "metadata": METADATA})
+    db.pool = FakePool(database=database, max_size=1)
+
+    search = inspect.unwrap(search_base_packages)
+    listing = inspect.unwrap(get_all_versioned_packages)
+    benchmarks["handler.search_base_packages"] = _run_async(lambda: search(db_pool=db, search_query="json", page=1, page_size=args.rows), loop)
+    benchmarks["handler.get_all_versioned_packages"] = _run_async(lambda: listing(db_pool=db, base_package_id="bench-base", page=1, page_size=args.rows), loop)
+
+    # JSON encode / decode of the metadata column (driver codecs) and the stdlib equivalent
+    metadata_text = _json_encoder(METADATA)
+    benchmarks["json.metadata_encode.orjson"] = lambda: _json_encoder(METADATA)
+    benchmarks["json.metadata_decode.orjson"] = lambda: orjson.loads(metadata_text)
+    benchmarks["json.metadata_encode.stdlib"] = lambda: json.dumps(METADATA)
+    benchmarks["json.metadata_decode.stdlib"] = lambda: json.loads(metadata_text)
+
+    # Session checks done by get_current_user_session_details
+    user = {"id": str(uuid.uuid4()), "user_name": "bench_user", "email": "bench_user@example.com", "is_active": True, "created_at": datetime.datetime.now(datetime.timezone.utc)}
+    csrf_token = str(uuid.uuid4())
+    payload = encode_session(dict(user, csrf_token=csrf_token, generation=int(time.time()), logged_in_at=int(time.time())))
+    token = create_signed_token(user=user, csrf_token=csrf_token, session_id=str(uuid.uuid4()))
+    session = decode_session(payload)
+    claims_session = {"csrf_binding": verify_signed_token(token)["csrf"]}
+    benchmarks["session.decode_binary"] = lambda: decode_session(payload)
+    benchmarks["session.verify_signed_token"] = lambda: verify_signed_token(token)
+    benchmarks["session.csrf_matches.cache"] = lambda: session_csrf_matches(session=session, csrf_token=csrf_token)
+    benchmarks["session.csrf_matches.signed"] = lambda: session_csrf_matches(session=claims_session, csrf_token=csrf_token)
+
+    # Password hashing at different costs
+    password = base64.b64encode(b"benchmark-password").decode("utf-8")
+    for cost in BCRYPT_COSTS:
+        benchmarks[f"password.hash.cost_{cost:02d}"] = lambda cost=cost: _hash_password(password, rounds=cost)
+    hashed_password = bcrypt.hashpw(b"benchmark-password", bcrypt.gensalt(rounds=BCRYPT_COSTS[0]))
+    benchmarks[f"password.check.cost_{BCRYPT_COSTS[0]:02d}"] = lambda: bcrypt.checkpw(b"benchmark-password", hashed_password)
+
+    # Request body validation
+    base_package_body = {"package_name": "bench-package", "package_description": "A benchmark package description", "metadata": METADATA}
+    user_body = {"user_name": "bench_user", "email": "bench_user@example.com", "password": password, "full_name": "Bench User", "hcaptcha_token": "token"}
+    base_package_json = orjson.dumps(base_package_body)
+    benchmarks["validation.BasePackageForm.dict"] = lambda: BasePackageForm.model_validate(base_package_body)
+    benchmarks["validation.BasePackageForm.json"] = lambda: BasePackageForm.model_validate_json(base_package_json)
+    benchmarks["validation.UserRegForm.dict"] = lambda: UserRegForm.model_validate(user_body)
+
+    # Inspection of an uploaded archive (body of a process pool task, run in the current process here)
+    archive_path = _build_archive(files=args.archive_files, file_size=args.archive_file_size)
+    limits = InspectionLimits(max_entries=10_000, max_file_size=50 * 1024 * 1024, max_unpacked_size=200 * 1024 * 1024)
+    benchmarks["archive.inspect_package_archive"] = lambda: inspect_package_archive(archive_path, limits)
+
+    # Single file read of the seekable copy of a published archive against a scan from the start of the archive
+    seekable_path = archive_path.replace(".tar.gz", ".seekable.tar.gz")
+    seek_index = inspect_package_archive(archive_path, limits, seekable_path)["seek_index"]
+    last_file = f"src/module_{args.archive_files - 1}.nk"
+    benchmarks["archive.read_member.seek_index"] = lambda: read_archive_member(seekable_path, seek_index, last_file)
+    benchmarks["archive.read_member.full_scan"] = lambda: _scan_member(archive_path, last_file)
+
+    if args.only:
+        benchmarks = {name: function for name, function in benchmarks.items() if args.only in name}
+    return benchmarks
+
+
+# ======= Measurement =======
+
+def measure(function, repeat: int, min_time: float) -> dict:
+    """Per call timings (calibrated loops, several repeats) and allocations of one call"""
+    timer = timeit.Timer(function)
+    number, _ = timer.autorange()
+    number = max(1, int(number * min_time / 0.2))
+    per_call = sorted(total / number for total in timer.repeat(repeat=repeat, number=number))
+    quartiles = statistics.quantiles(per_call, n=4) if len(per_call) > 1 else [per_call[0]] * 3
+
+    # Allocations of a single warmed up call
+    function()
+    tracemalloc.start()
+    before_blocks = len(tracemalloc.take_snapshot().traces)
+    tracemalloc.reset_peak()
+    function()
+    _, peak = tracemalloc.get_traced_memory()
+    after_blocks = len(tracemalloc.take_snapshot().traces)
+    tracemalloc.stop()
+
+    return {
+        "loops": number,
+        "repeat": repeat,
+        "median_us": round(statistics.median(per_call) * 1e6, 3),
+        "min_us": round(per_call[0] * 1e6, 3),
+        "iqr_us": round((quartiles[2] - quartiles[0]) * 1e6, 3),
+        "peak_alloc_bytes": peak,
+        "net_blocks": after_blocks - before_blocks
+    }
+
+
+def find_regressions(results: dict, baseline: dict, threshold: float) -> list:
+    regressions = []
+    for name, result in results.items():
+        before = baseline.get("results", {}).get(name)
+        if not before or not before["median_us"]:
+            continue
+        change = (result["median_us"] - before["median_us"]) / before["median_us"]
+        if change > threshold:
+            regressions.append((name, before["median_us"], result["median_us"], change))
+    return regressions
+
+
+def main(args: argparse.Namespace) -> int:
+    loop = asyncio.new_event_loop()
+    benchmarks = build_benchmarks(args, loop)
+
+    results = {}
+    print(f"{'benchmark':<42}{'median us':>14}{'iqr us':>12}{'min us':>14}{'peak B':>10}{'blocks':>8}")
+    for name, function in benchmarks.items():
+        result = results[name] = measure(function, repeat=args.repeat, min_time=args.min_time)
+        print(f"{name:<42}{result['median_us']:>14}{result['iqr_us']:>12}{result['min_us']:>14}{result['peak_alloc_bytes']:>10}{result['net_blocks']:>8}")
+    loop.close()
+
+    report = {
+        "label": args.label,
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%S%z"),
+        "python": sys.version.split()[0],
+        "config": vars(args),
+        "results": results
+    }
+    output_path = args.output or os.path.join(RESULTS_DIR, f"micro-{time.strftime('%Y%m%d-%H%M%S')}-{args.label}.json")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump(report, output_file, indent=2)
+    print(f"\nResults saved to {output_path}")
+
+    if not args.baseline:
+        return 0
+
+    with open(args.baseline) as baseline_file:
+        regressions = find_regressions(results=results, baseline=json.load(baseline_file), threshold=args.threshold)
+    for name, before, after, change in regressions:
+        print(f"REGRESSION {name}: {before}us -> {after}us ({change:+.1%}, threshold {args.threshold:.0%})")
+    if not regressions:
+        print(f"No regression above {args.threshold:.0%} against {args.baseline}")
+    return 1 if regressions else 0
+
+
+if __name__ == "__main__":
+    arguments = parse_args()
+    prepare_environment()
+    sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    sys.exit(main(arguments))
@@ -0,0 +1,177 @@
+"""
+Worker count / pool size recommendation for this host
+Starts the real server (`scripts/entry_point.sh`, prod profile by default) once per combination of
+`GUNICORN_ARG_WORKERS` and `POSTGRES_POOL_SIZE`, waits for `/health/ready`, drives it with
+`benchmarks/load_test.py --base-url` and prints the combination with the highest throughput that
+stays within the error and p99 budgets.
+
+Needs the PostgreSQL / Memcached servers configured in the environment with seeded packages
+(e.g. one `python -m benchmarks.load_test --backend local` run beforehand).
+Combinations opening more PostgreSQL connections than `--max-connections` are skipped.
+
+Usage:
+    python -m benchmarks.tune_workers --user bench_user_0 --password bench-password
+    python -m benchmarks.tune_workers --workers 2,4,8 --pool-sizes 5,10,20 --duration 30 --max-p99 250
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.error
+import urllib.request
+
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "results")
+
+
+def _default_workers() -> str:
+    cpus = os.cpu_count() or 1
+    return ",".join(str(count) for count in sorted({max(1, cpus // 2), cpus, cpus * 2, cpus * 2 + 1}))
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description="Worker count / pool size recommendation for this host")
+    parser.add_argument("--workers", default=_default_workers(), help="Worker counts to try (default from the CPU count)")
+    parser.add_argument("--pool-sizes", default="5,10,20", help="POSTGRES_POOL_SIZE values to try (per worker)")
+    parser.add_argument("--max-connections", type=int, default=90, help="PostgreSQL connections the API may open in total")
+    parser.add_argument("--profile", choices=("prod", "dev"), default="prod", help="SERVER_PROFILE of the server")
+    parser.add_argument("--port", type=int, default=8687, help="Port of the server under test")
+    parser.add_argument("--ready-timeout", type=float, default=60.0, help="Seconds to wait for /health/ready")
+    parser.add_argument("--concurrency", type=int, default=100, help="load_test: concurrent virtual clients")
+    parser.add_argument("--duration", type=float, default=20.0, help="load_test: measured seconds")
+    parser.add_argument("--warmup", type=float, default=3.0, help="load_test: seconds of traffic before measuring")
+    parser.add_argument("--mix", default=None, help="load_test: weighted scenarios")
+    parser.add_argument("--user", default=None, help="load_test: existing user to log in with")
+    parser.add_argument("--password", default=None, help="load_test: password of that user")
+    parser.add_argument("--max-error-rate", type=float, default=0.01, help="Share of 5xx answers a candidate may have")
+    parser.add_argument("--max-p99", type=float, default=None, help="p99 budget in milliseconds a candidate must meet")
+    parser.add_argument("--output", default=None, help="Result file (default benchmarks/results/tune-<time>.json)")
+    return parser.parse_args(argv)
+
+
+def _wait_ready(url: str, process: subprocess.Popen, timeout: float) -> bool:
+    started_at = time.time()
+    while time.time() - started_at < timeout:
+        if process.poll() is not None:
+            return False
+        try:
+            with urllib.request.urlopen(url, timeout=1) as response:
+                if response.status == 200:
+                    return True
+        except (urllib.error.URLError, ConnectionError, TimeoutError):
+            pass
+        time.sleep(0.2)
+    return False
+
+
+def run_combination(args: argparse.Namespace, workers: int, pool_size: int, log_dir: str) -> dict:
+    """Start the server with one configuration and load it, returns the load_test totals"""
+    environment = dict(
+        os.environ,
+        SERVER_PROFILE=args.profile,
+        GUNICORN_ARG_WORKERS=str(workers),
+        GUNICORN_ARG_BIND_PORT=str(args.port),
+        GUNICORN_ARG_TIMEOUT=os.environ.get("GUNICORN_ARG_TIMEOUT", "60"),
+        GUNICORN_LOG_DIR=log_dir,
+        POSTGRES_POOL_SIZE=str(pool_size),
+        LOG_FILE_PATH=os.path.join(log_dir, "logs.jsonl")
+    )
+    base_url = f"http://127.0.0.1:{args.port}"
+    server = subprocess.Popen(["sh", os.path.join("scripts", "entry_point.sh")], cwd=PROJECT_DIR, env=environment, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not _wait_ready(f"{base_url}/health/ready", server, args.ready_timeout):
+            return {"error": f"not ready after {args.ready_timeout}s (see {log_dir}/error_log.txt)"}
+
+        output_path = os.path.join(log_dir, f"load-w{workers}-p{pool_size}.json")
+        command = [
+            sys.executable, "-m", "benchmarks.load_test",
+            "--base-url", base_url,
+            "--concurrency", str(args.concurrency),
+            "--duration", str(args.duration),
+            "--warmup", str(args.warmup),
+            "--label", f"tune-w{workers}-p{pool_size}",
+            "--output", output_path
+        ]
+        if args.mix:
+            command += ["--mix", args.mix]
+        if args.user and args.password:
+            command += ["--user", args.user, "--password", args.password]
+        completed = subprocess.run(command, cwd=PROJECT_DIR, capture_output=True, text=True)
+        if completed.returncode != 0:
+            return {"error": completed.stderr.strip().splitlines()[-1] if completed.stderr.strip() else "load test failed"}
+
+        with open(output_path) as result_file:
+            total = json.load(result_file)["results"]["total"]
+        return {
+            "throughput_rps": total["throughput_rps"],
+            "error_rate": total["errors"] / total["count"] if total["count"] else 1.0,
+            "latency_ms": total["latency_ms"]
+        }
+    finally:
+        server.terminate()
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            server.kill()
+            server.wait()
+
+
+def pick_best(results: list, max_error_rate: float, max_p99) -> dict:
+    """Highest throughput within the budgets, ties go to fewer connections"""
+    candidates = [
+        result for result in results
+        if "error" not in result
+        and result["error_rate"] <= max_error_rate
+        and (max_p99 is None or result["latency_ms"]["p99"] <= max_p99)
+    ]
+    if not candidates:
+        return {}
+    return max(candidates, key=lambda result: (result["throughput_rps"], -result["workers"] * result["pool_size"]))
+
+
+def main(args: argparse.Namespace) -> int:
+    worker_counts = [int(value) for value in args.workers.split(",") if value.strip()]
+    pool_sizes = [int(value) for value in args.pool_sizes.split(",") if value.strip()]
+    log_dir = tempfile.mkdtemp(prefix="nikl-tune-")
+
+    results = []
+    print(f"{'workers':>8}{'pool':>6}{'conns':>7}{'rps':>10}{'errors':>9}{'p50 ms':>10}{'p99 ms':>10}")
+    for workers in worker_counts:
+        for pool_size in pool_sizes:
+            if workers * pool_size > args.max_connections:
+                print(f"{workers:>8}{pool_size:>6}{workers * pool_size:>7}  skipped, more than {args.max_connections} connections")
+                continue
+            result = dict(run_combination(args, workers=workers, pool_size=pool_size, log_dir=log_dir), workers=workers, pool_size=pool_size)
+            results.append(result)
+            if "error" in result:
+                print(f"{workers:>8}{pool_size:>6}{workers * pool_size:>7}  failed: {result['error']}")
+            else:
+                print(
+                    f"{workers:>8}{pool_size:>6}{workers * pool_size:>7}{result['throughput_rps']:>10}"
+                    f"{result['error_rate']:>9.2%}{result['latency_ms']['p50']:>10}{result['latency_ms']['p99']:>10}"
+                )
+
+    best = pick_best(results, max_error_rate=args.max_error_rate, max_p99=args.max_p99)
+    if best:
+        print(
+            f"\nRecommended for this host ({os.cpu_count()} CPUs): GUNICORN_ARG_WORKERS={best['workers']} "
+            f"POSTGRES_POOL_SIZE={best['pool_size']} ({best['throughput_rps']} rps, p99 {best['latency_ms']['p99']}ms)"
+        )
+    else:
+        print("\nNo combination met the error / p99 budgets")
+
+    output_path = args.output or os.path.join(RESULTS_DIR, f"tune-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    with open(output_path, "w") as output_file:
+        json.dump({"config": {key: value for key, value in vars(args).items() if key != "password"}, "cpus": os.cpu_count(), "results": results, "best": best}, output_file, indent=2)
+    print(f"Results saved to {output_path} (server logs in {log_dir})")
+    return 0 if best else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main(parse_args()))
@@ -1,10 +1,37 @@
+# Runtime profile: "prod" (default) or "dev" (restarts on code changes)
+SERVER_PROFILE=${SERVER_PROFILE:-prod}
+GUNICORN_LOG_DIR=${GUNICORN_LOG_DIR:-/var/log/api}
+
 # Run the gunicorn service
-gunicorn \
+if [ "${SERVER_PROFILE}" = "dev" ]; then
+    # Standard uvicorn worker, the app is imported by every worker (--reload does not work with --preload)
+    exec gunicorn \
+        --workers=${GUNICORN_ARG_WORKERS} \
+        --bind 0.0.0.0:${GUNICORN_ARG_BIND_PORT} \
+        --timeout ${GUNICORN_ARG_TIMEOUT} \
+        --reload --capture-output \
+        --error-logfile ${GUNICORN_LOG_DIR}/error_log.txt \
+        --access-logfile ${GUNICORN_LOG_DIR}/guicorn_log.txt \
+        -k uvicorn.workers.UvicornWorker api.main:app
+fi
+
+# Worker heartbeat files in memory when available (a disk backed /tmp can block the workers)
+WORKER_TMP_DIR=""
+if [ -d /dev/shm ]; then
+    WORKER_TMP_DIR="--worker-tmp-dir /dev/shm"
+fi
+
+# uvloop / httptools workers forked from a preloaded app, recycled after max requests
+# (the jitter keeps them from restarting all at once)
+exec gunicorn \
     --workers=${GUNICORN_ARG_WORKERS} \
-    --threads=${GUNICORN_ARG_THREADS} \
-    --reload --bind 0.0.0.0:${GUNICORN_ARG_BIND_PORT} \
+    --bind 0.0.0.0:${GUNICORN_ARG_BIND_PORT} \
     --timeout ${GUNICORN_ARG_TIMEOUT} \
-    --reload --capture-output \
-    --error-logfile /var/log/api/error_log.txt \
-    --access-logfile /var/log/api/guicorn_log.txt \
-    -k uvicorn.workers.UvicornWorker api.main:app
+    --preload \
+    --max-requests ${GUNICORN_ARG_MAX_REQUESTS:-10000} \
+    --max-requests-jitter ${GUNICORN_ARG_MAX_REQUESTS_JITTER:-1000} \
+    ${WORKER_TMP_DIR} \
+    --capture-output \
+    --error-logfile ${GUNICORN_LOG_DIR}/error_log.txt \
+    --access-logfile ${GUNICORN_LOG_DIR}/guicorn_log.txt \
+    -k api.workers.ProductionUvicornWorker api.main:app
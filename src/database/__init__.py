@@ -2,7 +2,15 @@
 All the Database related functions are defined here
 """
 
-from .connections import PostgresDep, MemcachedDep, lifespan
+from .connections import PostgresDep, PostgresPoolDep, MemcachedDep, OptionalMemcachedDep
+from .lifespan import lifespan
+from .warm_up import health_report
+from .job_queue import enqueue_job, job_runner
+from .metadata_filter import parse_metadata_filter
+from .change_log import get_package_changes
+from .catalog_export import open_catalog_export
+from .downloads import download_counter, get_version_download_counts, get_base_download_counts
+from .package_scores import RECOMPUTE_PACKAGE_SCORES, recompute_package_scores, schedule_package_scores, refresh_package_scores_after_publish
 from .user_handler import (
     create_new_user,
     get_user_by_name,
@@ -15,13 +23,26 @@ from .user_handler import (
     delete_api_key_by_id,
     get_api_key_details
 )
+from .session_handler import (
+    create_user_session,
+    get_user_session,
+    session_csrf_matches,
+    delete_user_session,
+    invalidate_all_user_sessions,
+    list_user_sessions,
+    find_session_id_by_reference
+)
 from .package_handler import (
     create_base_package,
     get_base_package_details_by_id,
     search_base_packages,
+    filter_base_packages,
+    filter_versioned_packages,
+    get_owned_base_package_id,
     create_versioned_package,
     get_versioned_package_details,
-    get_all_versioned_packages
+    get_all_versioned_packages,
+    get_package_file_content
 )
 
 
@@ -31,8 +52,13 @@ __version__ = "v3.1.2-phoenix-release"
 __annotations__ = {
     "version": __version__,
     "PostgresDep": "PostgresSQL connection dependency for FastAPI",
+    "PostgresPoolDep": "PostgresSQL pool dependency for FastAPI (connection acquired on demand)",
     "MemcachedDep": "Memcached connection dependency for FastAPI",
+    "OptionalMemcachedDep": "Memcached connection dependency for FastAPI, None while the cache tier is unavailable",
     "lifespan": "Lifespan context manager for FastAPI to manage database connections",
+    "health_report": "Function to report the readiness of the worker and the state of its pools",
+    "enqueue_job": "Function to queue a durable background job",
+    "job_runner": "Background job runner of the worker, registers the job handlers",
     "create_new_user": "Function to create a new user in the database",
     "get_user_by_name": "Function to get user details by user name",
     "get_user_profile_details_by_id": "Function to get user profile details by user ID",
@@ -43,19 +69,45 @@ __annotations__ = {
     "edit_api_key_details_by_id": "Function to edit API key details by API key ID",
     "delete_api_key_by_id": "Function to delete an API key by API key ID",
     "get_api_key_details": "Function to get API key details by API key ID",
+    "create_user_session": "Function to store a new user session in the cache",
+    "get_user_session": "Function to get a valid user session from its session cookie",
+    "session_csrf_matches": "Function to check the request CSRF token against a session",
+    "delete_user_session": "Function to delete a single user session",
+    "invalidate_all_user_sessions": "Function to log a user out of every session at once",
+    "list_user_sessions": "Function to list the active sessions of a user",
+    "find_session_id_by_reference": "Function to resolve a public session reference to its session ID",
     "create_base_package": "Function to create a new base package",
     "get_base_package_details_by_id": "Function to get base package details by ID",
     "search_base_packages": "Function to search for base packages by name or description",
+    "filter_base_packages": "Function to filter base packages by metadata (containment / key existence)",
+    "filter_versioned_packages": "Function to filter versioned packages by metadata (containment / key existence)",
+    "parse_metadata_filter": "Function to parse and check the metadata filter query parameters",
+    "get_package_changes": "Function to get a batch of the catalog changes after a sequence number",
+    "open_catalog_export": "Function to start a catalog export, returns the NDJSON stream read from a server-side cursor",
+    "download_counter": "Write-behind download counters of this worker (Memcached, flushed into PostgreSQL)",
+    "get_version_download_counts": "Function to get the total and daily downloads of a versioned package",
+    "get_base_download_counts": "Function to get the total and daily downloads of a base package",
+    "RECOMPUTE_PACKAGE_SCORES": "Job kind recomputing the popularity scores of the search ranking",
+    "recompute_package_scores": "Function to recompute the popularity score of every base package",
+    "schedule_package_scores": "Function to queue the next periodic recompute of the popularity scores",
+    "refresh_package_scores_after_publish": "Function to queue a recompute of the popularity scores after a publish",
+    "get_owned_base_package_id": "Function to get the ID of a base package of a user by name",
     "create_versioned_package": "Function to create a new versioned package",
     "get_versioned_package_details": "Function to get versioned package details by ID",
-    "get_all_versioned_packages": "Function to get all versioned packages for a base package"
+    "get_all_versioned_packages": "Function to get all versioned packages for a base package",
+    "get_package_file_content": "Function to get a file of a published archive (cached, base64 encoded)"
 }
 
 
 __all__ = [
     "PostgresDep",
+    "PostgresPoolDep",
     "MemcachedDep",
+    "OptionalMemcachedDep",
     "lifespan",
+    "health_report",
+    "enqueue_job",
+    "job_runner",
     "create_new_user",
     "get_user_by_name",
     "get_user_profile_details_by_id",
@@ -66,10 +118,31 @@ __all__ = [
     "edit_api_key_details_by_id",
     "delete_api_key_by_id",
     "get_api_key_details",
+    "create_user_session",
+    "get_user_session",
+    "session_csrf_matches",
+    "delete_user_session",
+    "invalidate_all_user_sessions",
+    "list_user_sessions",
+    "find_session_id_by_reference",
     "create_base_package",
     "get_base_package_details_by_id",
     "search_base_packages",
+    "filter_base_packages",
+    "filter_versioned_packages",
+    "parse_metadata_filter",
+    "get_package_changes",
+    "open_catalog_export",
+    "download_counter",
+    "get_version_download_counts",
+    "get_base_download_counts",
+    "RECOMPUTE_PACKAGE_SCORES",
+    "recompute_package_scores",
+    "schedule_package_scores",
+    "refresh_package_scores_after_publish",
+    "get_owned_base_package_id",
     "create_versioned_package",
     "get_versioned_package_details",
-    "get_all_versioned_packages"
+    "get_all_versioned_packages",
+    "get_package_file_content"
 ]
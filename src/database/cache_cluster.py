@@ -0,0 +1,296 @@
+"""
+Multi-node Memcached client
+1. **HashRing**:
+    - Consistent hash ring with virtual nodes, so adding or losing a node only moves its share of keys.
+2. **CacheNode**:
+    - One Memcached server with its own connection pool, health state and latency stats.
+    - A command cancelled midway (timeout, client disconnect) closes its connection, the reply may still be
+      unread and would be read by the next command of that connection otherwise.
+    - After repeated failures a node is ejected and retried after an exponential backoff.
+    - A node coming back from an ejection is flushed before its first command: its keys were served by
+      another node meanwhile, what it still holds is stale (invalidated sessions, old generations).
+3. **ShardedMemcachedClient**:
+    - Implements the subset of the `aiomcache.Client` API used by the project, routing every key
+      to the first healthy node of the ring (keys of ejected nodes fail over to the next node).
+    - An optional circuit breaker makes every call fail fast while the whole tier is down.
+"""
+
+from src.utils.base.libraries import aiomcache, Optional, asyncio, hashlib, logging, bisect, time
+from src.utils.base.constants import (
+    MEMCACHED_DB_POOL_SIZE,
+    MEMCACHED_VIRTUAL_NODES,
+    MEMCACHED_OP_TIMEOUT,
+    MEMCACHED_FAILURE_THRESHOLD,
+    MEMCACHED_RETRY_BACKOFF,
+    MEMCACHED_MAX_RETRY_BACKOFF
+)
+
+
+# Errors meaning the node itself is unreachable or too slow (not a bad request)
+NODE_ERRORS = (OSError, asyncio.TimeoutError, ConnectionError, asyncio.IncompleteReadError)
+
+
+def _is_node_error(error: Exception) -> bool:
+    """Whether an error means the node is down (aiomcache reports a connection closed by the server as an empty reply)"""
+    if isinstance(error, aiomcache.exceptions.ClientException):
+        return str(error).endswith(": b''")
+    return isinstance(error, NODE_ERRORS)
+
+
+class CacheUnavailableError(Exception):
+    """Raised when no cache node can serve a request"""
+
+
+def parse_servers(servers: str) -> list:
+    """Parse `host:port,host:port` into a list of (host, port)"""
+    parsed = []
+    for server in servers.split(","):
+        server = server.strip()
+        if not server:
+            continue
+        host, _, port = server.rpartition(":")
+        parsed.append((host or server, int(port) if host else 11211))
+    return parsed
+
+
+def _hash(value: bytes) -> int:
+    return int.from_bytes(hashlib.md5(value, usedforsecurity=False).digest()[:8], "big")
+
+
+class _DiscardingPool(aiomcache.pool.MemcachePool):
+    """
+    aiomcache pool closing the connections released by a cancelled command
+    (aiomcache only marks a connection broken on `Exception`, cancellation is a `BaseException`)
+    """
+    def release(self, conn) -> None:
+        task = asyncio.current_task()
+        if task is not None and task.cancelling():
+            self._in_use.discard(conn)
+            self._do_close(conn)
+            return
+        super().release(conn)
+
+
+class _NodeClient(aiomcache.Client):
+    """aiomcache client of a node, with a connection pool safe to cancel"""
+    def __init__(self, host: str, port: int, pool_size: int, pool_minsize: int):
+        super().__init__(host=host, port=port, pool_minsize=pool_minsize, pool_size=pool_size)
+        self._pool = _DiscardingPool(host, port, minsize=pool_minsize, maxsize=pool_size)
+
+
+class CacheNode:
+    """A single Memcached server"""
+    def __init__(self, host: str, port: int, pool_size: int = MEMCACHED_DB_POOL_SIZE):
+        self.host = host
+        self.port = port
+        self.name = f"{host}:{port}"
+        self.client = _NodeClient(
+            host=host,
+            port=port,
+            pool_minsize=max(1, int(pool_size / 2)),
+            pool_size=pool_size
+        )
+        self.consecutive_failures = 0
+        self.ejected_until = 0.0
+        self.backoff = MEMCACHED_RETRY_BACKOFF
+        self.needs_flush = False
+        self.flush_lock = asyncio.Lock()
+        self.flushes = 0
+        self.calls = 0
+        self.errors = 0
+        self.latency_ewma = 0.0
+
+    @property
+    def available(self) -> bool:
+        """Healthy, or ejected but due for a retry"""
+        return time.monotonic() >= self.ejected_until
+
+    def record_success(self, latency: float) -> None:
+        self.calls += 1
+        self.latency_ewma = latency if not self.latency_ewma else 0.9 * self.latency_ewma + 0.1 * latency
+        if self.consecutive_failures:
+            logging.info(f"Memcached node {self.name} is healthy again")
+        self.consecutive_failures = 0
+        self.backoff = MEMCACHED_RETRY_BACKOFF
+
+    def record_failure(self) -> None:
+        self.calls += 1
+        self.errors += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= MEMCACHED_FAILURE_THRESHOLD:
+            # Eject the node, a single retry is allowed once the backoff elapsed
+            self.ejected_until = time.monotonic() + self.backoff
+            self.needs_flush = True
+            logging.warning(f"Memcached node {self.name} ejected for {self.backoff}s after {self.consecutive_failures} failures")
+            self.backoff = min(self.backoff * 2, MEMCACHED_MAX_RETRY_BACKOFF)
+
+    def stats(self) -> dict:
+        pool = getattr(self.client, "_pool", None)
+        return {
+            "node": self.name,
+            "healthy": self.consecutive_failures < MEMCACHED_FAILURE_THRESHOLD,
+            "ejected_for": round(max(0.0, self.ejected_until - time.monotonic()), 3),
+            "calls": self.calls,
+            "errors": self.errors,
+            "flushes": self.flushes,
+            "latency_ewma_ms": round(self.latency_ewma * 1000, 3),
+            "pool_size": pool.size() if pool is not None else None
+        }
+
+
+class HashRing:
+    """Consistent hash ring with virtual nodes"""
+    def __init__(self, nodes: list, virtual_nodes: int = MEMCACHED_VIRTUAL_NODES):
+        self.nodes = nodes
+        points = sorted(
+            (_hash(f"{node.name}-{index}".encode("utf-8")), position)
+            for position, node in enumerate(nodes)
+            for index in range(virtual_nodes)
+        )
+        self._hashes = [point for point, _ in points]
+        self._positions = [position for _, position in points]
+
+    def iter_nodes(self, key: bytes):
+        """Distinct nodes clockwise from the key position (the first one owns the key)"""
+        if not self._hashes:
+            return
+        start = bisect.bisect(self._hashes, _hash(key)) % len(self._hashes)
+        seen = set()
+        for offset in range(len(self._hashes)):
+            position = self._positions[(start + offset) % len(self._hashes)]
+            if position not in seen:
+                seen.add(position)
+                yield self.nodes[position]
+                if len(seen) == len(self.nodes):
+                    return
+
+
+class ShardedMemcachedClient:
+    """
+    Memcached client sharding keys over several servers
+    servers: List of (host, port)
+    breaker: Optional circuit breaker (`before_call`, `release_probe`, `record_success`, `record_failure`) guarding every call
+    """
+    def __init__(self, servers: list, pool_size: int = MEMCACHED_DB_POOL_SIZE, virtual_nodes: int = MEMCACHED_VIRTUAL_NODES, op_timeout: float = MEMCACHED_OP_TIMEOUT, breaker=None):
+        if not servers:
+            raise ValueError("At least one Memcached server is required")
+        self.nodes = [CacheNode(host=host, port=port, pool_size=pool_size) for host, port in servers]
+        self.ring = HashRing(nodes=self.nodes, virtual_nodes=virtual_nodes)
+        self.op_timeout = op_timeout
+        self.breaker = breaker
+
+    async def _guarded(self, operation):
+        """Run an operation through the circuit breaker (when there is one)"""
+        if self.breaker is None:
+            return await operation()
+
+        probe = self.breaker.before_call()
+        try:
+            result = await operation()
+        except CacheUnavailableError:
+            self.breaker.record_failure()
+            raise
+        # Other errors (e.g. an invalid key) and cancellations say nothing of the cache tier, they only free the probe
+        finally:
+            if probe:
+                self.breaker.release_probe()
+        self.breaker.record_success()
+        return result
+
+    def node_for(self, key: bytes) -> CacheNode:
+        """First available node owning the key"""
+        for node in self.ring.iter_nodes(key):
+            if node.available:
+                return node
+        raise CacheUnavailableError("No Memcached node is available")
+
+    async def _flush_rejoining(self, node: CacheNode) -> None:
+        """Flush a node back from an ejection before it serves its keys again (once, concurrent calls wait)"""
+        async with node.flush_lock:
+            if not node.needs_flush:
+                return
+            await asyncio.wait_for(node.client.flush_all(), timeout=self.op_timeout)
+            node.needs_flush = False
+            node.flushes += 1
+            logging.warning(f"Memcached node {node.name} flushed, it was ejected and its data is stale")
+
+    async def _call(self, node: CacheNode, method: str, *args, **kwargs):
+        """Run a client method on a node with a timeout, tracking its health"""
+        started_at = time.perf_counter()
+        try:
+            if node.needs_flush:
+                await self._flush_rejoining(node)
+            result = await asyncio.wait_for(getattr(node.client, method)(*args, **kwargs), timeout=self.op_timeout)
+        except Exception as e:
+            if not _is_node_error(e):
+                raise
+            node.record_failure()
+            raise CacheUnavailableError(f"Memcached node {node.name} failed on {method}: {e!r}") from e
+        node.record_success(time.perf_counter() - started_at)
+        return result
+
+    async def _route(self, method: str, key: bytes, *args, **kwargs):
+        """Run a single key operation on the node owning the key, failing over once"""
+        async def operation():
+            node = self.node_for(key)
+            try:
+                return await self._call(node, method, key, *args, **kwargs)
+            except CacheUnavailableError:
+                if node.available:
+                    raise
+                # The node was just ejected, its keys now belong to the next node of the ring
+                return await self._call(self.node_for(key), method, key, *args, **kwargs)
+
+        return await self._guarded(operation)
+
+    async def get(self, key: bytes, default=None):
+        return await self._route("get", key, default)
+
+    async def gets(self, key: bytes, default=None):
+        return await self._route("gets", key, default)
+
+    async def set(self, key: bytes, value: bytes, exptime: int = 0) -> bool:
+        return await self._route("set", key, value, exptime=exptime)
+
+    async def add(self, key: bytes, value: bytes, exptime: int = 0) -> bool:
+        return await self._route("add", key, value, exptime=exptime)
+
+    async def cas(self, key: bytes, value: bytes, cas_token: int, exptime: int = 0) -> bool:
+        return await self._route("cas", key, value, cas_token, exptime=exptime)
+
+    async def delete(self, key: bytes) -> bool:
+        return await self._route("delete", key)
+
+    async def incr(self, key: bytes, increment: int = 1) -> Optional[int]:
+        return await self._route("incr", key, increment)
+
+    async def decr(self, key: bytes, decrement: int = 1) -> Optional[int]:
+        return await self._route("decr", key, decrement)
+
+    async def touch(self, key: bytes, exptime: int) -> bool:
+        return await self._route("touch", key, exptime)
+
+    async def multi_get(self, *keys: bytes) -> tuple:
+        """Get several keys, one request per node, results in the order of the keys"""
+        async def operation():
+            keys_by_node: dict = {}
+            for key in keys:
+                keys_by_node.setdefault(self.node_for(key), []).append(key)
+
+            node_keys = list(keys_by_node.items())
+            results = await asyncio.gather(*(self._call(node, "multi_get", *node_key_list) for node, node_key_list in node_keys))
+
+            values = {}
+            for (_, node_key_list), node_values in zip(node_keys, results):
+                values.update(zip(node_key_list, node_values))
+            return tuple(values[key] for key in keys)
+
+        return await self._guarded(operation)
+
+    async def close(self) -> None:
+        for node in self.nodes:
+            await node.client.close()
+
+    def node_stats(self) -> list:
+        """Per node pool, health and latency stats"""
+        return [node.stats() for node in self.nodes]
@@ -0,0 +1,118 @@
+"""
+Export of the whole catalog as NDJSON (one line per base package, with its versions)
+1. **Snapshot**:
+    - Rows are read from a server-side cursor in a read-only repeatable read transaction, so the export is consistent.
+2. **Memory**:
+    - Rows are fetched `EXPORT_PREFETCH` at a time and lines are sent in chunks of `EXPORT_CHUNK_SIZE`,
+      memory stays flat whatever the catalog size.
+3. **Backpressure**:
+    - The next chunk is produced once the previous one was sent, a slow client slows the cursor down;
+      a client that stops reading for `EXPORT_IDLE_TIMEOUT` seconds ends the export (and frees the connection).
+4. **Start**:
+    - The export slot and the pool connection are held before the response starts, so a busy worker or pool
+      is a `503` and not a response cut after its headers; they are released when the stream ends or is closed.
+"""
+
+from src.utils.base.libraries import AsyncGenerator, TypeAlias, asyncio, orjson, zlib, status
+from src.utils.base.constants import EXPORT_MAX_CONCURRENT, EXPORT_PREFETCH, EXPORT_IDLE_TIMEOUT
+from src.utils.models import All_Exceptions
+from .connections import Database
+
+
+PgPool: TypeAlias = Database
+
+
+EXPORT_CHUNK_SIZE = 64 * 1024
+EXPORT_QUERY = (
+    "SELECT b.id, b.package_name, b.package_description, b.user_id, b.registered_at, b.metadata, "
+    "v.id AS version_id, v.version, v.file_path, v.created_at AS version_created_at, "
+    "v.metadata->>'sha256' AS sha256, (v.metadata->>'size')::BIGINT AS size "
+    "FROM base_packages b LEFT JOIN versioned_packages v ON v.base_package_id = b.id "
+    "ORDER BY b.id, v.created_at"
+)
+
+# Running exports of this worker (each one holds a pool connection)
+_export_slots = asyncio.Semaphore(EXPORT_MAX_CONCURRENT)
+
+
+def _version(row) -> dict:
+    return {
+        "id": row["version_id"],
+        "version": row["version"],
+        "file_path": row["file_path"],
+        "sha256": row["sha256"],
+        "size": row["size"],
+        "created_at": row["version_created_at"]
+    }
+
+
+async def _stream_catalog_export(db_pool: PgPool, compress: bool) -> AsyncGenerator[bytes, None]:
+    """
+    Stream the catalog as NDJSON chunks (gzip when `compress`)
+    The first item is an empty chunk, yielded once the export slot and the connection are held
+    """
+    # Every running export holds a pool connection, so they are limited per worker
+    if _export_slots.locked():
+        raise All_Exceptions(
+            message="An export is already running, please retry later",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": "30"}
+        )
+
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+    buffer = bytearray()
+
+    def take_chunk() -> bytes:
+        chunk = compressor.compress(buffer) if compressor else bytes(buffer)
+        buffer.clear()
+        return chunk
+
+    async with _export_slots:
+        async with db_pool.get_connection() as db_session:
+            async with db_session.transaction(isolation="repeatable_read", readonly=True):
+                await db_session.execute(
+                    "SELECT set_config('idle_in_transaction_session_timeout', $1, true)",
+                    str(int(EXPORT_IDLE_TIMEOUT * 1000))
+                )
+                yield b""
+
+                # Rows of a base package are adjacent (ordered by base package id)
+                package = None
+                async for row in db_session.cursor(EXPORT_QUERY, prefetch=EXPORT_PREFETCH):
+                    if package is None or package["id"] != row["id"]:
+                        if package is not None:
+                            buffer += orjson.dumps(package, option=orjson.OPT_APPEND_NEWLINE)
+                        package = {
+                            "id": row["id"],
+                            "package_name": row["package_name"],
+                            "package_description": row["package_description"],
+                            "user_id": row["user_id"],
+                            "registered_at": row["registered_at"],
+                            "metadata": row["metadata"],
+                            "versions": []
+                        }
+                    if row["version_id"] is not None:
+                        package["versions"].append(_version(row))
+
+                    if len(buffer) >= EXPORT_CHUNK_SIZE:
+                        chunk = take_chunk()
+                        if chunk:
+                            yield chunk
+
+                if package is not None:
+                    buffer += orjson.dumps(package, option=orjson.OPT_APPEND_NEWLINE)
+
+    chunk = take_chunk() + (compressor.flush() if compressor else b"")
+    if chunk:
+        yield chunk
+
+
+async def open_catalog_export(db_pool: PgPool, compress: bool = False) -> AsyncGenerator[bytes, None]:
+    """
+    Start a catalog export, `503` when this worker already runs `EXPORT_MAX_CONCURRENT` exports or the pool is busy
+    Returns the stream of its chunks, holding the export slot and the connection until it ends or is closed
+    """
+    stream = _stream_catalog_export(db_pool=db_pool, compress=compress)
+    # Runs up to the empty first chunk (a started generator is closed by the event loop even if never iterated again)
+    await anext(stream)
+    return stream
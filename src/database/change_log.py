@@ -0,0 +1,66 @@
+"""
+Change log of the package catalog (`package_changes`), so mirrors and caching clients sync with "changes since <seq>"
+1. **Writes**:
+    - A change is recorded in the transaction of the change itself (committed or rolled back with it).
+    - Writers take a transaction level advisory lock before their sequence number, so sequence numbers are
+      committed in order: once a reader sees `seq`, no change with a lower `seq` can show up later.
+2. **Reads**:
+    - `seq > since ORDER BY seq LIMIT n` on the primary key, the cost follows what changed and not the catalog size.
+"""
+
+from src.utils.base.libraries import asyncpg, TypeAlias, Optional
+from .connections import Database
+from .single_flight import single_flight
+
+
+PgSession: TypeAlias = asyncpg.Connection
+PgPool: TypeAlias = Database
+
+
+# Change kinds
+BASE_PACKAGE_CREATED = "base_package.created"
+VERSIONED_PACKAGE_CREATED = "versioned_package.created"
+
+# Advisory lock serializing the writers of the change log (arbitrary, unique to this use in the database)
+CHANGE_LOG_LOCK_KEY = 4_711_001
+
+MAX_CHANGES_BATCH = 1000
+
+RECORD_CHANGE_QUERY = (
+    "INSERT INTO package_changes (kind, base_package_id, versioned_package_id, package_name, version) "
+    "VALUES ($1, $2, $3, $4, $5) RETURNING seq"
+)
+CHANGES_SINCE_QUERY = (
+    "SELECT seq, kind, base_package_id, versioned_package_id, package_name, version, created_at "
+    "FROM package_changes WHERE seq > $1 ORDER BY seq LIMIT $2"
+)
+
+
+async def record_package_change(db_session: PgSession, kind: str, base_package_id: str, package_name: str, versioned_package_id: Optional[str] = None, version: Optional[str] = None) -> int:
+    """
+    Record a change of the catalog, must run in the transaction making the change (returns its sequence number)
+    """
+    if not db_session.is_in_transaction():
+        raise RuntimeError("Package changes must be recorded in the transaction of the change")
+
+    # Held until the commit, so sequence numbers become visible in order
+    await db_session.execute("SELECT pg_advisory_xact_lock($1)", CHANGE_LOG_LOCK_KEY)
+    return await db_session.fetchval(RECORD_CHANGE_QUERY, kind, base_package_id, versioned_package_id, package_name, version)
+
+
+@single_flight(namespace="package_changes")
+async def get_package_changes(db_pool: PgPool, since: int = 0, limit: int = 100) -> dict:
+    """
+    Get a batch of the changes after `since`, `next_since` is the `since` of the next batch
+    """
+    limit = max(1, min(limit, MAX_CHANGES_BATCH))
+    async with db_pool.get_connection() as db_session:
+        # One extra row tells whether another batch follows
+        rows = await db_session.fetch(CHANGES_SINCE_QUERY, since, limit + 1)
+
+    changes = [dict(row) for row in rows[:limit]]
+    return {
+        "changes": changes,
+        "next_since": changes[-1]["seq"] if changes else since,
+        "has_more": len(rows) > limit
+    }
@@ -0,0 +1,99 @@
+"""
+Circuit breaker for the cache tier
+Once too many consecutive calls fail the circuit opens and every call fails fast (no timeout
+wait), after `reset_timeout` a limited number of probe calls are let through (half-open) and
+the circuit closes again as soon as one of them succeeds (a probe cancelled midway
+or failing on its own request, e.g. an invalid key, only frees its slot: only node errors count)
+"""
+
+from src.utils.base.libraries import logging, time
+from src.utils.base.constants import CACHE_BREAKER_FAILURE_THRESHOLD, CACHE_BREAKER_RESET_TIMEOUT, CACHE_BREAKER_HALF_OPEN_CALLS
+from .cache_cluster import CacheUnavailableError
+
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+
+class CircuitOpenError(CacheUnavailableError):
+    """Raised without calling the cache while the circuit is open"""
+    def __init__(self, message: str, retry_after: float):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class CircuitBreaker:
+    """
+    Consecutive failures based circuit breaker
+    name: Name used in logs
+    failure_threshold: Consecutive failures opening the circuit
+    reset_timeout: Seconds the circuit stays open before probing
+    half_open_calls: Concurrent probe calls allowed while half-open
+    """
+    def __init__(self, name: str, failure_threshold: int = CACHE_BREAKER_FAILURE_THRESHOLD, reset_timeout: float = CACHE_BREAKER_RESET_TIMEOUT, half_open_calls: int = CACHE_BREAKER_HALF_OPEN_CALLS):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_calls = half_open_calls
+        self.state = CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self.probes_in_flight = 0
+        self.rejected_calls = 0
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are rejected without being tried"""
+        return self.state == OPEN and time.monotonic() - self.opened_at < self.reset_timeout
+
+    def before_call(self) -> bool:
+        """
+        Let the call through or fail fast
+        Returns whether the call is a half-open probe, its slot must then be freed with `release_probe`
+        """
+        if self.state == CLOSED:
+            return False
+
+        if self.state == OPEN:
+            remaining = self.reset_timeout - (time.monotonic() - self.opened_at)
+            if remaining > 0:
+                self.rejected_calls += 1
+                raise CircuitOpenError(message=f"{self.name} circuit is open", retry_after=remaining)
+            self.state = HALF_OPEN
+            logging.info(f"{self.name} circuit half-open, probing")
+
+        if self.probes_in_flight >= self.half_open_calls:
+            self.rejected_calls += 1
+            raise CircuitOpenError(message=f"{self.name} circuit is half-open", retry_after=self.reset_timeout)
+        self.probes_in_flight += 1
+        return True
+
+    def release_probe(self) -> None:
+        """Free the slot of a finished probe (whatever its outcome)"""
+        self.probes_in_flight = max(0, self.probes_in_flight - 1)
+
+    def record_success(self) -> None:
+        if self.state != CLOSED:
+            logging.info(f"{self.name} circuit closed")
+        self.state = CLOSED
+        self.consecutive_failures = 0
+
+    def record_failure(self) -> None:
+        if self.state == HALF_OPEN:
+            self._open()
+            return
+
+        self.consecutive_failures += 1
+        if self.state == CLOSED and self.consecutive_failures >= self.failure_threshold:
+            self._open()
+
+    def _open(self) -> None:
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        logging.warning(f"{self.name} circuit opened after {self.consecutive_failures} consecutive failures")
+
+    def stats(self) -> dict:
+        return {
+            "state": OPEN if self.is_open else (HALF_OPEN if self.state != CLOSED else CLOSED),
+            "consecutive_failures": self.consecutive_failures,
+            "rejected_calls": self.rejected_calls
+        }
@@ -5,21 +5,31 @@ It includes the following components:
    - A class `Database` that manages the connection pool for PostgreSQL.
    - It provides methods to create a connection pool, acquire a connection, and close the pool.
 2. **Memcached Database Connection**:
-    - A class `MemcachedClient` that manages the connection to Memcached.
+    - A class `MemcachedClient` that manages the connection to the Memcached servers (sharded with consistent hashing).
     - It provides methods to initialize the client, close the client, and get the client instance.
+    - Every call goes through a circuit breaker, so a down cache tier fails fast instead of waiting for timeouts.
 3. **Dependency Injection**:
     - `get_db` and `get_cache_client` functions that provide the PostgreSQL and Memcached clients respectively.
-4. **Lifespan Context Manager**:
-    - A context manager `lifespan` that initializes and closes the database connections when the FastAPI application starts and stops.
+    - `get_db_pool` provides the PostgreSQL pool manager itself, for handlers acquiring a connection lazily.
+    - `get_optional_cache_client` provides the Memcached client or `None` while the cache tier is down (read paths fall through to PostgreSQL).
+The `lifespan` context manager opening and closing them is in `lifespan.py`
 """
 
-from src.utils.base.libraries import Depends, status, asyncpg, aiomcache, logging, asynccontextmanager, Annotated, AsyncGenerator, Optional, FastAPI
-from src.utils.base.constants import POSTGRES_DB_URI, POSTGRES_POOL_SIZE, MEMCACHED_DB_HOST, MEMCACHED_DB_PORT, MEMCACHED_DB_POOL_SIZE
+from src.utils.base.libraries import Depends, status, asyncpg, aiomcache, orjson, asyncio, math, time, logging, asynccontextmanager, Annotated, AsyncGenerator, Optional
+from src.utils.base.constants import POSTGRES_DB_URI, POSTGRES_POOL_SIZE, POSTGRES_ACQUIRE_TIMEOUT, MEMCACHED_SERVERS, MEMCACHED_DB_POOL_SIZE, ADMISSION_RETRY_AFTER
+from .cache_cluster import ShardedMemcachedClient, CacheUnavailableError, parse_servers
+from .circuit_breaker import CircuitBreaker, CircuitOpenError
+from src.utils.http.admission import admission_controller
 from src.utils.models import All_Exceptions
 
 
 # ======= PostgreSQL DB Connection =======
 
+def _json_encoder(value) -> str:
+    """Encode a Python object into JSON text for JSON / JSONB columns"""
+    return orjson.dumps(value).decode("utf-8")
+
+
 class Database:
     """PostgreSQL database connection pool manager"""
     def __init__(self):
@@ -34,7 +44,8 @@ class Database:
                     POSTGRES_DB_URI,
                     min_size=int(POSTGRES_POOL_SIZE / 2),
                     max_size=POSTGRES_POOL_SIZE,
-                    max_inactive_connection_lifetime=300   # 5 minutes
+                    max_inactive_connection_lifetime=300,   # 5 minutes
+                    init=self._init_connection
                 )
                 logging.debug("PostgreSQL connection pool created successfully")
 
@@ -46,16 +57,54 @@ class Database:
                 logging.error(f"Unexpected error while creating connection pool: {e}", exc_info=True)
                 raise
 
+    @staticmethod
+    async def _init_connection(connection: asyncpg.Connection) -> None:
+        """Register JSON / JSONB codecs on every new pool connection (decoded once in the driver)"""
+        for type_name in ("json", "jsonb"):
+            await connection.set_type_codec(
+                type_name,
+                encoder=_json_encoder,
+                decoder=orjson.loads,
+                schema="pg_catalog",
+                format="text"
+            )
+
     @asynccontextmanager
     async def get_connection(self) -> AsyncGenerator[asyncpg.Connection, None]:
-        """Get database connection from pool"""
+        """Get database connection from pool, failing fast when the pool stays exhausted"""
         if not self.pool:
             await self.create_pool()
-        async with self.pool.acquire() as connection:
+
+        started_at = time.perf_counter()
+        try:
+            connection = await self.pool.acquire(timeout=POSTGRES_ACQUIRE_TIMEOUT)
+        except asyncio.TimeoutError:
+            admission_controller.record_pool_wait(time.perf_counter() - started_at)
+            logging.warning(f"Timed out after {POSTGRES_ACQUIRE_TIMEOUT}s waiting for a PostgreSQL connection")
+            raise All_Exceptions(
+                message="Database is busy, please retry later",
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                headers={"Retry-After": str(ADMISSION_RETRY_AFTER)}
+            )
+        admission_controller.record_pool_wait(time.perf_counter() - started_at)
+
+        try:
             logging.info("Pool of connections acquired for PostgreSQL DB successfully")
             yield connection
+        finally:
+            await self.pool.release(connection)
             logging.info("Connection released back to the pool")
 
+    def pool_stats(self) -> dict:
+        """Current size and usage of the connection pool"""
+        if not self.pool:
+            return {"size": 0, "idle": 0, "max_size": POSTGRES_POOL_SIZE}
+        return {
+            "size": self.pool.get_size(),
+            "idle": self.pool.get_idle_size(),
+            "max_size": self.pool.get_max_size()
+        }
+
     async def close(self):
         """Close the pool when shutting down"""
         if self.pool:
@@ -72,23 +121,29 @@ async def get_db() -> AsyncGenerator[asyncpg.Connection, None]:
         yield conn
 
 
+async def get_db_pool() -> AsyncGenerator[Database, None]:
+    """Dependency for routes acquiring a connection only when they actually query (coalesced reads)"""
+    yield db
+
+
 PostgresDep = Annotated[asyncpg.Connection, Depends(get_db)]
+PostgresPoolDep = Annotated[Database, Depends(get_db_pool)]
 
 
 # ======= Memcached DB Connection =======
 
 class MemcachedClient:
-    client: Optional[aiomcache.Client] = None
+    client: Optional[ShardedMemcachedClient] = None
+    breaker: CircuitBreaker = CircuitBreaker(name="Memcached")
 
     @classmethod
     async def initialize(cls):
-        """Initialize the Memcached client with connection pooling"""
+        """Initialize the Memcached client (one connection pool per server)"""
         if not cls.client:
-            cls.client = aiomcache.Client(
-                host=MEMCACHED_DB_HOST,
-                port=int(MEMCACHED_DB_PORT),
-                pool_minsize=int(MEMCACHED_DB_POOL_SIZE / 2),
-                pool_size=int(MEMCACHED_DB_POOL_SIZE)
+            cls.client = ShardedMemcachedClient(
+                servers=parse_servers(MEMCACHED_SERVERS),
+                pool_size=int(MEMCACHED_DB_POOL_SIZE),
+                breaker=cls.breaker
             )
 
     @classmethod
@@ -99,7 +154,7 @@ class MemcachedClient:
             cls.client = None
 
     @classmethod
-    def get_client(cls) -> aiomcache.Client:
+    def get_client(cls) -> ShardedMemcachedClient:
         """Get the Memcached client instance"""
         if not cls.client:
             raise All_Exceptions(
@@ -108,48 +163,38 @@ class MemcachedClient:
             )
         return cls.client
 
+    @classmethod
+    def get_optional_client(cls) -> Optional[ShardedMemcachedClient]:
+        """Get the Memcached client instance, `None` when it is not usable right now"""
+        if not cls.client or cls.breaker.is_open:
+            return None
+        return cls.client
+
 
-async def get_cache_client() -> AsyncGenerator[aiomcache.Client, None]:
+async def get_cache_client() -> AsyncGenerator[ShardedMemcachedClient, None]:
     """Dependency for getting Memcached client"""
     client = MemcachedClient.get_client()
     try:
         yield client
-    except aiomcache.exceptions.ClientException as e:
+    except CircuitOpenError as e:
+        # Fail fast while the cache tier is down, without waiting for any timeout
+        raise All_Exceptions(
+            message="Cache is temporarily unavailable, please retry later",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(max(1, math.ceil(e.retry_after)))}
+        )
+    except (aiomcache.exceptions.ClientException, CacheUnavailableError) as e:
         raise All_Exceptions(
             message=f"Memcached error: {str(e)}",
-            status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+            headers={"Retry-After": str(ADMISSION_RETRY_AFTER)}
         )
 
 
-MemcachedDep = Annotated[aiomcache.Client, Depends(get_cache_client)]
+async def get_optional_cache_client() -> AsyncGenerator[Optional[ShardedMemcachedClient], None]:
+    """Dependency for getting Memcached client on read paths that can fall through to PostgreSQL"""
+    yield MemcachedClient.get_optional_client()
 
 
-# ======= Lifespan Context Manager =======
-
-@asynccontextmanager
-async def lifespan(app: FastAPI):
-    """Lifespan context manager for database connection"""
-    logging.info("Initializing all database connections (PostgreSQL and Memcached)")
-    try:
-        # Initialize PostgreSQL connection pool
-        logging.debug("Beginning to create database pool")
-        await db.create_pool()
-        logging.info("PostgreSQL Db pool created successfully")
-
-        # Initialize Memcached connection pool
-        logging.debug("Beginning to create Memcached pool")
-        await MemcachedClient.initialize()
-        logging.info("Memcached pool created successfully")
-
-        yield
-
-    except Exception as e:
-        logging.error(f"Error during lifespan initialization: {e}", exc_info=True)
-        raise
-
-    finally:
-        # Shutdown: close all connections
-        logging.debug("Shutting down all database connections")
-        await db.close()
-        await MemcachedClient.close()
-        logging.info("All database connections closed successfully")
+MemcachedDep = Annotated[ShardedMemcachedClient, Depends(get_cache_client)]
+OptionalMemcachedDep = Annotated[Optional[ShardedMemcachedClient], Depends(get_optional_cache_client)]
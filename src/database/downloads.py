@@ -0,0 +1,232 @@
+"""
+Write-behind download counters
+1. **Download path**:
+    - `record` increments the Memcached counter of the version for the day (`dl:<day>:<id>`), one atomic `incr`
+      and no PostgreSQL write, so hot versions cause no row lock contention.
+    - While the cache is unavailable the download is counted in the process instead.
+2. **Flush** (every `DOWNLOAD_FLUSH_INTERVAL` seconds, per worker):
+    - For every counter it incremented, the worker takes a short Memcached lock, reads the counter and
+      decrements it by what it read (downloads arriving meanwhile stay in the counter for the next flush).
+    - Everything read is folded into `package_downloads` with one batched upsert, kept in the process and
+      retried on the next flush when PostgreSQL fails.
+3. **Lost increments** (counts are approximate by design):
+    - A worker dying loses what it holds in the process (at most one interval of its downloads, or the
+      downloads counted while the cache was down), its Memcached counters are flushed by any other worker
+      recording a download of the same version the same day.
+    - A Memcached node evicting or losing its data loses the unflushed counters it held (at most one interval per version).
+"""
+
+from src.utils.base.libraries import TypeAlias, Optional, asyncio, logging, datetime, timedelta, timezone, dataclass, field
+from src.utils.base.constants import DOWNLOAD_FLUSH_INTERVAL
+from .cache_cluster import CacheUnavailableError
+from .connections import Database, MemcachedClient
+from .single_flight import single_flight
+from .swr_cache import swr_cached
+
+
+PgPool: TypeAlias = Database
+
+
+DOWNLOAD_COUNTER_TTL = 2 * 24 * 60 * 60  # Counters outlive their day, a day is flushed long before
+DOWNLOAD_FLUSH_LOCK_TTL = 30
+DOWNLOAD_DAILY_DAYS = 30
+DOWNLOAD_COUNTS_CACHE_TTL = (60, 300)
+MAX_PENDING_COUNTS = 100_000
+
+UPSERT_DOWNLOADS_QUERY = (
+    "INSERT INTO package_downloads (versioned_package_id, day, downloads) "
+    "SELECT * FROM unnest($1::uuid[], $2::date[], $3::bigint[]) "
+    "ON CONFLICT (versioned_package_id, day) DO UPDATE SET downloads = package_downloads.downloads + EXCLUDED.downloads"
+)
+VERSION_DAILY_DOWNLOADS_QUERY = (
+    "SELECT day, downloads FROM package_downloads WHERE versioned_package_id = $1 AND day >= $2 ORDER BY day"
+)
+VERSION_TOTAL_DOWNLOADS_QUERY = "SELECT COALESCE(SUM(downloads), 0) FROM package_downloads WHERE versioned_package_id = $1"
+BASE_DAILY_DOWNLOADS_QUERY = (
+    "SELECT d.day, SUM(d.downloads)::BIGINT AS downloads FROM package_downloads d "
+    "JOIN versioned_packages v ON v.id = d.versioned_package_id "
+    "WHERE v.base_package_id = $1 AND d.day >= $2 GROUP BY d.day ORDER BY d.day"
+)
+BASE_TOTAL_DOWNLOADS_QUERY = (
+    "SELECT COALESCE(SUM(d.downloads), 0) FROM package_downloads d "
+    "JOIN versioned_packages v ON v.id = d.versioned_package_id WHERE v.base_package_id = $1"
+)
+
+
+def _today() -> str:
+    return datetime.now(timezone.utc).date().isoformat()
+
+
+def _counter_key(day: str, versioned_package_id: str) -> bytes:
+    return f"dl:{day}:{versioned_package_id}".encode("utf-8")
+
+
+def _lock_key(counter_key: bytes) -> bytes:
+    return b"dl_lock:" + counter_key
+
+
+@dataclass
+class DownloadCounter:
+    """
+    Download counters of this worker process, see the module docstring
+    flush_interval: Seconds between two flushes into PostgreSQL
+    """
+    flush_interval: float = DOWNLOAD_FLUSH_INTERVAL
+    database: Optional[Database] = None
+    dirty: set = field(default_factory=set)        # (day, versioned package ID) incremented in Memcached since the last flush
+    pending: dict = field(default_factory=dict)    # (versioned package ID, day) -> downloads not in PostgreSQL yet
+    recorded: int = 0
+    counted_locally: int = 0
+    flushed: int = 0
+    flush_errors: int = 0
+    _flusher: Optional[asyncio.Task] = None
+
+    def _count_locally(self, versioned_package_id: str, day: str, downloads: int = 1) -> None:
+        if len(self.pending) >= MAX_PENDING_COUNTS and (versioned_package_id, day) not in self.pending:
+            logging.warning(f"Download count of {versioned_package_id} dropped, {MAX_PENDING_COUNTS} counts are already pending")
+            return
+        self.pending[(versioned_package_id, day)] = self.pending.get((versioned_package_id, day), 0) + downloads
+
+    async def record(self, versioned_package_id: str) -> None:
+        """Count one download (never fails the download)"""
+        self.recorded += 1
+        day = _today()
+        key = _counter_key(day, versioned_package_id)
+        cache_session = MemcachedClient.get_optional_client()
+        try:
+            if cache_session is None:
+                raise CacheUnavailableError("Memcached is not available")
+            if await cache_session.incr(key) is None:
+                # First download of the day, another worker may create the counter at the same time
+                if not await cache_session.add(key, b"1", exptime=DOWNLOAD_COUNTER_TTL):
+                    await cache_session.incr(key)
+            self.dirty.add((day, versioned_package_id))
+        except CacheUnavailableError:
+            self.counted_locally += 1
+            self._count_locally(versioned_package_id=versioned_package_id, day=day)
+
+    async def _collect(self, cache_session, day: str, versioned_package_id: str) -> None:
+        """Move the value of a Memcached counter into the pending counts"""
+        key = _counter_key(day, versioned_package_id)
+        lock_key = _lock_key(key)
+        if not await cache_session.add(lock_key, b"1", exptime=DOWNLOAD_FLUSH_LOCK_TTL):
+            # Another worker is flushing it, try again on the next flush
+            self.dirty.add((day, versioned_package_id))
+            return
+        try:
+            value = await cache_session.get(key)
+            downloads = int(value) if value else 0
+            if downloads:
+                # Decremented by what was read, downloads counted meanwhile stay for the next flush
+                await cache_session.decr(key, downloads)
+                self._count_locally(versioned_package_id=versioned_package_id, day=day, downloads=downloads)
+        finally:
+            await cache_session.delete(lock_key)
+
+    async def flush(self) -> int:
+        """Fold the counters into PostgreSQL with one batched upsert, returns the downloads written"""
+        dirty, self.dirty = self.dirty, set()
+        cache_session = MemcachedClient.get_optional_client()
+        if dirty and cache_session is None:
+            self.dirty |= dirty
+        elif dirty:
+            for day, versioned_package_id in dirty:
+                try:
+                    await self._collect(cache_session=cache_session, day=day, versioned_package_id=versioned_package_id)
+                except CacheUnavailableError:
+                    self.dirty.add((day, versioned_package_id))
+
+        if not self.pending:
+            return 0
+        pending, self.pending = self.pending, {}
+        try:
+            async with self.database.get_connection() as db_session:
+                await db_session.execute(
+                    UPSERT_DOWNLOADS_QUERY,
+                    [versioned_package_id for versioned_package_id, _ in pending],
+                    [datetime.fromisoformat(day).date() for _, day in pending],
+                    list(pending.values())
+                )
+        except Exception:
+            # Kept for the next flush
+            for (versioned_package_id, day), downloads in pending.items():
+                self._count_locally(versioned_package_id=versioned_package_id, day=day, downloads=downloads)
+            raise
+
+        downloads = sum(pending.values())
+        self.flushed += downloads
+        return downloads
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.flush_errors += 1
+                logging.warning(f"Download counts not flushed, retrying in {self.flush_interval}s: {e}")
+
+    async def start(self, database: Database) -> None:
+        if self._flusher is not None:
+            return
+        self.database = database
+        self._flusher = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the periodic flush and flush what this process holds one last time"""
+        if self._flusher is None:
+            return
+        self._flusher.cancel()
+        await asyncio.gather(self._flusher, return_exceptions=True)
+        self._flusher = None
+        try:
+            await self.flush()
+        except Exception as e:
+            logging.warning(f"Final flush of the download counts failed, {sum(self.pending.values())} downloads lost: {e}")
+
+    def stats(self) -> dict:
+        """Counters of this process"""
+        return {
+            "running": self._flusher is not None,
+            "recorded": self.recorded,
+            "counted_locally": self.counted_locally,
+            "flushed": self.flushed,
+            "flush_errors": self.flush_errors,
+            "dirty_counters": len(self.dirty),
+            "pending_downloads": sum(self.pending.values())
+        }
+
+
+download_counter = DownloadCounter()
+
+
+def _download_counts(daily_rows: list, total: int) -> dict:
+    return {"total": total, "daily": [{"day": row["day"], "downloads": row["downloads"]} for row in daily_rows]}
+
+
+@swr_cached(namespace="version_downloads", ttl=DOWNLOAD_COUNTS_CACHE_TTL[0], stale_ttl=DOWNLOAD_COUNTS_CACHE_TTL[1])
+@single_flight(namespace="version_downloads")
+async def get_version_download_counts(db_pool: PgPool, versioned_package_id: str) -> dict:
+    """
+    Get the total and the daily downloads (last `DOWNLOAD_DAILY_DAYS` days) of a versioned package
+    """
+    since = datetime.now(timezone.utc).date() - timedelta(days=DOWNLOAD_DAILY_DAYS - 1)
+    async with db_pool.get_connection() as db_session:
+        daily_rows = await db_session.fetch(VERSION_DAILY_DOWNLOADS_QUERY, versioned_package_id, since)
+        total = await db_session.fetchval(VERSION_TOTAL_DOWNLOADS_QUERY, versioned_package_id)
+    return _download_counts(daily_rows=daily_rows, total=total)
+
+
+@swr_cached(namespace="base_downloads", ttl=DOWNLOAD_COUNTS_CACHE_TTL[0], stale_ttl=DOWNLOAD_COUNTS_CACHE_TTL[1])
+@single_flight(namespace="base_downloads")
+async def get_base_download_counts(db_pool: PgPool, base_package_id: str) -> dict:
+    """
+    Get the total and the daily downloads (last `DOWNLOAD_DAILY_DAYS` days) of all the versions of a base package
+    """
+    since = datetime.now(timezone.utc).date() - timedelta(days=DOWNLOAD_DAILY_DAYS - 1)
+    async with db_pool.get_connection() as db_session:
+        daily_rows = await db_session.fetch(BASE_DAILY_DOWNLOADS_QUERY, base_package_id, since)
+        total = await db_session.fetchval(BASE_TOTAL_DOWNLOADS_QUERY, base_package_id)
+    return _download_counts(daily_rows=daily_rows, total=total)
@@ -0,0 +1,305 @@
+"""
+Durable background jobs stored in PostgreSQL (`jobs` table, see `docs/packages.md`)
+1. **Queue**:
+    - `enqueue_job` inserts a job, on the connection of the request so it commits (or rolls back) with it.
+    - A `dedupe_key` keeps a second job with the same key from being queued while the first one is pending.
+    - Jobs are claimed with `FOR UPDATE SKIP LOCKED`, so every worker process claims different jobs.
+2. **JobRunner**:
+    - Per worker process runner, started by the lifespan, with a global and a per kind concurrency limit.
+    - A claimed job is leased for its timeout, a job whose worker died is claimed again once the lease
+      expired, so jobs survive worker restarts (handlers must be idempotent).
+    - Failed jobs are retried with exponential backoff (and jitter) until `max_attempts`, then kept as `failed`.
+    - Per kind metrics (claimed, succeeded, retried, failed, duration, queue lag) for `/health/ready`.
+Handlers are registered with `@job_runner.job(kind)` and called as `handler(db_pool=..., payload=...)`
+"""
+
+from src.utils.base.libraries import asyncpg, asyncio, dataclass, field, Optional, logging, random, time
+from src.utils.base.constants import (
+    JOB_WORKER_CONCURRENCY,
+    JOB_POLL_INTERVAL,
+    JOB_TIMEOUT,
+    JOB_MAX_ATTEMPTS,
+    JOB_RETRY_BACKOFF,
+    JOB_MAX_RETRY_BACKOFF,
+    JOB_RETENTION
+)
+from .connections import Database
+
+
+# Job statuses
+QUEUED, RUNNING, DONE, FAILED = "queued", "running", "done", "failed"
+
+# Seconds a lease outlives the job timeout (time to record the outcome)
+LEASE_MARGIN = 30
+
+# Finished jobs are purged at most this often (seconds)
+PURGE_INTERVAL = 3600
+
+
+# ======= Queue operations =======
+
+async def enqueue_job(db_session: asyncpg.Connection, kind: str, payload: dict, dedupe_key: Optional[str] = None, delay: float = 0, max_attempts: int = JOB_MAX_ATTEMPTS) -> Optional[int]:
+    """
+    Queue a job, returns its ID (`None` when a pending job has the same `dedupe_key`)
+    """
+    job_id = await db_session.fetchval(
+        "INSERT INTO jobs (kind, payload, dedupe_key, max_attempts, run_at) "
+        "VALUES ($1, $2, $3, $4, now() + make_interval(secs => $5)) "
+        "ON CONFLICT (dedupe_key) WHERE status IN ('queued', 'running') DO NOTHING "
+        "RETURNING id",
+        kind,
+        payload,
+        dedupe_key,
+        max_attempts,
+        float(delay)
+    )
+    if job_id is not None:
+        job_runner.wake()
+    return job_id
+
+
+async def claim_jobs(db_session: asyncpg.Connection, kind: str, limit: int, lease_seconds: float) -> list:
+    """Claim due jobs of a kind (queued, or running with an expired lease) for `lease_seconds`"""
+    rows = await db_session.fetch(
+        "UPDATE jobs SET status = 'running', attempts = attempts + 1, locked_until = now() + make_interval(secs => $3) "
+        "WHERE id IN ("
+        "    SELECT id FROM jobs "
+        "    WHERE kind = $1 AND ((status = 'queued' AND run_at <= now()) OR (status = 'running' AND locked_until < now())) "
+        "    ORDER BY run_at LIMIT $2 "
+        "    FOR UPDATE SKIP LOCKED"
+        ") "
+        "RETURNING id, kind, payload, attempts, max_attempts, EXTRACT(EPOCH FROM now() - run_at)::float8 AS lag",
+        kind,
+        limit,
+        float(lease_seconds)
+    )
+    return [dict(row) for row in rows]
+
+
+async def complete_job(db_session: asyncpg.Connection, job_id: int, attempt: int) -> None:
+    """Mark a job done (only by the claim that ran it)"""
+    await db_session.execute(
+        "UPDATE jobs SET status = 'done', finished_at = now(), locked_until = NULL, last_error = NULL "
+        "WHERE id = $1 AND attempts = $2 AND status = 'running'",
+        job_id,
+        attempt
+    )
+
+
+async def fail_job(db_session: asyncpg.Connection, job_id: int, attempt: int, error: str, retry_in: Optional[float]) -> None:
+    """Queue a job again in `retry_in` seconds, or mark it failed for good when `retry_in` is `None`"""
+    if retry_in is None:
+        await db_session.execute(
+            "UPDATE jobs SET status = 'failed', finished_at = now(), locked_until = NULL, last_error = $3 "
+            "WHERE id = $1 AND attempts = $2 AND status = 'running'",
+            job_id,
+            attempt,
+            error
+        )
+    else:
+        await db_session.execute(
+            "UPDATE jobs SET status = 'queued', run_at = now() + make_interval(secs => $4), locked_until = NULL, last_error = $3 "
+            "WHERE id = $1 AND attempts = $2 AND status = 'running'",
+            job_id,
+            attempt,
+            error,
+            float(retry_in)
+        )
+
+
+async def release_jobs(db_session: asyncpg.Connection, job_ids: list) -> None:
+    """Give back jobs interrupted by a shutdown, the attempt does not count"""
+    await db_session.execute(
+        "UPDATE jobs SET status = 'queued', attempts = attempts - 1, locked_until = NULL "
+        "WHERE id = ANY($1::bigint[]) AND status = 'running'",
+        job_ids
+    )
+
+
+async def purge_finished_jobs(db_session: asyncpg.Connection, older_than: float) -> str:
+    """Delete the done jobs finished more than `older_than` seconds ago (failed jobs are kept)"""
+    return await db_session.execute(
+        "DELETE FROM jobs WHERE status = 'done' AND finished_at < now() - make_interval(secs => $1)",
+        float(older_than)
+    )
+
+
+def retry_backoff(attempt: int) -> float:
+    """Seconds before the next attempt: exponential, capped, with jitter (retries of a burst spread out)"""
+    backoff = min(JOB_MAX_RETRY_BACKOFF, JOB_RETRY_BACKOFF * 2 ** (attempt - 1))
+    return backoff * random.uniform(0.5, 1.0)
+
+
+# ======= Runner =======
+
+@dataclass
+class JobKind:
+    """A registered job handler and its limits"""
+    handler: object
+    concurrency: int
+    timeout: float
+    in_flight: int = 0
+    claimed: int = 0
+    succeeded: int = 0
+    retried: int = 0
+    failed: int = 0
+    duration_ewma: float = 0.0
+    lag_ewma: float = 0.0
+
+
+@dataclass
+class JobRunner:
+    """
+    Claims and runs the jobs of the registered kinds in this worker process
+    concurrency: Jobs run at once by this process (all kinds)
+    poll_interval: Seconds between claims while the queue is empty
+    """
+    concurrency: int = JOB_WORKER_CONCURRENCY
+    poll_interval: float = JOB_POLL_INTERVAL
+    kinds: dict = field(default_factory=dict)
+    running: dict = field(default_factory=dict)     # Job ID -> (task, attempt)
+    database: Optional[Database] = None
+    _poller: Optional[asyncio.Task] = None
+    _wake: Optional[asyncio.Event] = None
+    _purged_at: float = 0.0
+
+    def job(self, kind: str, concurrency: Optional[int] = None, timeout: float = JOB_TIMEOUT):
+        """Register the handler of a job kind"""
+        def decorator(handler):
+            self.kinds[kind] = JobKind(handler=handler, concurrency=concurrency or self.concurrency, timeout=timeout)
+            return handler
+        return decorator
+
+    def wake(self) -> None:
+        """Claim right away instead of at the next poll (a job was just queued by this process)"""
+        if self._wake is not None:
+            self._wake.set()
+
+    async def start(self, database: Database) -> None:
+        if self._poller is not None or not self.kinds:
+            return
+        self.database = database
+        self._wake = asyncio.Event()
+        self._poller = asyncio.create_task(self._poll())
+        logging.info(f"Job runner started for {', '.join(self.kinds)} (concurrency {self.concurrency})")
+
+    async def stop(self, grace: float = 10.0) -> None:
+        """Stop claiming, let running jobs finish for `grace` seconds and give back the others"""
+        if self._poller is None:
+            return
+        self._poller.cancel()
+        await asyncio.gather(self._poller, return_exceptions=True)
+        self._poller = None
+
+        if self.running:
+            await asyncio.wait([task for task, _ in self.running.values()], timeout=grace)
+        interrupted = list(self.running)
+        tasks = [task for task, _ in self.running.values()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        if interrupted:
+            try:
+                async with self.database.get_connection() as db_session:
+                    await release_jobs(db_session=db_session, job_ids=interrupted)
+            except Exception as e:
+                logging.warning(f"Interrupted jobs {interrupted} not released, they run again once their lease expires: {e}")
+
+    async def _claim(self) -> int:
+        """Claim as many jobs as there are free slots, returns how many were claimed"""
+        claimed = 0
+        async with self.database.get_connection() as db_session:
+            for kind, job_kind in self.kinds.items():
+                free = min(self.concurrency - len(self.running), job_kind.concurrency - job_kind.in_flight)
+                if free <= 0:
+                    continue
+                for job in await claim_jobs(db_session=db_session, kind=kind, limit=free, lease_seconds=job_kind.timeout + LEASE_MARGIN):
+                    job_kind.claimed += 1
+                    job_kind.in_flight += 1
+                    job_kind.lag_ewma = 0.8 * job_kind.lag_ewma + 0.2 * max(0.0, job["lag"])
+                    task = asyncio.create_task(self._run(job_kind=job_kind, job=job))
+                    self.running[job["id"]] = (task, job["attempts"])
+                    claimed += 1
+        return claimed
+
+    async def _poll(self) -> None:
+        while True:
+            self._wake.clear()
+            try:
+                claimed = await self._claim()
+                if time.monotonic() - self._purged_at > PURGE_INTERVAL:
+                    self._purged_at = time.monotonic()
+                    async with self.database.get_connection() as db_session:
+                        await purge_finished_jobs(db_session=db_session, older_than=JOB_RETENTION)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.warning(f"Claiming jobs failed, retrying in {self.poll_interval}s: {e}")
+                claimed = 0
+
+            # Claim again at once while the queue keeps jobs coming, otherwise wait
+            if not claimed or len(self.running) >= self.concurrency:
+                try:
+                    await asyncio.wait_for(self._wake.wait(), timeout=self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+
+    async def _run(self, job_kind: JobKind, job: dict) -> None:
+        started_at = time.perf_counter()
+        error, retry_in = None, None
+        try:
+            if job["attempts"] > job["max_attempts"]:
+                raise RuntimeError("lease expired on every attempt")
+            await asyncio.wait_for(job_kind.handler(db_pool=self.database, payload=job["payload"]), timeout=job_kind.timeout)
+        except asyncio.CancelledError:
+            job_kind.in_flight -= 1
+            raise
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if job["attempts"] < job["max_attempts"]:
+                retry_in = retry_backoff(job["attempts"])
+        finally:
+            self.running.pop(job["id"], None)
+            self.wake()
+
+        job_kind.in_flight -= 1
+        job_kind.duration_ewma = 0.8 * job_kind.duration_ewma + 0.2 * (time.perf_counter() - started_at)
+        if error is None:
+            job_kind.succeeded += 1
+        elif retry_in is not None:
+            job_kind.retried += 1
+            logging.warning(f"Job {job['kind']} #{job['id']} attempt {job['attempts']} failed, retrying in {retry_in:.1f}s: {error}")
+        else:
+            job_kind.failed += 1
+            logging.error(f"Job {job['kind']} #{job['id']} failed after {job['attempts']} attempts: {error}")
+
+        try:
+            async with self.database.get_connection() as db_session:
+                if error is None:
+                    await complete_job(db_session=db_session, job_id=job["id"], attempt=job["attempts"])
+                else:
+                    await fail_job(db_session=db_session, job_id=job["id"], attempt=job["attempts"], error=error, retry_in=retry_in)
+        except Exception as e:
+            logging.warning(f"Outcome of job {job['kind']} #{job['id']} not recorded, it runs again once its lease expires: {e}")
+
+    def stats(self) -> dict:
+        """Per kind counters of this process"""
+        return {
+            "running": self._poller is not None,
+            "in_flight": len(self.running),
+            "concurrency": self.concurrency,
+            "kinds": {
+                kind: {
+                    "in_flight": job_kind.in_flight,
+                    "claimed": job_kind.claimed,
+                    "succeeded": job_kind.succeeded,
+                    "retried": job_kind.retried,
+                    "failed": job_kind.failed,
+                    "duration_ewma": round(job_kind.duration_ewma, 6),
+                    "queue_lag_ewma": round(job_kind.lag_ewma, 6)
+                } for kind, job_kind in self.kinds.items()
+            }
+        }
+
+
+job_runner = JobRunner()
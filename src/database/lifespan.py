@@ -0,0 +1,82 @@
+"""
+Lifespan of a worker: opens the database connections, warms them up and closes them on shutdown
+1. **Startup**:
+    - Creates the PostgreSQL pool and the Memcached client.
+    - Warms the pool connections and the cache (see `warm_up.py`), the worker reports ready afterwards.
+    - Starts the background job runner (see `job_queue.py`), makes sure the popularity scores recompute is
+      scheduled (see `package_scores.py`) and starts the download counter flush (see `downloads.py`).
+2. **Shutdown**:
+    - Reports not ready first, stops the job runner and the package inspection pool, flushes the download
+      counters, then closes all the connections.
+"""
+
+from src.utils.base.libraries import asynccontextmanager, FastAPI, logging, time, sys, BOOT_STARTED_AT, IMPORT_TIMINGS
+from src.utils.base.constants import STARTUP_PROFILE, WARMUP_ENABLED, JOBS_ENABLED
+from src.utils.packages import shutdown_inspection_pool
+from .connections import db, MemcachedClient
+from .job_queue import job_runner
+from .downloads import download_counter
+from .package_scores import schedule_package_scores
+from .warm_up import worker_state, warm_up_worker
+
+
+def _log_startup_profile(started_at: float) -> None:
+    """Log where the boot time of the worker went (imports vs connections)"""
+    lazy_imports = ", ".join(f"{name} {seconds * 1000:.1f}ms" for name, seconds in sorted(IMPORT_TIMINGS.items(), key=lambda item: -item[1]))
+    logging.info(
+        f"Startup profile: imports {started_at - BOOT_STARTED_AT:.3f}s, "
+        f"connections {time.perf_counter() - started_at:.3f}s, "
+        f"{len(sys.modules)} modules loaded, lazy imports so far: {lazy_imports or 'none'}"
+    )
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Lifespan context manager for database connection"""
+    started_at = time.perf_counter()
+    logging.info("Initializing all database connections (PostgreSQL and Memcached)")
+    try:
+        # Initialize PostgreSQL connection pool
+        logging.debug("Beginning to create database pool")
+        await db.create_pool()
+        logging.info("PostgreSQL Db pool created successfully")
+
+        # Initialize Memcached connection pool
+        logging.debug("Beginning to create Memcached pool")
+        await MemcachedClient.initialize()
+        logging.info("Memcached pool created successfully")
+
+        if STARTUP_PROFILE:
+            _log_startup_profile(started_at=started_at)
+
+        # Warm up before reporting ready, so the first requests do not pay for it
+        if WARMUP_ENABLED:
+            await warm_up_worker(database=db)
+        else:
+            worker_state.ready = True
+
+        if JOBS_ENABLED:
+            await job_runner.start(database=db)
+            try:
+                async with db.get_connection() as db_session:
+                    await schedule_package_scores(db_session=db_session)
+            except Exception as e:
+                logging.warning(f"Popularity scores recompute not scheduled, another worker or the next start schedules it: {e}")
+        await download_counter.start(database=db)
+
+        yield
+
+    except Exception as e:
+        logging.error(f"Error during lifespan initialization: {e}", exc_info=True)
+        raise
+
+    finally:
+        # Shutdown: stop reporting ready, then close all connections
+        worker_state.ready = False
+        await job_runner.stop()
+        shutdown_inspection_pool()
+        await download_counter.stop()
+        logging.debug("Shutting down all database connections")
+        await db.close()
+        await MemcachedClient.close()
+        logging.info("All database connections closed successfully")
@@ -0,0 +1,106 @@
+"""
+Filters over the `metadata` JSONB columns of `base_packages` and `versioned_packages`
+1. **Predicates**:
+    - `contains`: JSON object the metadata must contain (`metadata @> $n`), e.g. `{"license": "MIT"}`
+    - `has`: Top level keys the metadata must have, matched on the array of its keys (see `METADATA_KEYS_EXPRESSION`)
+2. **Indexes** (`docs/packages.md`):
+    - Both predicates are served by GIN indexes with `jsonb_path_ops`, on `metadata` and on its array of keys.
+3. **Planner guard**:
+    - A containment without any value (`{}`, `{"a": {}}`) has no index entries, it is rejected before reaching the database.
+    - The filter is planned with sequential scans disabled, a plan still scanning the table cannot use an index and is rejected.
+"""
+
+from src.utils.base.libraries import Optional, orjson, status
+from src.utils.models import All_Exceptions
+
+
+# Array of the top level keys of `metadata`, indexed as is (must match the index expression exactly)
+METADATA_KEYS_EXPRESSION = "jsonb_path_query_array(metadata, '$.keyvalue().key', '{}', true)"
+
+MAX_FILTER_LENGTH = 2048
+MAX_FILTER_DEPTH = 5
+MAX_FILTER_KEYS = 10
+
+
+def _invalid_filter(message: str) -> All_Exceptions:
+    return All_Exceptions(message=f"Invalid metadata filter: {message}", status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+
+def _has_indexed_value(value, depth: int = 0) -> bool:
+    """Whether a containment value has at least one scalar, i.e. an entry in a `jsonb_path_ops` index"""
+    if depth > MAX_FILTER_DEPTH:
+        raise _invalid_filter(f"`contains` is nested deeper than {MAX_FILTER_DEPTH} levels")
+    if isinstance(value, dict):
+        return any([_has_indexed_value(item, depth + 1) for item in value.values()])
+    if isinstance(value, list):
+        return any([_has_indexed_value(item, depth + 1) for item in value])
+    return True
+
+
+def parse_metadata_filter(contains: Optional[str], has: Optional[str]) -> tuple[Optional[dict], Optional[list]]:
+    """
+    Parse and check the `contains` (JSON object) and `has` (comma separated keys) query parameters
+    Returns them normalized (so equal filters share their cache entries)
+    """
+    contains_value, has_keys = None, None
+
+    if contains:
+        if len(contains) > MAX_FILTER_LENGTH:
+            raise _invalid_filter(f"`contains` is longer than {MAX_FILTER_LENGTH} characters")
+        try:
+            contains_value = orjson.loads(contains)
+        except orjson.JSONDecodeError:
+            raise _invalid_filter("`contains` is not valid JSON")
+        if not isinstance(contains_value, dict):
+            raise _invalid_filter("`contains` must be a JSON object")
+        if not _has_indexed_value(contains_value):
+            raise _invalid_filter("`contains` must have at least one value (keys alone cannot use the index, see `has`)")
+
+    if has:
+        has_keys = sorted({key.strip() for key in has.split(",") if key.strip()})
+        if not has_keys or len(has_keys) > MAX_FILTER_KEYS:
+            raise _invalid_filter(f"`has` must list 1 to {MAX_FILTER_KEYS} keys")
+
+    if contains_value is None and has_keys is None:
+        raise _invalid_filter("`contains` or `has` is required")
+
+    return contains_value, has_keys
+
+
+def build_metadata_conditions(contains: Optional[dict], has: Optional[list], args: list) -> list:
+    """
+    SQL conditions of the metadata predicates, their parameters are appended to `args`
+    """
+    conditions = []
+    if contains is not None:
+        args.append(contains)
+        conditions.append(f"metadata @> ${len(args)}")
+    if has is not None:
+        args.append(has)
+        conditions.append(f"{METADATA_KEYS_EXPRESSION} @> ${len(args)}")
+    return conditions
+
+
+def _scanned_relations(plan: dict) -> set:
+    """Relations read with a sequential scan anywhere in an EXPLAIN (FORMAT JSON) plan"""
+    relations = {plan["Relation Name"]} if plan.get("Node Type") == "Seq Scan" else set()
+    for child in plan.get("Plans", ()):
+        relations |= _scanned_relations(child)
+    return relations
+
+
+async def ensure_index_usable(db_session, table: str, conditions: list, args: list) -> None:
+    """
+    Reject a filter the planner cannot serve from an index (422)
+    With sequential scans disabled the planner only falls back to one when no index applies
+    """
+    async with db_session.transaction():
+        await db_session.execute("SET LOCAL enable_seqscan = off")
+        explained = await db_session.fetchval(
+            f"EXPLAIN (FORMAT JSON) SELECT 1 FROM {table} WHERE {' AND '.join(conditions)}",
+            *args
+        )
+
+    plan = (orjson.loads(explained) if isinstance(explained, str) else explained)[0]["Plan"]
+    if table in _scanned_relations(plan):
+        raise _invalid_filter("this combination of predicates cannot use an index")
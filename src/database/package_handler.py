@@ -1,18 +1,128 @@
 """
 Handler for package-related database operations
+Hot lookups take the pool instead of a connection and are coalesced with `single_flight`,
+so identical concurrent reads run one query on one pool connection, their results are cached
+in Memcached with stale-while-revalidate entries (`swr_cached`)
 """
 
-from src.utils.base.libraries import aiomcache, asyncpg, TypeAlias, logging, status, json, uuid
+from src.utils.base.libraries import aiomcache, asyncpg, TypeAlias, Optional, logging, status, uuid, base64
 from src.utils.models import All_Exceptions
+from src.utils.packages import read_package_file
+from .connections import Database
+from .single_flight import single_flight
+from .swr_cache import swr_cached
+from .metadata_filter import build_metadata_conditions, ensure_index_usable
+from .change_log import record_package_change, BASE_PACKAGE_CREATED, VERSIONED_PACKAGE_CREATED
 
 
 PgSession: TypeAlias = asyncpg.Connection
+PgPool: TypeAlias = Database
 MemCacheSession: TypeAlias = aiomcache.Client
 
 
-async def create_base_package(db_session: PgSession, user_id: str, package_name: str, package_description: str, metadata: dict) -> None:
+# Fields that can be requested with `fields=` (response key -> SQL column expression)
+BASE_PACKAGE_FIELDS = {
+    "id": "id",
+    "package_name": "package_name",
+    "package_description": "package_description",
+    "registered_at": "registered_at",
+    "latest_version": "latest_version_id",
+    "metadata": "metadata",
+    "user_id": "user_id"
+}
+VERSIONED_PACKAGE_FIELDS = {
+    "id": "id",
+    "base_package_id": "base_package_id",
+    "version": "version",
+    "file_path": "file_path",
+    "metadata": "metadata",
+    "created_at": "created_at"
+}
+
+# Cache lifetimes of the read paths: (fresh seconds, extra seconds a stale value can be served)
+BASE_PACKAGE_CACHE_TTL = (60, 600)
+VERSIONED_PACKAGE_CACHE_TTL = (3600, 86400)  # Published versions do not change
+PACKAGE_LISTING_CACHE_TTL = (30, 300)
+PACKAGE_SEARCH_CACHE_TTL = (30, 120)
+PACKAGE_FILE_CACHE_TTL = (3600, 86400)  # Files of published versions do not change
+
+# Default projections when no `fields=` is given
+BASE_PACKAGE_DETAILS_DEFAULT = ("id", "package_name", "package_description", "registered_at", "metadata", "user_id")
+BASE_PACKAGE_SEARCH_DEFAULT = ("id", "package_name", "package_description", "registered_at", "latest_version")
+VERSIONED_PACKAGE_DEFAULT = ("id", "base_package_id", "version", "file_path", "metadata", "created_at")
+
+# Statements of the hot read paths (`{projection}` is the select list from `_build_projection`)
+BASE_PACKAGE_DETAILS_QUERY = "SELECT {projection} FROM base_packages WHERE id = $1"
+BASE_PACKAGE_LISTING_QUERY = (
+    "SELECT {projection} FROM base_packages LEFT JOIN package_scores ON package_scores.base_package_id = base_packages.id "
+    "ORDER BY {order} LIMIT $1 OFFSET $2"
+)
+BASE_PACKAGE_COUNT_QUERY = "SELECT COUNT(*) FROM base_packages"
+BASE_PACKAGE_SEARCH_QUERY = (
+    "SELECT {projection} FROM base_packages LEFT JOIN package_scores ON package_scores.base_package_id = base_packages.id "
+    "WHERE package_name ILIKE $1 OR package_description ILIKE $1 "
+    "ORDER BY {order} LIMIT $2 OFFSET $3"
+)
+BASE_PACKAGE_SEARCH_COUNT_QUERY = "SELECT COUNT(*) FROM base_packages WHERE package_name ILIKE $1 OR package_description ILIKE $1"
+VERSIONED_PACKAGE_DETAILS_QUERY = "SELECT {projection} FROM versioned_packages WHERE id = $1"
+VERSIONED_PACKAGES_QUERY = (
+    "SELECT {projection} FROM versioned_packages WHERE base_package_id = $1 "
+    "ORDER BY created_at DESC LIMIT $2 OFFSET $3"
+)
+VERSIONED_PACKAGES_COUNT_QUERY = "SELECT COUNT(*) FROM versioned_packages WHERE base_package_id = $1"
+# Metadata filters (`{conditions}` from `build_metadata_conditions`, `{limit}` / `{offset}` are parameter numbers)
+BASE_PACKAGE_FILTER_QUERY = "SELECT {projection} FROM base_packages WHERE {conditions} ORDER BY registered_at DESC LIMIT ${limit} OFFSET ${offset}"
+BASE_PACKAGE_FILTER_COUNT_QUERY = "SELECT COUNT(*) FROM base_packages WHERE {conditions}"
+VERSIONED_PACKAGE_FILTER_QUERY = "SELECT {projection} FROM versioned_packages WHERE {conditions} ORDER BY created_at DESC LIMIT ${limit} OFFSET ${offset}"
+VERSIONED_PACKAGE_FILTER_COUNT_QUERY = "SELECT COUNT(*) FROM versioned_packages WHERE {conditions}"
+
+# Orders of `sort=` (popularity is the precomputed score of `package_scores.py`, new packages score 0 until the next recompute)
+# relevance: exact name match ($4 is the query itself, compared as text, not as a pattern), then name match, then popularity
+POPULARITY_ORDER = "COALESCE(package_scores.score, 0) DESC, registered_at DESC"
+SEARCH_ORDERS = {
+    "relevance": f"lower(package_name) = lower($4) DESC, package_name ILIKE $1 DESC, {POPULARITY_ORDER}",
+    "popularity": POPULARITY_ORDER,
+    "recent": "registered_at DESC"
+}
+# Without a query every package is as relevant, so relevance is popularity
+LISTING_ORDERS = {**SEARCH_ORDERS, "relevance": POPULARITY_ORDER}
+TOP_PACKAGES_QUERY = (
+    "SELECT id, latest_version_id FROM base_packages LEFT JOIN package_scores ON package_scores.base_package_id = base_packages.id "
+    f"ORDER BY {POPULARITY_ORDER} LIMIT $1"
+)
+
+
+def _escape_like(text: str) -> str:
+    """Match `%` and `_` of a search query literally in an `ILIKE` pattern (`\\` is the default escape character)"""
+    return text.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _build_projection(fields: Optional[str], allowed_fields: dict, default_fields: tuple) -> str:
     """
-    Create a new base package in the database
+    Build the SQL select list for the requested sparse fieldset
+    Only whitelisted fields are accepted, so the result is safe to interpolate into SQL
+    """
+    if fields:
+        requested = list(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+    else:
+        requested = list(default_fields)
+
+    unknown_fields = [field for field in requested if field not in allowed_fields]
+    if unknown_fields or not requested:
+        raise All_Exceptions(
+            message=f"Invalid fields requested: {', '.join(unknown_fields) or 'none'}. Allowed fields are: {', '.join(allowed_fields)}.",
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
+    return ", ".join(
+        allowed_fields[field] if allowed_fields[field] == field else f"{allowed_fields[field]} AS {field}"
+        for field in requested
+    )
+
+
+async def create_base_package(db_session: PgSession, user_id: str, package_name: str, package_description: str, metadata: dict) -> str:
+    """
+    Create a new base package in the database (and its entry in the change log), returns its ID
     """
     # Check if package name is properly formatted
     if not package_name or len(package_name) < 4:
@@ -27,16 +137,19 @@ async def create_base_package(db_session: PgSession, user_id: str, package_name:
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
         )
 
+    base_package_id = str(uuid.uuid4())
     try:
-        await db_session.execute(
-            "INSERT INTO base_packages (id, package_name, package_description, user_id, metadata) "
-            "VALUES ($1, $2, $3, $4, $5)",
-            str(uuid.uuid4()),
-            package_name,
-            package_description,
-            user_id,
-            json.dumps(metadata)
-        )
+        async with db_session.transaction():
+            await db_session.execute(
+                "INSERT INTO base_packages (id, package_name, package_description, user_id, metadata) "
+                "VALUES ($1, $2, $3, $4, $5)",
+                base_package_id,
+                package_name,
+                package_description,
+                user_id,
+                metadata
+            )
+            await record_package_change(db_session=db_session, kind=BASE_PACKAGE_CREATED, base_package_id=base_package_id, package_name=package_name)
     except Exception as e:
         logging.error(f"Error creating base package: {e}", exc_info=True)
         raise All_Exceptions(
@@ -44,15 +157,21 @@ async def create_base_package(db_session: PgSession, user_id: str, package_name:
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
         )
 
+    return base_package_id
 
-async def get_base_package_details_by_id(db_session: PgSession, package_id: str) -> dict:
+
+@swr_cached(namespace="base_package", ttl=BASE_PACKAGE_CACHE_TTL[0], stale_ttl=BASE_PACKAGE_CACHE_TTL[1])
+@single_flight(namespace="base_package")
+async def get_base_package_details_by_id(db_pool: PgPool, package_id: str, fields: Optional[str] = None) -> dict:
     """
     Get base package details by ID from the database
     """
-    package_row = await db_session.fetchrow(
-        "SELECT * FROM base_packages WHERE id = $1",
-        package_id
-    )
+    projection = _build_projection(fields=fields, allowed_fields=BASE_PACKAGE_FIELDS, default_fields=BASE_PACKAGE_DETAILS_DEFAULT)
+    async with db_pool.get_connection() as db_session:
+        package_row = await db_session.fetchrow(
+            BASE_PACKAGE_DETAILS_QUERY.format(projection=projection),
+            package_id
+        )
 
     if not package_row:
         raise All_Exceptions(
@@ -60,77 +179,158 @@ async def get_base_package_details_by_id(db_session: PgSession, package_id: str)
             status_code=status.HTTP_404_NOT_FOUND
         )
 
-    return {
-        "id": package_row["id"],
-        "package_name": package_row["package_name"],
-        "package_description": package_row["package_description"],
-        "registered_at": package_row["registered_at"],
-        "metadata": json.loads(package_row["metadata"]),
-        "user_id": package_row["user_id"]
-    }
+    return dict(package_row)
 
 
-async def search_base_packages(db_session: PgSession, search_query: str, page: int = 1, page_size: int = 10) -> tuple[list, int]:
+@swr_cached(namespace="package_search", ttl=PACKAGE_SEARCH_CACHE_TTL[0], stale_ttl=PACKAGE_SEARCH_CACHE_TTL[1])
+@single_flight(namespace="package_search")
+async def search_base_packages(db_pool: PgPool, search_query: str, page: int = 1, page_size: int = 10, fields: Optional[str] = None, sort: str = "relevance") -> tuple[list, int]:
     """
-    Search for base packages by name or description
+    Search for base packages by name or description, ordered by `sort` (relevance, popularity or recent)
     """
     offset = (page - 1) * page_size
+    projection = _build_projection(fields=fields, allowed_fields=BASE_PACKAGE_FIELDS, default_fields=BASE_PACKAGE_SEARCH_DEFAULT)
 
-    if search_query:
-        if len(search_query) < 3:
-            raise All_Exceptions(
-                message="Search query must be at least 3 characters long.",
-                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+    if sort not in SEARCH_ORDERS:
+        raise All_Exceptions(
+            message=f"Invalid sort: {sort}. Allowed sorts are: {', '.join(SEARCH_ORDERS)}.",
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
+    if search_query and len(search_query) < 3:
+        raise All_Exceptions(
+            message="Search query must be at least 3 characters long.",
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
+    async with db_pool.get_connection() as db_session:
+        if search_query:
+            search_pattern = f"%{_escape_like(search_query)}%"
+            # The exact query is only a parameter of the relevance order
+            exact_query = (search_query,) if sort == "relevance" else ()
+            packages = await db_session.fetch(
+                BASE_PACKAGE_SEARCH_QUERY.format(projection=projection, order=SEARCH_ORDERS[sort]),
+                search_pattern,
+                page_size,
+                offset,
+                *exact_query
+            )
+            total_count_row = await db_session.fetchrow(
+                BASE_PACKAGE_SEARCH_COUNT_QUERY,
+                search_pattern
             )
 
-        search_pattern = f"%{search_query}%"
+        else:
+            # If no search query is provided, return all packages
+            packages = await db_session.fetch(
+                BASE_PACKAGE_LISTING_QUERY.format(projection=projection, order=LISTING_ORDERS[sort]),
+                page_size,
+                offset
+            )
+            total_count_row = await db_session.fetchrow(
+                BASE_PACKAGE_COUNT_QUERY
+            )
+
+    total_count = total_count_row["count"] or 0
+
+    return [dict(row) for row in packages], total_count
+
+
+@swr_cached(namespace="package_filter", ttl=PACKAGE_SEARCH_CACHE_TTL[0], stale_ttl=PACKAGE_SEARCH_CACHE_TTL[1])
+@single_flight(namespace="package_filter")
+async def filter_base_packages(db_pool: PgPool, contains: Optional[dict], has: Optional[list], search_query: Optional[str] = None, page: int = 1, page_size: int = 10, fields: Optional[str] = None) -> tuple[list, int]:
+    """
+    Filter base packages by metadata (see `metadata_filter.py`), optionally narrowed by a search query
+    """
+    offset = (page - 1) * page_size
+    projection = _build_projection(fields=fields, allowed_fields=BASE_PACKAGE_FIELDS, default_fields=BASE_PACKAGE_SEARCH_DEFAULT)
+
+    if search_query and len(search_query) < 3:
+        raise All_Exceptions(
+            message="Search query must be at least 3 characters long.",
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
+    args = []
+    conditions = build_metadata_conditions(contains=contains, has=has, args=args)
+    if search_query:
+        args.append(f"%{_escape_like(search_query)}%")
+        conditions.append(f"(package_name ILIKE ${len(args)} OR package_description ILIKE ${len(args)})")
+    where = " AND ".join(conditions)
+
+    async with db_pool.get_connection() as db_session:
+        await ensure_index_usable(db_session=db_session, table="base_packages", conditions=conditions, args=args)
         packages = await db_session.fetch(
-            "SELECT * FROM base_packages WHERE package_name ILIKE $1 OR package_description ILIKE $1 "
-            "ORDER BY registered_at DESC LIMIT $2 OFFSET $3",
-            search_pattern,
+            BASE_PACKAGE_FILTER_QUERY.format(projection=projection, conditions=where, limit=len(args) + 1, offset=len(args) + 2),
+            *args,
             page_size,
             offset
         )
-        total_count_row = await db_session.fetchrow(
-            "SELECT COUNT(*) FROM base_packages WHERE package_name ILIKE $1 OR package_description ILIKE $1",
-            search_pattern
+        total_count = await db_session.fetchval(
+            BASE_PACKAGE_FILTER_COUNT_QUERY.format(conditions=where),
+            *args
         )
-        total_count = total_count_row["count"]
-        if total_count is None:
-            total_count = 0
 
-    else:
-        # If no search query is provided, return all packages
+    return [dict(row) for row in packages], total_count or 0
+
+
+@swr_cached(namespace="versioned_package_filter", ttl=PACKAGE_LISTING_CACHE_TTL[0], stale_ttl=PACKAGE_LISTING_CACHE_TTL[1])
+@single_flight(namespace="versioned_package_filter")
+async def filter_versioned_packages(db_pool: PgPool, contains: Optional[dict], has: Optional[list], base_package_id: Optional[str] = None, page: int = 1, page_size: int = 10, fields: Optional[str] = None) -> tuple[list, int]:
+    """
+    Filter versioned packages by metadata (see `metadata_filter.py`), optionally of a single base package
+    """
+    offset = (page - 1) * page_size
+    projection = _build_projection(fields=fields, allowed_fields=VERSIONED_PACKAGE_FIELDS, default_fields=VERSIONED_PACKAGE_DEFAULT)
+
+    args = []
+    conditions = build_metadata_conditions(contains=contains, has=has, args=args)
+    if base_package_id:
+        args.append(base_package_id)
+        conditions.append(f"base_package_id = ${len(args)}")
+    where = " AND ".join(conditions)
+
+    async with db_pool.get_connection() as db_session:
+        await ensure_index_usable(db_session=db_session, table="versioned_packages", conditions=conditions, args=args)
         packages = await db_session.fetch(
-            "SELECT * FROM base_packages ORDER BY registered_at DESC LIMIT $1 OFFSET $2",
+            VERSIONED_PACKAGE_FILTER_QUERY.format(projection=projection, conditions=where, limit=len(args) + 1, offset=len(args) + 2),
+            *args,
             page_size,
             offset
         )
-        total_count_row = await db_session.fetchrow(
-            "SELECT COUNT(*) FROM base_packages"
+        total_count = await db_session.fetchval(
+            VERSIONED_PACKAGE_FILTER_COUNT_QUERY.format(conditions=where),
+            *args
         )
-        total_count = total_count_row["count"]
-        if total_count is None:
-            total_count = 0
 
-    return [
-        {
-            "id": row["id"],
-            "package_name": row["package_name"],
-            "package_description": row["package_description"],
-            "registered_at": row["registered_at"],
-            "latest_version": row["latest_version_id"]
-        } for row in packages
-    ], total_count
+    return [dict(row) for row in packages], total_count or 0
 
 
-async def create_versioned_package(db_session: PgSession, user_id: str, base_package_id: str, version: str, file_path: str, metadata: dict) -> None:
+async def get_owned_base_package_id(db_session: PgSession, package_name: str, user_id: str) -> str:
     """
-    Create a new versioned package in the database
+    Get the ID of a base package by name, it must belong to the user
+    """
+    base_package_id = await db_session.fetchval(
+        "SELECT id FROM base_packages WHERE package_name = $1 AND user_id = $2",
+        package_name,
+        user_id
+    )
+    if not base_package_id:
+        raise All_Exceptions(
+            message=f"Base package {package_name} does not exist or does not belong to user {user_id}.",
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+
+    return str(base_package_id)
+
+
+async def create_versioned_package(db_session: PgSession, user_id: str, base_package_id: str, version: str, file_path: str, metadata: dict) -> str:
+    """
+    Create a new versioned package in the database (and its entry in the change log), returns its ID
     """
     # Check if base package exists and belongs to the user
     base_package = await db_session.fetchrow(
-        "SELECT id FROM base_packages WHERE id = $1 AND user_id = $2",
+        "SELECT id, package_name FROM base_packages WHERE id = $1 AND user_id = $2",
         base_package_id,
         user_id
     )
@@ -140,16 +340,38 @@ async def create_versioned_package(db_session: PgSession, user_id: str, base_pac
             status_code=status.HTTP_404_NOT_FOUND
         )
 
-    try:
-        await db_session.execute(
-            "INSERT INTO versioned_packages (id, base_package_id, version, file_path, metadata) "
-            "VALUES ($1, $2, $3, $4, $5)",
-            str(uuid.uuid4()),
-            base_package_id,
-            version,
-            file_path,
-            json.dumps(metadata)
+    # Published versions are immutable
+    existing_version = await db_session.fetchrow(
+        "SELECT id FROM versioned_packages WHERE base_package_id = $1 AND version = $2",
+        base_package_id,
+        version
+    )
+    if existing_version:
+        raise All_Exceptions(
+            message=f"Version {version} of this package already exists.",
+            status_code=status.HTTP_409_CONFLICT
         )
+
+    versioned_package_id = str(uuid.uuid4())
+    try:
+        async with db_session.transaction():
+            await db_session.execute(
+                "INSERT INTO versioned_packages (id, base_package_id, version, file_path, metadata) "
+                "VALUES ($1, $2, $3, $4, $5)",
+                versioned_package_id,
+                base_package_id,
+                version,
+                file_path,
+                metadata
+            )
+            await record_package_change(
+                db_session=db_session,
+                kind=VERSIONED_PACKAGE_CREATED,
+                base_package_id=base_package_id,
+                package_name=base_package["package_name"],
+                versioned_package_id=versioned_package_id,
+                version=version
+            )
     except Exception as e:
         logging.error(f"Error creating versioned package: {e}", exc_info=True)
         raise All_Exceptions(
@@ -157,15 +379,21 @@ async def create_versioned_package(db_session: PgSession, user_id: str, base_pac
             status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
         )
 
+    return versioned_package_id
 
-async def get_versioned_package_details(db_session: PgSession, package_id: str) -> dict:
+
+@swr_cached(namespace="versioned_package", ttl=VERSIONED_PACKAGE_CACHE_TTL[0], stale_ttl=VERSIONED_PACKAGE_CACHE_TTL[1])
+@single_flight(namespace="versioned_package")
+async def get_versioned_package_details(db_pool: PgPool, package_id: str, fields: Optional[str] = None) -> dict:
     """
     Get versioned package details by ID from the database
     """
-    package_row = await db_session.fetchrow(
-        "SELECT * FROM versioned_packages WHERE id = $1",
-        package_id
-    )
+    projection = _build_projection(fields=fields, allowed_fields=VERSIONED_PACKAGE_FIELDS, default_fields=VERSIONED_PACKAGE_DEFAULT)
+    async with db_pool.get_connection() as db_session:
+        package_row = await db_session.fetchrow(
+            VERSIONED_PACKAGE_DETAILS_QUERY.format(projection=projection),
+            package_id
+        )
 
     if not package_row:
         raise All_Exceptions(
@@ -173,37 +401,71 @@ async def get_versioned_package_details(db_session: PgSession, package_id: str)
             status_code=status.HTTP_404_NOT_FOUND
         )
 
-    return {
-        "id": package_row["id"],
-        "base_package_id": package_row["base_package_id"],
-        "version": package_row["version"],
-        "file_path": package_row["file_path"],
-        "metadata": json.loads(package_row["metadata"]),
-        "created_at": package_row["created_at"]
-    }
+    return dict(package_row)
 
 
-async def get_all_versioned_packages(db_session: PgSession, base_package_id: str, page: int = 1, page_size: int = 10) -> list:
+@swr_cached(namespace="versioned_packages", ttl=PACKAGE_LISTING_CACHE_TTL[0], stale_ttl=PACKAGE_LISTING_CACHE_TTL[1])
+@single_flight(namespace="versioned_packages")
+async def get_all_versioned_packages(db_pool: PgPool, base_package_id: str, page: int = 1, page_size: int = 10, fields: Optional[str] = None) -> tuple[list, int]:
     """
     Get all versioned packages for a base package
     """
     offset = (page - 1) * page_size
+    projection = _build_projection(fields=fields, allowed_fields=VERSIONED_PACKAGE_FIELDS, default_fields=VERSIONED_PACKAGE_DEFAULT)
 
-    packages = await db_session.fetch(
-        "SELECT * FROM versioned_packages WHERE base_package_id = $1 "
-        "ORDER BY created_at DESC LIMIT $2 OFFSET $3",
-        base_package_id,
-        page_size,
-        offset
-    )
+    async with db_pool.get_connection() as db_session:
+        packages = await db_session.fetch(
+            VERSIONED_PACKAGES_QUERY.format(projection=projection),
+            base_package_id,
+            page_size,
+            offset
+        )
+
+        total_count_row = await db_session.fetchrow(
+            VERSIONED_PACKAGES_COUNT_QUERY,
+            base_package_id
+        )
+    total_count = total_count_row["count"] or 0
 
+    return [dict(row) for row in packages], total_count
+
+
+@swr_cached(namespace="package_file", ttl=PACKAGE_FILE_CACHE_TTL[0], stale_ttl=PACKAGE_FILE_CACHE_TTL[1], exclude=())
+@single_flight(namespace="package_file", exclude=())
+async def get_package_file_content(index_path: str, member_path: str) -> str:
+    """
+    Get a file of a published archive, base64 encoded (cache entries are JSON)
+    """
+    content = await read_package_file(index_path=index_path, member_path=member_path)
+    return base64.b64encode(content).decode("ascii")
+
+
+def hot_statements() -> list:
+    """
+    Statements of the hot read paths with their default projections, as (query, arguments)
+    The arguments match no row, `None` arguments (full scans) mean the statement is only prepared
+    """
+    no_package = "00000000-0000-0000-0000-000000000000"
+    base_details = _build_projection(fields=None, allowed_fields=BASE_PACKAGE_FIELDS, default_fields=BASE_PACKAGE_DETAILS_DEFAULT)
+    base_search = _build_projection(fields=None, allowed_fields=BASE_PACKAGE_FIELDS, default_fields=BASE_PACKAGE_SEARCH_DEFAULT)
+    versioned = _build_projection(fields=None, allowed_fields=VERSIONED_PACKAGE_FIELDS, default_fields=VERSIONED_PACKAGE_DEFAULT)
     return [
-        {
-            "id": row["id"],
-            "base_package_id": row["base_package_id"],
-            "version": row["version"],
-            "file_path": row["file_path"],
-            "metadata": json.loads(row["metadata"]),
-            "created_at": row["created_at"]
-        } for row in packages
+        (BASE_PACKAGE_DETAILS_QUERY.format(projection=base_details), (no_package,)),
+        (BASE_PACKAGE_LISTING_QUERY.format(projection=base_search, order=LISTING_ORDERS["relevance"]), (0, 0)),
+        (BASE_PACKAGE_COUNT_QUERY, None),
+        (BASE_PACKAGE_SEARCH_QUERY.format(projection=base_search, order=SEARCH_ORDERS["relevance"]), None),
+        (BASE_PACKAGE_SEARCH_COUNT_QUERY, None),
+        (VERSIONED_PACKAGE_DETAILS_QUERY.format(projection=versioned), (no_package,)),
+        (VERSIONED_PACKAGES_QUERY.format(projection=versioned), (no_package, 0, 0)),
+        (VERSIONED_PACKAGES_COUNT_QUERY, (no_package,))
     ]
+
+
+async def get_top_packages(db_pool: PgPool, limit: int) -> list:
+    """
+    Packages preloaded into the cache by a starting worker (the most popular first, see `package_scores.py`)
+    """
+    async with db_pool.get_connection() as db_session:
+        rows = await db_session.fetch(TOP_PACKAGES_QUERY, limit)
+
+    return [dict(row) for row in rows]
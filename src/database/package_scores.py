@@ -0,0 +1,107 @@
+"""
+Popularity scores of the base packages (`package_scores`), precomputed so search never computes them per request
+1. **Signals** (per base package):
+    - `references`: other base packages naming it in their `dependencies` (base metadata or the manifest of any version)
+    - `versions`: published versions
+    - Recency: age of the last publish (or of the registration), halved every `RECENCY_HALF_LIFE_DAYS` days
+2. **Score**:
+    - `REFERENCES_WEIGHT * ln(1 + references) + VERSIONS_WEIGHT * ln(1 + versions) + RECENCY_WEIGHT * recency`,
+      divided by the highest score so every score is within [0, 1].
+3. **Recompute**:
+    - One statement rewrites every score, run as a job at the start of every `PACKAGE_SCORE_INTERVAL` seconds slot.
+    - Every worker start and every run queue the run of the next slot, with the slot in its `dedupe_key`,
+      so all the workers together keep a single pending run.
+    - A publish also queues a run `PUBLISH_RECOMPUTE_DELAY` seconds later (in its transaction), the new version
+      counts without waiting for the next slot; publishes meanwhile share that run.
+"""
+
+from src.utils.base.libraries import asyncpg, TypeAlias, Optional, time
+from src.utils.base.constants import PACKAGE_SCORE_INTERVAL
+from .connections import Database
+from .job_queue import enqueue_job
+
+
+PgSession: TypeAlias = asyncpg.Connection
+PgPool: TypeAlias = Database
+
+
+RECOMPUTE_PACKAGE_SCORES = "package.recompute_scores"
+
+REFERENCES_WEIGHT = 3.0
+VERSIONS_WEIGHT = 1.0
+RECENCY_WEIGHT = 1.0
+RECENCY_HALF_LIFE_DAYS = 90.0
+PUBLISH_RECOMPUTE_DELAY = 60
+
+RECOMPUTE_SCORES_QUERY = (
+    "WITH dependencies AS ("
+    "    SELECT id AS dependent_id, dependency_name FROM base_packages, "
+    "    jsonb_object_keys(CASE WHEN jsonb_typeof(metadata->'dependencies') = 'object' THEN metadata->'dependencies' ELSE '{}' END) AS dependency_name "
+    "    UNION "
+    "    SELECT base_package_id, dependency_name FROM versioned_packages, "
+    "    jsonb_object_keys(CASE WHEN jsonb_typeof(metadata->'manifest'->'dependencies') = 'object' THEN metadata->'manifest'->'dependencies' ELSE '{}' END) AS dependency_name"
+    "), reference_counts AS ("
+    "    SELECT b.id AS base_package_id, COUNT(DISTINCT d.dependent_id) AS references_count "
+    "    FROM dependencies d JOIN base_packages b ON b.package_name = d.dependency_name AND b.id <> d.dependent_id "
+    "    GROUP BY b.id"
+    "), version_counts AS ("
+    "    SELECT base_package_id, COUNT(*) AS versions_count, MAX(created_at) AS last_published_at "
+    "    FROM versioned_packages GROUP BY base_package_id"
+    "), raw_scores AS ("
+    "    SELECT b.id AS base_package_id, COALESCE(r.references_count, 0) AS references_count, COALESCE(v.versions_count, 0) AS versions_count, "
+    "    $1 * ln(1 + COALESCE(r.references_count, 0)) + $2 * ln(1 + COALESCE(v.versions_count, 0)) "
+    "    + $3 * exp(-ln(2) * GREATEST(EXTRACT(EPOCH FROM LOCALTIMESTAMP - GREATEST(b.registered_at, v.last_published_at)), 0) / 86400 / $4) AS raw_score "
+    "    FROM base_packages b "
+    "    LEFT JOIN reference_counts r ON r.base_package_id = b.id "
+    "    LEFT JOIN version_counts v ON v.base_package_id = b.id"
+    ") "
+    "INSERT INTO package_scores (base_package_id, score, references_count, versions_count, computed_at) "
+    "SELECT base_package_id, raw_score / GREATEST(MAX(raw_score) OVER (), 1e-9), references_count, versions_count, LOCALTIMESTAMP "
+    "FROM raw_scores "
+    "ON CONFLICT (base_package_id) DO UPDATE SET score = EXCLUDED.score, references_count = EXCLUDED.references_count, "
+    "versions_count = EXCLUDED.versions_count, computed_at = EXCLUDED.computed_at"
+)
+
+
+async def recompute_package_scores(db_pool: PgPool) -> str:
+    """
+    Rewrite the score of every base package (one statement, readers see the old or the new scores)
+    """
+    async with db_pool.get_connection() as db_session:
+        return await db_session.execute(
+            RECOMPUTE_SCORES_QUERY,
+            REFERENCES_WEIGHT,
+            VERSIONS_WEIGHT,
+            RECENCY_WEIGHT,
+            RECENCY_HALF_LIFE_DAYS
+        )
+
+
+async def schedule_package_scores(db_session: PgSession) -> Optional[int]:
+    """
+    Queue the recompute of the next time slot (run at its start)
+    Returns the job ID, `None` when that slot already has a pending run
+    """
+    now = time.time()
+    slot = int(now // PACKAGE_SCORE_INTERVAL) + 1
+    return await enqueue_job(
+        db_session=db_session,
+        kind=RECOMPUTE_PACKAGE_SCORES,
+        payload={"slot": slot},
+        dedupe_key=f"{RECOMPUTE_PACKAGE_SCORES}:{slot}",
+        delay=max(0.0, slot * PACKAGE_SCORE_INTERVAL - now)
+    )
+
+
+async def refresh_package_scores_after_publish(db_session: PgSession) -> Optional[int]:
+    """
+    Queue a recompute shortly after a publish (run on the connection of the publish, committed with it)
+    Returns the job ID, `None` when a run queued by another publish is still pending
+    """
+    return await enqueue_job(
+        db_session=db_session,
+        kind=RECOMPUTE_PACKAGE_SCORES,
+        payload={"reason": "publish"},
+        dedupe_key=f"{RECOMPUTE_PACKAGE_SCORES}:publish",
+        delay=PUBLISH_RECOMPUTE_DELAY
+    )
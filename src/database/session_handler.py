@@ -0,0 +1,589 @@
+"""
+Handler for user session operations
+Two session modes are supported (`SESSION_MODE`):
+1. **cache**:
+    - The session lives in Memcached, every user has a session generation counter and a session
+      is only valid while the generation stored in it matches the current one.
+2. **signed**:
+    - The cookie carries a compact HMAC signed, expiring claim set checked purely in-process.
+    - Memcached only holds a revocation denylist (split into `DENYLIST_SHARDS` keys), refreshed in the background
+      by every worker. A revocation that cannot be stored fails with a 503, it is never only applied locally.
+In both modes a per-user session index is kept to list (and revoke) the active sessions, it is
+best effort: losing an index update never fails the login or logout itself
+Cache sessions use a sliding expiry: their TTL is extended at most once per `SESSION_TOUCH_INTERVAL`
+(touches are batched per worker) and never beyond `MAX_AGE_OF_CACHE` after the login
+"""
+
+from src.utils.base.libraries import TypeAlias, Optional, datetime, timezone, asyncio, logging, hashlib, base64, struct, orjson, hmac, uuid, time, status
+from src.utils.base.constants import (
+    MAX_AGE_OF_CACHE,
+    SESSION_MODE,
+    SESSION_SIGNING_KEY,
+    SESSION_SIGNING_KEY_PREVIOUS,
+    SESSION_DENYLIST_REFRESH,
+    SESSION_IDLE_TIMEOUT,
+    SESSION_TOUCH_INTERVAL
+)
+from src.utils.models import All_Exceptions
+from .cache_cluster import ShardedMemcachedClient, CacheUnavailableError
+
+
+MemCacheSession: TypeAlias = ShardedMemcachedClient
+
+# Upper bound of the per-user session index (oldest entries are dropped first)
+MAX_INDEXED_SESSIONS = 50
+CAS_RETRIES = 5
+
+SIGNED_TOKEN_VERSION = "v1"
+# Revocations are spread over several keys, so logouts do not all contend on one CAS loop
+DENYLIST_SHARDS = 32
+# Entries of a shard, about 40 bytes each (far below the 1 MB item limit of Memcached)
+MAX_DENYLIST_SHARD_ENTRIES = 15_000
+
+if SESSION_MODE == "signed" and not SESSION_SIGNING_KEY:
+    raise ValueError("SESSION_SIGNING_KEY must be set when SESSION_MODE is 'signed'")
+
+
+def _session_key(session_id: str) -> bytes:
+    return f"session:{session_id}".encode("utf-8")
+
+
+def _is_session_id(session_cookie: str) -> bool:
+    """Whether a cookie can be a session ID of the cache mode (a UUID), anything else never reaches Memcached as a key"""
+    try:
+        return len(session_cookie) == 36 and str(uuid.UUID(session_cookie)) == session_cookie
+    except ValueError:
+        return False
+
+
+def _generation_key(user_id: str) -> bytes:
+    return f"session_gen:{user_id}".encode("utf-8")
+
+
+def _index_key(user_id: str) -> bytes:
+    return f"user_sessions:{user_id}".encode("utf-8")
+
+
+def _denylist_key(shard: int) -> bytes:
+    return f"session_denylist:{shard}".encode("utf-8")
+
+
+def _denylist_shard(identifier: str) -> int:
+    return int(hashlib.sha256(identifier.encode("utf-8")).hexdigest()[:8], 16) % DENYLIST_SHARDS
+
+
+def session_reference(session_id: str) -> str:
+    """Public reference of a session, the session ID itself is a secret"""
+    return hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:16]
+
+
+class CacheContentionError(CacheUnavailableError):
+    """Raised when a CAS update keeps losing against concurrent writers"""
+
+
+async def _cas_update(cache_session: MemCacheSession, key: bytes, update, exptime: int, default):
+    """
+    Apply `update(value) -> value` to a JSON value stored in the cache with a CAS loop
+    Raises `CacheContentionError` when every attempt lost (the value was not stored)
+    """
+    for _ in range(CAS_RETRIES):
+        stored, cas_token = await cache_session.gets(key)
+        value = update(orjson.loads(stored) if stored else default)
+        payload = orjson.dumps(value)
+
+        if stored is None:
+            if await cache_session.add(key, payload, exptime=exptime):
+                return value
+        elif await cache_session.cas(key, payload, cas_token, exptime=exptime):
+            return value
+
+    raise CacheContentionError(f"Could not update cache key {key.decode('utf-8')} after {CAS_RETRIES} attempts")
+
+
+async def _update_session_index(cache_session: MemCacheSession, user_id: str, update) -> list:
+    """Apply `update(entries) -> entries` to the user session index (best effort)"""
+    try:
+        return await _cas_update(
+            cache_session=cache_session,
+            key=_index_key(user_id),
+            update=lambda entries: update(entries)[-MAX_INDEXED_SESSIONS:],
+            exptime=MAX_AGE_OF_CACHE,
+            default=[]
+        )
+    except CacheUnavailableError as e:
+        logging.warning(f"Session index of user {user_id} not updated, cache unavailable: {e}")
+        return []
+
+
+async def _get_or_create_generation(cache_session: MemCacheSession, user_id: str) -> int:
+    """
+    Get the current session generation of a user, creating it when missing
+    A new counter starts from the current time, so if it was evicted the older sessions
+    do not match it again (fail closed)
+    """
+    generation_key = _generation_key(user_id)
+    for _ in range(CAS_RETRIES):
+        generation = await cache_session.get(generation_key)
+        if generation is not None:
+            await cache_session.touch(generation_key, MAX_AGE_OF_CACHE)
+            return int(generation)
+
+        created = int(time.time())
+        if await cache_session.add(generation_key, str(created).encode("utf-8"), exptime=MAX_AGE_OF_CACHE):
+            return created
+        # Another login created it first, read it back (it can be evicted again meanwhile)
+
+    raise CacheContentionError(f"Could not create cache key {generation_key.decode('utf-8')} after {CAS_RETRIES} attempts")
+
+
+# ======= Compact binary session encoding =======
+
+# version, is_active, generation, logged in at, user created at, user ID, CSRF token, user name length, email length
+_SESSION_HEADER = struct.Struct("!B?IIq16s16sHH")
+_SESSION_FORMAT_VERSION = 1
+
+
+def encode_session(session: dict) -> bytes:
+    """
+    Encode a cache session into a compact binary payload (about a quarter of the JSON size)
+    IDs and CSRF tokens are UUIDs and are stored as 16 raw bytes
+    """
+    user_name = session["user_name"].encode("utf-8")
+    email = session["email"].encode("utf-8")
+    created_at = session["created_at"]
+    if created_at.tzinfo is None:
+        created_at = created_at.replace(tzinfo=timezone.utc)
+
+    return _SESSION_HEADER.pack(
+        _SESSION_FORMAT_VERSION,
+        bool(session["is_active"]),
+        session["generation"],
+        session["logged_in_at"],
+        int(created_at.timestamp()),
+        uuid.UUID(str(session["id"])).bytes,
+        uuid.UUID(session["csrf_token"]).bytes,
+        len(user_name),
+        len(email)
+    ) + user_name + email
+
+
+def decode_session(payload: bytes) -> Optional[dict]:
+    """Decode a payload written by `encode_session`, `None` for unknown formats"""
+    if not payload or payload[0] != _SESSION_FORMAT_VERSION:
+        return None
+
+    _, is_active, generation, logged_in_at, created_at, user_id, csrf_token, user_name_length, email_length = _SESSION_HEADER.unpack_from(payload)
+    offset = _SESSION_HEADER.size
+
+    return {
+        "id": str(uuid.UUID(bytes=user_id)),
+        "user_name": payload[offset:offset + user_name_length].decode("utf-8"),
+        "email": payload[offset + user_name_length:offset + user_name_length + email_length].decode("utf-8"),
+        "csrf_token": str(uuid.UUID(bytes=csrf_token)),
+        "is_active": is_active,
+        "created_at": datetime.fromtimestamp(created_at, tz=timezone.utc).isoformat(),
+        "generation": generation,
+        "logged_in_at": logged_in_at
+    }
+
+
+# ======= Sliding expiry =======
+
+def _remaining_ttl(logged_in_at: int) -> int:
+    """Next TTL of a session: the idle timeout, capped by its absolute lifetime"""
+    return min(SESSION_IDLE_TIMEOUT, logged_in_at + MAX_AGE_OF_CACHE - int(time.time()))
+
+
+class _SessionToucher:
+    """
+    Per worker batching of session TTL extensions
+    A session is touched at most once per `SESSION_TOUCH_INTERVAL`, the touches requested
+    meanwhile are coalesced and sent together by a single background flush
+    """
+    def __init__(self, flush_delay: float = 0.5):
+        self.flush_delay = flush_delay
+        self.last_touched: dict = {}
+        self.pending: dict = {}
+        self._flush_task: Optional[asyncio.Task] = None
+
+    def mark_touched(self, session_id: str) -> None:
+        self.last_touched[session_id] = time.monotonic()
+
+    def forget(self, session_id: str) -> None:
+        self.last_touched.pop(session_id, None)
+        self.pending.pop(session_id, None)
+
+    def request_touch(self, cache_session: MemCacheSession, session_id: str, logged_in_at: int) -> None:
+        """Queue a TTL extension when the session was not touched during the last interval"""
+        now = time.monotonic()
+        if now - self.last_touched.get(session_id, 0.0) < SESSION_TOUCH_INTERVAL:
+            return
+
+        self.last_touched[session_id] = now
+        self.pending[session_id] = logged_in_at
+        if self._flush_task is None or self._flush_task.done():
+            self._flush_task = asyncio.create_task(self._flush(cache_session=cache_session))
+
+    async def _flush(self, cache_session: MemCacheSession) -> None:
+        await asyncio.sleep(self.flush_delay)
+        pending, self.pending = self.pending, {}
+
+        # Entries older than the interval can not suppress a touch anymore
+        cutoff = time.monotonic() - SESSION_TOUCH_INTERVAL
+        self.last_touched = {session_id: touched_at for session_id, touched_at in self.last_touched.items() if touched_at > cutoff}
+
+        touches = [
+            cache_session.touch(_session_key(session_id), ttl)
+            for session_id, ttl in ((session_id, _remaining_ttl(logged_in_at)) for session_id, logged_in_at in pending.items())
+            if ttl > 0
+        ]
+        results = await asyncio.gather(*touches, return_exceptions=True)
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            logging.warning(f"{len(failures)} of {len(touches)} session touches failed: {failures[0]}")
+
+
+session_toucher = _SessionToucher()
+
+
+# ======= Signed session tokens =======
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode("ascii")
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+def _csrf_binding(csrf_token: str) -> str:
+    """Short hash binding a signed token to its CSRF token (the token itself is not embedded)"""
+    return _b64encode(hashlib.sha256(csrf_token.encode("utf-8")).digest()[:12])
+
+
+def _sign(payload: str, key: str) -> str:
+    return _b64encode(hmac.new(key.encode("utf-8"), payload.encode("ascii"), hashlib.sha256).digest())
+
+
+def create_signed_token(user: dict, csrf_token: str, session_id: str, max_age: int = MAX_AGE_OF_CACHE, issued_at: Optional[float] = None) -> str:
+    """
+    Create a compact signed session token `v1.<claims>.<signature>`
+    `iat` has a microsecond precision, so a login right after a "log out everywhere" is not revoked by it
+    """
+    issued_at = round(time.time(), 6) if issued_at is None else issued_at
+    claims = _b64encode(orjson.dumps({
+        "sid": session_id,
+        "uid": str(user["id"]),
+        "un": user["user_name"],
+        "em": user["email"],
+        "csrf": _csrf_binding(csrf_token),
+        "iat": issued_at,
+        "exp": int(issued_at) + max_age
+    }))
+    payload = f"{SIGNED_TOKEN_VERSION}.{claims}"
+    return f"{payload}.{_sign(payload=payload, key=SESSION_SIGNING_KEY)}"
+
+
+def verify_signed_token(token: str) -> Optional[dict]:
+    """
+    Verify a signed session token (signature and expiry only), `None` when invalid
+    """
+    try:
+        version, claims, signature = token.split(".")
+    except ValueError:
+        return None
+    if version != SIGNED_TOKEN_VERSION:
+        return None
+
+    payload = f"{version}.{claims}"
+    keys = [key for key in (SESSION_SIGNING_KEY, SESSION_SIGNING_KEY_PREVIOUS) if key]
+    if not any(hmac.compare_digest(signature, _sign(payload=payload, key=key)) for key in keys):
+        return None
+
+    try:
+        claims = orjson.loads(_b64decode(claims))
+    except (ValueError, orjson.JSONDecodeError):
+        return None
+
+    if claims["exp"] <= time.time():
+        return None
+
+    return claims
+
+
+class _Denylist:
+    """
+    Per worker copy of the revocation denylist stored in Memcached (one JSON value per shard)
+    `sessions` maps revoked session references to their expiry, `users` maps user IDs to the time
+    before which all their tokens are revoked. The copy is refreshed in the background, when
+    the cache is unreachable the last known copy keeps being used
+    """
+    def __init__(self):
+        self.shards: dict = {}
+        self.sessions: dict = {}
+        self.users: dict = {}
+        self.fetched_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+
+    def is_revoked(self, claims: dict) -> bool:
+        return session_reference(claims["sid"]) in self.sessions or claims["iat"] <= self.users.get(claims["uid"], 0)
+
+    def apply(self, shards: dict) -> None:
+        """Replace the given shards (shard -> stored value) of the local copy"""
+        self.shards.update(shards)
+        self.sessions = {reference: expires_at for stored in self.shards.values() for reference, expires_at in stored.get("sessions", {}).items()}
+        self.users = {user_id: revoked_at for stored in self.shards.values() for user_id, revoked_at in stored.get("users", {}).items()}
+
+    def schedule_refresh(self, cache_session: MemCacheSession) -> None:
+        """Refresh the local copy in the background when it is older than the refresh interval"""
+        if time.monotonic() - self.fetched_at < SESSION_DENYLIST_REFRESH:
+            return
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return
+        self._refresh_task = asyncio.create_task(self._refresh(cache_session=cache_session))
+
+    async def _refresh(self, cache_session: MemCacheSession) -> None:
+        try:
+            stored = await cache_session.multi_get(*(_denylist_key(shard) for shard in range(DENYLIST_SHARDS)))
+            self.apply({shard: orjson.loads(value) if value else {} for shard, value in enumerate(stored)})
+        except Exception as e:
+            logging.warning(f"Could not refresh the session denylist, keeping the last known copy: {e}")
+        finally:
+            self.fetched_at = time.monotonic()
+
+
+denylist = _Denylist()
+
+
+def _prune_denylist(stored: dict) -> dict:
+    """Drop the entries that cannot match a live token anymore"""
+    now = time.time()
+    return {
+        "sessions": {sid: expires_at for sid, expires_at in stored.get("sessions", {}).items() if expires_at > now},
+        "users": {uid: revoked_at for uid, revoked_at in stored.get("users", {}).items() if revoked_at + MAX_AGE_OF_CACHE > now}
+    }
+
+
+def _revocation_unavailable(error: Exception) -> All_Exceptions:
+    """503 for a revocation that could not be stored (reporting success would leave the session valid)"""
+    logging.warning(f"Session revocation not stored: {error}")
+    return All_Exceptions(
+        message="Sessions cannot be revoked right now, please try again",
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": "1"}
+    )
+
+
+async def _revoke_signed(cache_session: MemCacheSession, session_id: Optional[str] = None, user_id: Optional[str] = None) -> None:
+    """Add a session (or every session of a user) to the denylist, 503 when it cannot be stored"""
+    now = round(time.time(), 6)
+    revocations = []
+    if session_id:
+        reference = session_reference(session_id)
+        revocations.append((_denylist_shard(reference), "sessions", reference, now + MAX_AGE_OF_CACHE))
+    if user_id:
+        revocations.append((_denylist_shard(user_id), "users", user_id, now))
+
+    for shard, kind, identifier, value in revocations:
+        def update(stored: dict) -> dict:
+            stored = _prune_denylist(stored)
+            stored[kind][identifier] = value
+            if len(stored["sessions"]) + len(stored["users"]) > MAX_DENYLIST_SHARD_ENTRIES:
+                raise CacheContentionError(f"Denylist shard {shard} is full ({MAX_DENYLIST_SHARD_ENTRIES} live revocations)")
+            return stored
+
+        try:
+            updated = await _cas_update(cache_session=cache_session, key=_denylist_key(shard), update=update, exptime=MAX_AGE_OF_CACHE, default={})
+        except CacheUnavailableError as e:
+            raise _revocation_unavailable(e)
+        # Apply it locally right away, other workers pick it up on their next refresh
+        denylist.apply({shard: updated})
+
+
+# ======= Session operations =======
+
+async def create_user_session(cache_session: MemCacheSession, session_id: str, user: dict, csrf_token: str, client_info: dict, exptime: int) -> str:
+    """
+    Create a new session and register it in the user session index
+    Returns the value to store in the session cookie
+    """
+    user_id = str(user["id"])
+    issued_at = round(time.time(), 6)
+
+    if SESSION_MODE == "signed":
+        cookie_value = create_signed_token(user=user, csrf_token=csrf_token, session_id=session_id, issued_at=issued_at)
+
+    else:
+        generation = await _get_or_create_generation(cache_session=cache_session, user_id=user_id)
+        await cache_session.set(
+            _session_key(session_id),
+            encode_session({
+                "id": user_id,
+                "user_name": user["user_name"],
+                "email": user["email"],
+                "csrf_token": csrf_token,
+                "is_active": user["is_active"],
+                "created_at": user["created_at"],
+                "generation": generation,
+                "logged_in_at": int(time.time())
+            }),
+            exptime=min(exptime, MAX_AGE_OF_CACHE)
+        )
+        session_toucher.mark_touched(session_id)
+        cookie_value = session_id
+
+    entry = {
+        "session_id": session_id,
+        "logged_in_at": int(issued_at),
+        "issued_at": issued_at,
+        "ip_address": client_info.get("ip_address"),
+        "user_agent": client_info.get("user_agent")
+    }
+    await _update_session_index(cache_session=cache_session, user_id=user_id, update=lambda entries: entries + [entry])
+
+    return cookie_value
+
+
+async def get_user_session(cache_session: MemCacheSession, session_cookie: str) -> Optional[dict]:
+    """
+    Get the session of a session cookie, `None` when it expired or was invalidated
+    """
+    if SESSION_MODE == "signed":
+        claims = verify_signed_token(session_cookie)
+        denylist.schedule_refresh(cache_session=cache_session)
+        if claims is None or denylist.is_revoked(claims):
+            return None
+
+        return {
+            "id": claims["uid"],
+            "user_name": claims["un"],
+            "email": claims["em"],
+            "csrf_binding": claims["csrf"],
+            "session_id": claims["sid"]
+        }
+
+    if not _is_session_id(session_cookie):
+        return None
+
+    session = decode_session(await cache_session.get(_session_key(session_cookie)))
+    if not session or session["logged_in_at"] + MAX_AGE_OF_CACHE <= time.time():
+        return None
+
+    generation = await cache_session.get(_generation_key(session["id"]))
+    if generation is None or int(generation) != session["generation"]:
+        return None
+
+    # Slide the expiry of active sessions (batched, at most once per interval)
+    session_toucher.request_touch(cache_session=cache_session, session_id=session_cookie, logged_in_at=session["logged_in_at"])
+
+    session["session_id"] = session_cookie
+    return session
+
+
+def session_csrf_matches(session: dict, csrf_token: str) -> bool:
+    """Check the CSRF token sent with the request against the session"""
+    if "csrf_binding" in session:
+        return hmac.compare_digest(session["csrf_binding"], _csrf_binding(csrf_token))
+    return hmac.compare_digest(session["csrf_token"], csrf_token)
+
+
+async def delete_user_session(cache_session: MemCacheSession, user_id: str, session_id: str) -> None:
+    """
+    Delete a single session and drop it from the user session index
+    """
+    if SESSION_MODE == "signed":
+        await _revoke_signed(cache_session=cache_session, session_id=session_id)
+    else:
+        session_toucher.forget(session_id)
+        try:
+            await cache_session.delete(_session_key(session_id))
+        except CacheUnavailableError as e:
+            raise _revocation_unavailable(e)
+
+    await _update_session_index(
+        cache_session=cache_session,
+        user_id=user_id,
+        update=lambda entries: [entry for entry in entries if entry["session_id"] != session_id]
+    )
+
+
+async def invalidate_all_user_sessions(cache_session: MemCacheSession, user_id: str) -> None:
+    """
+    Log the user out everywhere with a single operation (no cache scan)
+    """
+    if SESSION_MODE == "signed":
+        await _revoke_signed(cache_session=cache_session, user_id=user_id)
+
+    else:
+        try:
+            generation = await cache_session.incr(_generation_key(user_id))
+        except CacheUnavailableError as e:
+            raise _revocation_unavailable(e)
+        if generation is None:
+            # No counter means no session can match anymore (they fail closed)
+            logging.debug(f"No session generation found for user {user_id}, nothing to invalidate")
+
+    try:
+        await cache_session.delete(_index_key(user_id))
+    except CacheUnavailableError as e:
+        logging.warning(f"Session index of user {user_id} not deleted, cache unavailable: {e}")
+
+
+async def list_user_sessions(cache_session: MemCacheSession, user_id: str, current_session_id: Optional[str] = None) -> list:
+    """
+    List the active sessions of a user, expired or invalidated ones are pruned from the index
+    """
+    value = await cache_session.get(_index_key(user_id))
+    entries = orjson.loads(value) if value else []
+    if not entries:
+        return []
+
+    if SESSION_MODE == "signed":
+        now = time.time()
+        active_entries = [
+            entry for entry in entries
+            if entry["logged_in_at"] + MAX_AGE_OF_CACHE > now and not denylist.is_revoked({"sid": entry["session_id"], "uid": user_id, "iat": entry.get("issued_at", entry["logged_in_at"])})
+        ]
+
+    else:
+        generation, *sessions = await cache_session.multi_get(
+            _generation_key(user_id),
+            *(_session_key(entry["session_id"]) for entry in entries)
+        )
+        active_entries = []
+        for entry, session_bytes in zip(entries, sessions):
+            # Unknown or old payload formats decode to None, they are dead sessions
+            session = decode_session(session_bytes) if session_bytes else None
+            if session is not None and generation is not None and session["generation"] == int(generation):
+                active_entries.append(entry)
+
+    if len(active_entries) != len(entries):
+        # Only drop the dead entries, sessions created meanwhile must stay indexed
+        active_ids = {entry["session_id"] for entry in active_entries}
+        dead_ids = {entry["session_id"] for entry in entries} - active_ids
+        await _update_session_index(
+            cache_session=cache_session,
+            user_id=user_id,
+            update=lambda current: [entry for entry in current if entry["session_id"] not in dead_ids]
+        )
+
+    return [
+        {
+            "session_ref": session_reference(entry["session_id"]),
+            "logged_in_at": entry["logged_in_at"],
+            "ip_address": entry["ip_address"],
+            "user_agent": entry["user_agent"],
+            "is_current": entry["session_id"] == current_session_id
+        } for entry in active_entries
+    ]
+
+
+async def find_session_id_by_reference(cache_session: MemCacheSession, user_id: str, session_ref: str) -> Optional[str]:
+    """
+    Resolve a public session reference back to the session ID from the user session index
+    """
+    value = await cache_session.get(_index_key(user_id))
+    for entry in orjson.loads(value) if value else []:
+        if session_reference(entry["session_id"]) == session_ref:
+            return entry["session_id"]
+    return None
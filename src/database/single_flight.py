@@ -0,0 +1,121 @@
+"""
+Request coalescing (single-flight) for hot reads
+1. **Per worker**:
+    - Concurrent calls with the same arguments share one in-flight task and its result (or error).
+2. **Across workers**:
+    - The worker running the query holds a short Memcached lease and publishes the result under it,
+      the other workers wait for that result instead of running the same query.
+    - Results shared this way go through JSON (datetimes come back as ISO strings, tuples as lists).
+    - Without a usable cache, or when the lease holder fails, the query simply runs locally.
+"""
+
+from src.utils.base.libraries import Optional, asyncio, hashlib, inspect, logging, orjson, secrets, time, wraps
+from src.utils.base.constants import SINGLE_FLIGHT_LEASE_TTL, SINGLE_FLIGHT_POLL_INTERVAL
+from .cache_cluster import CacheUnavailableError
+from .connections import MemcachedClient
+
+
+def call_key(namespace: str, signature: inspect.Signature, args: tuple, kwargs: dict, exclude: tuple) -> str:
+    """
+    Stable key of a call from its bound arguments (fits the Memcached key length limit)
+    Parameters in `exclude` (connections, pools) are not part of the call identity
+    """
+    bound = signature.bind(*args, **kwargs)
+    bound.apply_defaults()
+    arguments = {name: value for name, value in bound.arguments.items() if name not in exclude}
+    payload = orjson.dumps([namespace, arguments], option=orjson.OPT_SORT_KEYS)
+    return hashlib.blake2b(payload, digest_size=16).hexdigest()
+
+
+def _lease_key(flight_key: str) -> bytes:
+    return f"sf_lease:{flight_key}".encode("utf-8")
+
+
+def _result_key(flight_key: str, token: str) -> bytes:
+    return f"sf_result:{flight_key}:{token}".encode("utf-8")
+
+
+async def _wait_for_result(cache_session, flight_key: str, token: str):
+    """Wait for the lease holder to publish its result, `None` when it did not in time"""
+    lease_key, result_key = _lease_key(flight_key), _result_key(flight_key, token)
+    deadline = time.monotonic() + SINGLE_FLIGHT_LEASE_TTL
+    while time.monotonic() < deadline:
+        await asyncio.sleep(SINGLE_FLIGHT_POLL_INTERVAL)
+        result, current_token = await cache_session.multi_get(result_key, lease_key)
+        if result is not None:
+            return orjson.loads(result)
+        if current_token is None or current_token.decode("utf-8") != token:
+            # The lease holder failed (or finished without publishing), stop waiting
+            return None
+    return None
+
+
+async def _run_with_lease(flight_key: str, call):
+    """Run the call once across workers, guarded by a Memcached lease"""
+    cache_session = MemcachedClient.get_optional_client()
+    if cache_session is None:
+        return await call()
+
+    lease_key = _lease_key(flight_key)
+    token = secrets.token_hex(8)
+    try:
+        acquired = await cache_session.add(lease_key, token.encode("utf-8"), exptime=SINGLE_FLIGHT_LEASE_TTL)
+        if not acquired:
+            holder_token = await cache_session.get(lease_key)
+            if holder_token is not None:
+                result = await _wait_for_result(cache_session=cache_session, flight_key=flight_key, token=holder_token.decode("utf-8"))
+                if result is not None:
+                    return result
+            return await call()
+    except CacheUnavailableError as e:
+        logging.debug(f"Single-flight lease skipped, cache unavailable: {e}")
+        return await call()
+
+    try:
+        result = await call()
+        try:
+            await cache_session.set(_result_key(flight_key, token), orjson.dumps(result), exptime=SINGLE_FLIGHT_LEASE_TTL)
+        except (CacheUnavailableError, TypeError) as e:
+            logging.debug(f"Single-flight result not shared: {e}")
+        return result
+    finally:
+        try:
+            await cache_session.delete(lease_key)
+        except CacheUnavailableError:
+            pass  # The lease expires on its own
+
+
+def single_flight(namespace: str, exclude: tuple = ("db_pool",)):
+    """
+    Coalesce concurrent identical calls of an async function
+    namespace: Prefix of the flight keys (one per decorated function)
+    exclude: Parameters that are not part of the call identity (connections, pools)
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+        in_flight: dict = {}
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            flight_key = call_key(namespace=namespace, signature=signature, args=args, kwargs=kwargs, exclude=exclude)
+
+            task: Optional[asyncio.Task] = in_flight.get(flight_key)
+            if task is None:
+                task = asyncio.ensure_future(_run_with_lease(flight_key=flight_key, call=lambda: func(*args, **kwargs)))
+                in_flight[flight_key] = task
+                task.add_done_callback(lambda done: _forget(in_flight, flight_key, done))
+
+            # Shielded, so a caller going away does not cancel the query shared with the others
+            return await asyncio.shield(task)
+
+        return wrapper
+
+    return decorator
+
+
+def _forget(in_flight: dict, flight_key: str, task: asyncio.Task) -> None:
+    """Drop a finished flight (and mark its error as retrieved when nobody waited for it)"""
+    if in_flight.get(flight_key) is task:
+        del in_flight[flight_key]
+    if not task.cancelled():
+        task.exception()
@@ -0,0 +1,123 @@
+"""
+Stale-while-revalidate cache entries in Memcached
+1. **Entry format**:
+    - `{"v": value, "soft": soft expiry, "hard": hard expiry, "delta": seconds the value took to compute}`
+    - Memcached drops the entry at the hard expiry, between the soft and the hard expiry it is stale.
+2. **Reads**:
+    - Fresh and stale values are served from the cache, a stale value triggers a background refresh.
+    - Refreshes also start early with a probability rising towards the soft expiry (XFetch), weighted by
+      the compute time, so hot entries are usually refreshed before they ever go stale.
+    - A Memcached lock keeps it to a single refresh across all the workers.
+3. **Misses and outages**:
+    - A miss computes the value inline (combine with `single_flight` to coalesce misses).
+    - Without a usable cache the function is called directly.
+Values go through JSON (datetimes come back as ISO strings, tuples as lists)
+"""
+
+from src.utils.base.libraries import Optional, asyncio, inspect, logging, orjson, random, math, time, wraps
+from src.utils.base.constants import SWR_XFETCH_BETA, SWR_REFRESH_LOCK_TTL
+from .cache_cluster import CacheUnavailableError
+from .connections import MemcachedClient
+from .single_flight import call_key
+
+
+# Background refreshes in progress (keeps a reference so they are not garbage collected)
+_refresh_tasks: set = set()
+
+
+def _entry_key(namespace: str, key: str) -> bytes:
+    return f"swr:{namespace}:{key}".encode("utf-8")
+
+
+def _lock_key(namespace: str, key: str) -> bytes:
+    return f"swr_lock:{namespace}:{key}".encode("utf-8")
+
+
+def _should_refresh(entry: dict, now: float, beta: float = SWR_XFETCH_BETA) -> bool:
+    """Stale, or due for an early refresh (XFetch: now - delta * beta * ln(rand) >= soft expiry)"""
+    if now >= entry["soft"]:
+        return True
+    return now - entry["delta"] * beta * math.log(1.0 - random.random()) >= entry["soft"]
+
+
+async def _compute_and_store(cache_session, entry_key: bytes, call, ttl: int, stale_ttl: int):
+    """Compute the value and store it in a new entry"""
+    started_at = time.perf_counter()
+    value = await call()
+    delta = time.perf_counter() - started_at
+
+    now = time.time()
+    entry = {"v": value, "soft": now + ttl, "hard": now + ttl + stale_ttl, "delta": delta}
+    try:
+        await cache_session.set(entry_key, orjson.dumps(entry), exptime=ttl + stale_ttl)
+    except (CacheUnavailableError, TypeError) as e:
+        logging.debug(f"Cache entry {entry_key.decode('utf-8')} not stored: {e}")
+    return value
+
+
+async def _refresh(cache_session, entry_key: bytes, lock_key: bytes, call, ttl: int, stale_ttl: int) -> None:
+    """Refresh an entry in the background, the stale value is kept when it fails"""
+    try:
+        await _compute_and_store(cache_session=cache_session, entry_key=entry_key, call=call, ttl=ttl, stale_ttl=stale_ttl)
+    except Exception as e:
+        logging.warning(f"Background refresh of {entry_key.decode('utf-8')} failed, serving the stale value: {e}")
+    finally:
+        try:
+            await cache_session.delete(lock_key)
+        except CacheUnavailableError:
+            pass  # The lock expires on its own
+
+
+def _schedule_refresh(cache_session, namespace: str, key: str, call, ttl: int, stale_ttl: int) -> None:
+    """Start a background refresh unless one is already running (in any worker)"""
+    async def refresh_once():
+        lock_key = _lock_key(namespace, key)
+        try:
+            if not await cache_session.add(lock_key, b"1", exptime=SWR_REFRESH_LOCK_TTL):
+                return
+        except CacheUnavailableError:
+            return
+        await _refresh(cache_session=cache_session, entry_key=_entry_key(namespace, key), lock_key=lock_key, call=call, ttl=ttl, stale_ttl=stale_ttl)
+
+    task = asyncio.ensure_future(refresh_once())
+    _refresh_tasks.add(task)
+    task.add_done_callback(_refresh_tasks.discard)
+
+
+def swr_cached(namespace: str, ttl: int, stale_ttl: int, exclude: tuple = ("db_pool",)):
+    """
+    Cache the result of an async function with stale-while-revalidate entries
+    namespace: Prefix of the cache keys (one per decorated function)
+    ttl: Seconds the value is fresh (soft expiry)
+    stale_ttl: Seconds a stale value can still be served while it is refreshed (hard expiry = ttl + stale_ttl)
+    exclude: Parameters that are not part of the cache key (connections, pools)
+    """
+    def decorator(func):
+        signature = inspect.signature(func)
+
+        @wraps(func)
+        async def wrapper(*args, **kwargs):
+            cache_session = MemcachedClient.get_optional_client()
+            if cache_session is None:
+                return await func(*args, **kwargs)
+
+            key = call_key(namespace=namespace, signature=signature, args=args, kwargs=kwargs, exclude=exclude)
+            entry_key = _entry_key(namespace, key)
+            call = lambda: func(*args, **kwargs)
+
+            try:
+                stored = await cache_session.get(entry_key)
+            except CacheUnavailableError:
+                return await func(*args, **kwargs)
+
+            entry: Optional[dict] = orjson.loads(stored) if stored else None
+            if entry is None:
+                return await _compute_and_store(cache_session=cache_session, entry_key=entry_key, call=call, ttl=ttl, stale_ttl=stale_ttl)
+
+            if _should_refresh(entry=entry, now=time.time()):
+                _schedule_refresh(cache_session=cache_session, namespace=namespace, key=key, call=call, ttl=ttl, stale_ttl=stale_ttl)
+            return entry["v"]
+
+        return wrapper
+
+    return decorator
@@ -2,7 +2,7 @@
 Handler for user-related database operations
 """
 
-from src.utils.base.libraries import aiomcache, asyncpg, TypeAlias, logging, status, json
+from src.utils.base.libraries import aiomcache, asyncpg, TypeAlias, logging, status
 from src.utils.models import All_Exceptions
 
 
@@ -68,7 +68,7 @@ async def create_new_user(db_session: PgSession, id: str, email: str, user_name:
         await db_session.execute(
             "INSERT INTO users (id, user_name, email, hashed_password, profile_data) "
             "VALUES ($1, $2, $3, $4, $5)",
-            id, user_name, email, hashed_password, json.dumps(profile_data)
+            id, user_name, email, hashed_password, profile_data
         )
 
     except Exception as e:
@@ -84,7 +84,7 @@ async def get_user_by_name(db_session: PgSession, user_name: str) -> dict:
     Get user by ID from the database
     """
     user_row = await db_session.fetchrow(
-        "SELECT * FROM users WHERE user_name = $1",
+        "SELECT id, user_name, email, hashed_password, profile_data, is_active, created_at FROM users WHERE user_name = $1",
         user_name
     )
 
@@ -99,7 +99,7 @@ async def get_user_by_name(db_session: PgSession, user_name: str) -> dict:
         "user_name": user_row["user_name"],
         "email": user_row["email"],
         "hashed_password": user_row["hashed_password"],
-        "profile_data": json.loads(user_row["profile_data"]),
+        "profile_data": user_row["profile_data"],
         "is_active": user_row["is_active"],
         "created_at": user_row["created_at"]
     }
@@ -119,7 +119,7 @@ async def get_user_profile_details_by_id(db_session: PgSession, user_id: str) ->
             status_code=status.HTTP_404_NOT_FOUND
         )
 
-    return json.loads(user_row["profile_data"])
+    return user_row["profile_data"]
 
 
 async def replace_user_profile_details_by_id(db_session: PgSession, user_id: str, profile_data: dict) -> None:
@@ -129,7 +129,7 @@ async def replace_user_profile_details_by_id(db_session: PgSession, user_id: str
     try:
         await db_session.execute(
             "UPDATE users SET profile_data = $1 WHERE id = $2",
-            json.dumps(profile_data), user_id
+            profile_data, user_id
         )
     except Exception as e:
         logging.error(f"Error while updating user profile details: {e}")
@@ -164,7 +164,7 @@ async def create_api_key_for_user(db_session: PgSession, user_id: str, api_key_i
         await db_session.execute(
             "INSERT INTO api_keys (id, user_id, api_key, details) "
             "VALUES ($1, $2, $3, $4)",
-            api_key_id, user_id, api_key, json.dumps(details)
+            api_key_id, user_id, api_key, details
         )
 
     except Exception as e:
@@ -181,7 +181,7 @@ async def list_api_keys_for_user(db_session: PgSession, user_id: str, page: int
     """
     offset = (page - 1) * page_size
     api_keys_rows = await db_session.fetch(
-        "SELECT * FROM api_keys WHERE user_id = $1 ORDER BY created_at DESC LIMIT $2 OFFSET $3",
+        "SELECT id, user_id, api_key, details, created_at FROM api_keys WHERE user_id = $1 ORDER BY created_at DESC LIMIT $2 OFFSET $3",
         user_id, page_size, offset
     )
     if not api_keys_rows:
@@ -195,7 +195,7 @@ async def list_api_keys_for_user(db_session: PgSession, user_id: str, page: int
             "id": row["id"],
             "user_id": row["user_id"],
             "api_key": row["api_key"][:4] + "****" + row["api_key"][-4:],
-            "details": json.loads(row["details"]),
+            "details": row["details"],
             "created_at": row["created_at"]
         } for row in api_keys_rows
     ]
@@ -208,7 +208,7 @@ async def edit_api_key_details_by_id(db_session: PgSession, api_key_id: str, use
     try:
         await db_session.execute(
             "UPDATE api_keys SET details = $1 WHERE id = $2 AND user_id = $3",
-            json.dumps(new_details), api_key_id, user_id
+            new_details, api_key_id, user_id
         )
     except Exception as e:
         logging.error(f"Error while editing API key details: {e}")
@@ -240,7 +240,7 @@ async def get_api_key_details(db_session: PgSession, api_key: str) -> dict:
     Get API key details from the database (Auth Middleware) [Internal Use Only]
     """
     api_key_row = await db_session.fetchrow(
-        "SELECT * FROM api_keys WHERE api_key = $1",
+        "SELECT id, user_id, api_key, details, created_at FROM api_keys WHERE api_key = $1",
         api_key
     )
 
@@ -254,6 +254,6 @@ async def get_api_key_details(db_session: PgSession, api_key: str) -> dict:
         "id": api_key_row["id"],
         "user_id": api_key_row["user_id"],
         "api_key": api_key_row["api_key"],
-        "details": json.loads(api_key_row["details"]),
+        "details": api_key_row["details"],
         "created_at": api_key_row["created_at"]
     }
@@ -0,0 +1,147 @@
+"""
+Warm-up of a starting worker, run by the lifespan before the worker reports ready
+1. **Connections**:
+    - The `min_size` pool connections are checked out together, so all of them are open before traffic arrives.
+    - The hot read statements are run on every one of them (asyncpg caches them per connection), the
+      full scan statements are only prepared.
+2. **Cache**:
+    - The top-N packages (by popularity score) are loaded through the cached handlers, entries missing in Memcached are filled
+      once (the other starting workers find them or join the same flight).
+3. **Readiness**:
+    - `worker_state` tracks the warm-up, `health_report` is served by the `/health` endpoints.
+A failed or slow warm-up is logged and never stops the worker, it only starts cold
+"""
+
+from src.utils.base.libraries import asyncio, dataclass, field, Optional, logging, time
+from src.utils.base.constants import WARMUP_TOP_PACKAGES, WARMUP_TIMEOUT, POSTGRES_ACQUIRE_TIMEOUT
+from .connections import Database, MemcachedClient, db
+from .job_queue import job_runner
+from .downloads import download_counter
+from .package_handler import (
+    hot_statements,
+    get_top_packages,
+    get_base_package_details_by_id,
+    get_versioned_package_details,
+    get_all_versioned_packages
+)
+
+
+@dataclass
+class WorkerState:
+    """Warm-up progress and readiness of this worker"""
+    started_at: float = field(default_factory=time.time)
+    ready: bool = False
+    warm_up_seconds: Optional[float] = None
+    warmed_connections: int = 0
+    prepared_statements: int = 0
+    preloaded_packages: int = 0
+    warm_up_errors: list = field(default_factory=list)
+
+
+worker_state = WorkerState()
+
+
+async def _prepare_statements(connection, statements: list) -> int:
+    for query, arguments in statements:
+        if arguments is None:
+            await connection.prepare(query)
+        else:
+            await connection.fetch(query, *arguments)
+    return len(statements)
+
+
+async def _warm_connections(database: Database) -> None:
+    """Open the `min_size` connections and run the hot statements on each of them"""
+    pool = database.pool
+    statements = hot_statements()
+    connections = []
+    try:
+        # Held at once, so every checkout is a different connection
+        for _ in range(pool.get_min_size()):
+            connections.append(await pool.acquire(timeout=POSTGRES_ACQUIRE_TIMEOUT))
+        prepared = await asyncio.gather(*(_prepare_statements(connection, statements) for connection in connections))
+    finally:
+        for connection in connections:
+            await pool.release(connection)
+
+    worker_state.warmed_connections = len(connections)
+    worker_state.prepared_statements = sum(prepared)
+
+
+async def _preload_package(database: Database, package: dict) -> None:
+    """Load the pages of a package most likely to be requested first"""
+    package_id = str(package["id"])
+    await get_base_package_details_by_id(db_pool=database, package_id=package_id)
+    await get_all_versioned_packages(db_pool=database, base_package_id=package_id)
+    if package["latest_version_id"]:
+        await get_versioned_package_details(db_pool=database, package_id=str(package["latest_version_id"]))
+    worker_state.preloaded_packages += 1
+
+
+async def _preload_packages(database: Database) -> None:
+    """Fill the cache with the top packages (nothing to do without a usable cache)"""
+    if not WARMUP_TOP_PACKAGES or MemcachedClient.get_optional_client() is None:
+        return
+
+    packages = await get_top_packages(db_pool=database, limit=WARMUP_TOP_PACKAGES)
+    # Leave pool connections for the requests arriving meanwhile
+    concurrency = asyncio.Semaphore(max(1, database.pool.get_min_size() // 2))
+
+    async def preload(package: dict) -> None:
+        async with concurrency:
+            await _preload_package(database=database, package=package)
+
+    results = await asyncio.gather(*(preload(package) for package in packages), return_exceptions=True)
+    failures = [result for result in results if isinstance(result, Exception)]
+    if failures:
+        worker_state.warm_up_errors.append(f"{len(failures)} packages not preloaded: {failures[0]}")
+
+
+async def warm_up_worker(database: Database) -> None:
+    """Warm the pool and the cache, then mark the worker ready"""
+    started_at = time.perf_counter()
+    for step in (_warm_connections, _preload_packages):
+        try:
+            await asyncio.wait_for(step(database), timeout=max(0.0, WARMUP_TIMEOUT - (time.perf_counter() - started_at)))
+        except asyncio.TimeoutError:
+            worker_state.warm_up_errors.append(f"{step.__name__.strip('_')} timed out after {WARMUP_TIMEOUT}s")
+        except Exception as e:
+            worker_state.warm_up_errors.append(f"{step.__name__.strip('_')} failed: {e}")
+
+    worker_state.warm_up_seconds = round(time.perf_counter() - started_at, 3)
+    worker_state.ready = True
+    if worker_state.warm_up_errors:
+        logging.warning(f"Worker warm-up finished with errors in {worker_state.warm_up_seconds}s: {'; '.join(worker_state.warm_up_errors)}")
+    else:
+        logging.info(
+            f"Worker warmed up in {worker_state.warm_up_seconds}s: {worker_state.warmed_connections} connections, "
+            f"{worker_state.prepared_statements} statements, {worker_state.preloaded_packages} packages preloaded"
+        )
+
+
+def health_report(database: Database = db) -> tuple[bool, dict]:
+    """Readiness of the worker and the state of its pools (no I/O, safe to poll often)"""
+    client = MemcachedClient.client
+    breaker = MemcachedClient.breaker.stats()
+    ready = worker_state.ready and database.pool is not None
+
+    return ready, {
+        "status": "ready" if ready else "starting",
+        "uptime": round(time.time() - worker_state.started_at, 3),
+        "warm_up": {
+            "seconds": worker_state.warm_up_seconds,
+            "connections": worker_state.warmed_connections,
+            "statements": worker_state.prepared_statements,
+            "packages": worker_state.preloaded_packages,
+            "errors": worker_state.warm_up_errors
+        },
+        "postgres": database.pool_stats(),
+        "memcached": {
+            # Reads fall through to PostgreSQL while the cache is down, so it does not make the worker unready
+            "available": client is not None and breaker["state"] != "open",
+            "breaker": breaker,
+            "nodes": client.node_stats() if client else []
+        },
+        "jobs": job_runner.stats(),
+        "downloads": download_counter.stats()
+    }
@@ -2,9 +2,9 @@
 Basic functions required for the project are defined here
 """
 
-from .utils.base.libraries import json, Request, status, Annotated, Depends
+from .utils.base.libraries import Request, status, Annotated, Depends
 from .utils.models import All_Exceptions
-from .database import MemcachedDep
+from .database import MemcachedDep, get_user_session, session_csrf_matches
 
 
 async def get_current_user_session_details(request: Request, CacheDB: MemcachedDep) -> dict:
@@ -19,13 +19,12 @@ async def get_current_user_session_details(request: Request, CacheDB: MemcachedD
     if not csrf_token:
         raise All_Exceptions(message="CSRF token not found", status_code=status.HTTP_406_NOT_ACCEPTABLE)
 
-    user_data_bytes = await CacheDB.get(session_id.encode("utf-8"))
-    if not user_data_bytes:
+    # In signed session mode this is a pure in-process check (no cache round trip)
+    user_data = await get_user_session(cache_session=CacheDB, session_cookie=session_id)
+    if not user_data:
         raise All_Exceptions(message="Session expired", status_code=status.HTTP_401_UNAUTHORIZED)
 
-    user_data = json.loads(user_data_bytes.decode("utf-8"))
-
-    if user_data["csrf_token"] != csrf_token:
+    if not session_csrf_matches(session=user_data, csrf_token=csrf_token):
         raise All_Exceptions(message="CSRF token mismatch", status_code=status.HTTP_401_UNAUTHORIZED)
 
     return user_data
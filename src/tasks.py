@@ -0,0 +1,18 @@
+"""
+Background jobs of the API, queued with `enqueue_job` and run by the job runner of every worker
+Handlers must be idempotent: a job interrupted by a worker restart runs again
+"""
+
+from .database import job_runner, RECOMPUTE_PACKAGE_SCORES, recompute_package_scores, schedule_package_scores
+
+
+@job_runner.job(RECOMPUTE_PACKAGE_SCORES, concurrency=1, timeout=300)
+async def recompute_scores(db_pool, payload: dict) -> None:
+    """
+    Recompute the popularity scores used by the search ranking (periodic, see `package_scores.py`)
+    """
+    # Next run queued first, so a failing recompute does not end the schedule
+    async with db_pool.get_connection() as db_session:
+        await schedule_package_scores(db_session=db_session)
+
+    await recompute_package_scores(db_pool=db_pool)
@@ -12,17 +12,93 @@ POSTGRES_DB_HOST = os.environ.get("POSTGRES_DB_HOST", "localhost")
 POSTGRES_DB_PORT = os.environ.get("POSTGRES_DB_PORT", "5432")
 POSTGRES_DB_DATABASE = os.environ.get("POSTGRES_DB_DATABASE", "neko_nik_db")
 POSTGRES_POOL_SIZE = int(os.environ.get("POSTGRES_POOL_SIZE", 10))
+POSTGRES_ACQUIRE_TIMEOUT = float(os.environ.get("POSTGRES_ACQUIRE_TIMEOUT", 5)) # seconds to wait for a free pool connection
 POSTGRES_DB_URI = os.environ.get("POSTGRES_URI", f"postgresql://{POSTGRES_DB_USERNAME}:{POSTGRES_DB_PASSWORD}@{POSTGRES_DB_HOST}:{POSTGRES_DB_PORT}/{POSTGRES_DB_DATABASE}")
 
 HCAPTCHA_SECRET_KEY = os.environ.get("HCAPTCHA_SECRET_KEY", "SOME_HCAPTCHA_SECRET_KEY")
+BCRYPT_ROUNDS = int(os.environ.get("BCRYPT_ROUNDS", 12)) # password hashing cost (each +1 doubles the time)
 
 # MemCache DB Constants
 MEMCACHED_DB_HOST = os.environ.get("MEMCACHED_DB_HOST", "localhost")
 MEMCACHED_DB_PORT = os.environ.get("MEMCACHED_DB_PORT", "11211")
-MEMCACHED_DB_POOL_SIZE = int(os.environ.get("MEMCACHED_DB_POOL_SIZE", 10))
-MAX_AGE_OF_CACHE = int(os.environ.get("MAX_AGE_OF_CACHE", 3*60*60)) # 3 hours
+MEMCACHED_DB_POOL_SIZE = int(os.environ.get("MEMCACHED_DB_POOL_SIZE", 10)) # per node
+# Comma separated `host:port` list, keys are sharded over them (defaults to the single host above)
+MEMCACHED_SERVERS = os.environ.get("MEMCACHED_SERVERS", f"{MEMCACHED_DB_HOST}:{MEMCACHED_DB_PORT}")
+MEMCACHED_VIRTUAL_NODES = int(os.environ.get("MEMCACHED_VIRTUAL_NODES", 160)) # points per node on the hash ring
+MEMCACHED_OP_TIMEOUT = float(os.environ.get("MEMCACHED_OP_TIMEOUT", 0.5)) # seconds
+MEMCACHED_FAILURE_THRESHOLD = int(os.environ.get("MEMCACHED_FAILURE_THRESHOLD", 3)) # consecutive failures before ejecting a node
+MEMCACHED_RETRY_BACKOFF = float(os.environ.get("MEMCACHED_RETRY_BACKOFF", 1)) # seconds, doubled on every failed retry
+MEMCACHED_MAX_RETRY_BACKOFF = float(os.environ.get("MEMCACHED_MAX_RETRY_BACKOFF", 60)) # seconds
+# Circuit breaker around the whole cache tier
+CACHE_BREAKER_FAILURE_THRESHOLD = int(os.environ.get("CACHE_BREAKER_FAILURE_THRESHOLD", 5)) # consecutive failures
+CACHE_BREAKER_RESET_TIMEOUT = float(os.environ.get("CACHE_BREAKER_RESET_TIMEOUT", 5)) # seconds before probing again
+CACHE_BREAKER_HALF_OPEN_CALLS = int(os.environ.get("CACHE_BREAKER_HALF_OPEN_CALLS", 1)) # concurrent probe calls
+# Request coalescing of hot reads across workers
+SINGLE_FLIGHT_LEASE_TTL = int(os.environ.get("SINGLE_FLIGHT_LEASE_TTL", 2)) # seconds, also the longest time other workers wait for the result
+SINGLE_FLIGHT_POLL_INTERVAL = float(os.environ.get("SINGLE_FLIGHT_POLL_INTERVAL", 0.02)) # seconds between result checks
+# Stale-while-revalidate cache entries
+SWR_XFETCH_BETA = float(os.environ.get("SWR_XFETCH_BETA", 1.0)) # > 1 favors earlier refreshes, 0 disables early refreshes
+SWR_REFRESH_LOCK_TTL = int(os.environ.get("SWR_REFRESH_LOCK_TTL", 10)) # seconds, a single worker refreshes an entry meanwhile
+MAX_AGE_OF_CACHE = int(os.environ.get("MAX_AGE_OF_CACHE", 3*60*60)) # 3 hours (absolute session lifetime)
+SESSION_IDLE_TIMEOUT = int(os.environ.get("SESSION_IDLE_TIMEOUT", 30*60)) # 30 minutes without activity
+SESSION_TOUCH_INTERVAL = int(os.environ.get("SESSION_TOUCH_INTERVAL", 60)) # extend a session TTL at most once per minute
+
+# Session mode: "cache" (session stored in Memcached) or "signed" (HMAC signed cookie, Memcached only holds a denylist)
+SESSION_MODE = os.environ.get("SESSION_MODE", "cache").lower()
+SESSION_SIGNING_KEY = os.environ.get("SESSION_SIGNING_KEY", "")
+SESSION_SIGNING_KEY_PREVIOUS = os.environ.get("SESSION_SIGNING_KEY_PREVIOUS", "") # Still accepted while rotating keys
+SESSION_DENYLIST_REFRESH = int(os.environ.get("SESSION_DENYLIST_REFRESH", 5)) # seconds
+
+# Response compression
+COMPRESSION_MIN_SIZE = int(os.environ.get("COMPRESSION_MIN_SIZE", 1024)) # bytes
+GZIP_COMPRESS_LEVEL = int(os.environ.get("GZIP_COMPRESS_LEVEL", 6))
+BROTLI_COMPRESS_QUALITY = int(os.environ.get("BROTLI_COMPRESS_QUALITY", 5))
+
+# Admission control (adaptive concurrency limit per worker)
+ADMISSION_INITIAL_LIMIT = int(os.environ.get("ADMISSION_INITIAL_LIMIT", POSTGRES_POOL_SIZE * 4))
+ADMISSION_MIN_LIMIT = int(os.environ.get("ADMISSION_MIN_LIMIT", POSTGRES_POOL_SIZE))
+ADMISSION_MAX_LIMIT = int(os.environ.get("ADMISSION_MAX_LIMIT", POSTGRES_POOL_SIZE * 20))
+ADMISSION_POOL_WAIT_THRESHOLD = float(os.environ.get("ADMISSION_POOL_WAIT_THRESHOLD", 0.25)) # seconds
+ADMISSION_RETRY_AFTER = int(os.environ.get("ADMISSION_RETRY_AFTER", 2)) # seconds
+
+# Worker warm-up (before the worker reports ready on /health/ready)
+WARMUP_ENABLED = os.environ.get("WARMUP_ENABLED", "true").lower() in ("1", "true", "yes")
+WARMUP_TOP_PACKAGES = int(os.environ.get("WARMUP_TOP_PACKAGES", 50)) # packages preloaded into the cache, 0 disables it
+WARMUP_TIMEOUT = float(os.environ.get("WARMUP_TIMEOUT", 15)) # seconds, the worker starts cold after that
+
+# Background jobs (PostgreSQL `jobs` table, run by every worker process)
+JOBS_ENABLED = os.environ.get("JOBS_ENABLED", "true").lower() in ("1", "true", "yes")
+JOB_WORKER_CONCURRENCY = int(os.environ.get("JOB_WORKER_CONCURRENCY", 4)) # jobs run at once per worker process
+JOB_POLL_INTERVAL = float(os.environ.get("JOB_POLL_INTERVAL", 1)) # seconds between claims while the queue is empty
+JOB_TIMEOUT = float(os.environ.get("JOB_TIMEOUT", 60)) # seconds, default of a job kind
+JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", 5))
+JOB_RETRY_BACKOFF = float(os.environ.get("JOB_RETRY_BACKOFF", 5)) # seconds before the first retry, doubled on every retry
+JOB_MAX_RETRY_BACKOFF = float(os.environ.get("JOB_MAX_RETRY_BACKOFF", 600)) # seconds
+JOB_RETENTION = int(os.environ.get("JOB_RETENTION", 7*24*60*60)) # 7 days before done jobs are deleted
+
+# Package uploads (archives are stored as `<PACKAGE_STORAGE_PATH>/<first letter>/<name>/<version>.tar.gz`)
+PACKAGE_STORAGE_PATH = os.environ.get("PACKAGE_STORAGE_PATH", "/var/lib/nikl/packages")
+PACKAGE_MAX_UPLOAD_SIZE = int(os.environ.get("PACKAGE_MAX_UPLOAD_SIZE", 50*1024*1024)) # bytes of the .tar.gz
+PACKAGE_MAX_UNPACKED_SIZE = int(os.environ.get("PACKAGE_MAX_UNPACKED_SIZE", 200*1024*1024)) # bytes of all the files
+PACKAGE_MAX_FILE_SIZE = int(os.environ.get("PACKAGE_MAX_FILE_SIZE", 50*1024*1024)) # bytes of a single file
+PACKAGE_MAX_ENTRIES = int(os.environ.get("PACKAGE_MAX_ENTRIES", 10000)) # files and directories in an archive
+PACKAGE_INSPECTION_PROCESSES = int(os.environ.get("PACKAGE_INSPECTION_PROCESSES", 2)) # per worker process
+PACKAGE_INSPECTION_TIMEOUT = float(os.environ.get("PACKAGE_INSPECTION_TIMEOUT", 60)) # seconds
+PACKAGE_FILE_CACHE_MAX_SIZE = int(os.environ.get("PACKAGE_FILE_CACHE_MAX_SIZE", 256*1024)) # bytes, larger files read from the archive are not cached in Memcached
+
+# Catalog export (every running export holds a pool connection)
+EXPORT_MAX_CONCURRENT = int(os.environ.get("EXPORT_MAX_CONCURRENT", 1)) # per worker process
+EXPORT_PREFETCH = int(os.environ.get("EXPORT_PREFETCH", 500)) # rows per cursor fetch
+EXPORT_IDLE_TIMEOUT = float(os.environ.get("EXPORT_IDLE_TIMEOUT", 60)) # seconds a client can stop reading before the export is ended
+
+# Download counters (Memcached, folded into PostgreSQL by every worker)
+DOWNLOAD_FLUSH_INTERVAL = float(os.environ.get("DOWNLOAD_FLUSH_INTERVAL", 10)) # seconds between two flushes
+
+# Search ranking (popularity scores recomputed by a background job)
+PACKAGE_SCORE_INTERVAL = int(os.environ.get("PACKAGE_SCORE_INTERVAL", 15*60)) # seconds between two recomputes
 
 
 # log variables
 LOG_LEVEL = int(os.environ.get("LOG_LEVEL", 20))
-LOG_FILE_PATH = "/var/log/api/logs.jsonl"
+LOG_FILE_PATH = os.environ.get("LOG_FILE_PATH", "/var/log/api/logs.jsonl")
+STARTUP_PROFILE = os.environ.get("STARTUP_PROFILE", "false").lower() in ("1", "true", "yes") # log import / boot timings of every worker
@@ -1,15 +1,23 @@
 """
 This file has all the necessary libraries for the project to run
 any new library should be added here and imported in the respective files
+Rarely used or heavy libraries are imported lazily on first use (see the `Lazy libraries` section),
+so they do not slow down the boot of every worker
 """
 
+# Boot profiling (this is the first project module imported by a worker)
+import time
+BOOT_STARTED_AT = time.perf_counter()
+import importlib
+import types
+import sys
+
 # FastAPI libraries
-from fastapi import FastAPI, File, UploadFile, Form, Request, status, Response, Depends, APIRouter, BackgroundTasks
-from fastapi.responses import JSONResponse , PlainTextResponse , HTMLResponse
+from fastapi import FastAPI, UploadFile, Request, status, Response, Depends, APIRouter, BackgroundTasks
+from fastapi.responses import JSONResponse, FileResponse, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.templating import Jinja2Templates
-from fastapi.security import APIKeyHeader
-import uvicorn
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
 # Object data modeling libraries
 from pydantic import BaseModel, Field
@@ -19,23 +27,109 @@ from typing import Annotated, AsyncGenerator, Optional, TypeAlias, List
 from contextlib import asynccontextmanager
 import aiomcache
 import asyncpg
+import orjson
 
 # other libraries
-from datetime import datetime
-from functools import wraps
-import subprocess
-import requests
+from email.utils import format_datetime, parsedate_to_datetime
+from datetime import datetime, timedelta, timezone
+from dataclasses import dataclass, field
+from contextvars import ContextVar
+from functools import wraps, lru_cache
+import concurrent.futures
+import posixpath
+import mimetypes
+import tempfile
+import shutil
+import inspect
+import hashlib
+import bisect
+import struct
+import secrets
+import random
+import hmac
+import asyncio
+import math
+import gzip
+import zlib
 import base64
-import bcrypt
 import uuid
 import json
 import re
 import os
 
 
+# ======= Lazy libraries =======
+
+# Seconds spent in each lazy import (logged at startup with STARTUP_PROFILE)
+IMPORT_TIMINGS: dict = {}
+
+# Name -> (module, attribute), imported the first time the name is imported from this module
+_LAZY_ATTRIBUTES = {
+    "File": ("fastapi", "File"),
+    "Form": ("fastapi", "Form"),
+    "PlainTextResponse": ("fastapi.responses", "PlainTextResponse"),
+    "HTMLResponse": ("fastapi.responses", "HTMLResponse"),
+    "Jinja2Templates": ("fastapi.templating", "Jinja2Templates"),
+    "APIKeyHeader": ("fastapi.security", "APIKeyHeader")
+}
+
+# Modules handed out as placeholders, the real module is imported on its first attribute access
+_LAZY_MODULES = ("requests", "subprocess", "uvicorn", "bcrypt", "tarfile", "multiprocessing")
+
+# Modules that may not be installed (the name is `None` then)
+_OPTIONAL_MODULES = ("brotli",)
+
+
+def _timed_import(module_name: str) -> types.ModuleType:
+    """Import a module, recording how long it took when it was not loaded yet"""
+    if module_name in sys.modules:
+        return sys.modules[module_name]
+    started_at = time.perf_counter()
+    module = importlib.import_module(module_name)
+    IMPORT_TIMINGS[module_name] = time.perf_counter() - started_at
+    return module
+
+
+class _LazyModule(types.ModuleType):
+    """Placeholder of a module, importing it on first attribute access"""
+    def __init__(self, name: str):
+        super().__init__(name)
+        self.__dict__["_module"] = None
+
+    def __getattr__(self, attribute: str):
+        if self._module is None:
+            self.__dict__["_module"] = _timed_import(self.__name__)
+        value = getattr(self._module, attribute)
+        # Cached on the placeholder, later accesses do not go through __getattr__
+        setattr(self, attribute, value)
+        return value
+
+    def __repr__(self) -> str:
+        return f"<lazy module {self.__name__!r} ({'loaded' if self._module else 'not loaded'})>"
+
+
+def __getattr__(name: str):
+    """Resolve the lazy libraries (PEP 562), once per name"""
+    if name in _LAZY_ATTRIBUTES:
+        module_name, attribute = _LAZY_ATTRIBUTES[name]
+        value = getattr(_timed_import(module_name), attribute)
+    elif name in _LAZY_MODULES:
+        value = _LazyModule(name)
+    elif name in _OPTIONAL_MODULES:
+        try:
+            value = _timed_import(name)
+        except ImportError:
+            value = None
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+    globals()[name] = value
+    return value
+
+
 # Getting some constants from the constants.py file
 from src.utils.base.constants import LOG_LEVEL, LOG_FILE_PATH
 
-# Configure logging 
-from src.utils.base.log_utils import configure_return_logger
-logging = configure_return_logger(LOG_LEVEL=LOG_LEVEL, LOG_FILE_PATH=LOG_FILE_PATH)
+# Configure logging (the log file is only opened by the first log call)
+from src.utils.base.log_utils import LazyLogger
+logging = LazyLogger(LOG_LEVEL=LOG_LEVEL, LOG_FILE_PATH=LOG_FILE_PATH)
@@ -45,3 +45,21 @@ def configure_return_logger(LOG_LEVEL, LOG_FILE_PATH):
     logger.debug(f"Logging initialized at level {LOG_LEVEL}")
 
     return logger
+
+
+class LazyLogger:
+    """
+    Logger configured on its first use, so importing the project has no side effect
+    (no log file is opened until something is logged)
+    """
+    def __init__(self, LOG_LEVEL, LOG_FILE_PATH):
+        self._config = {"LOG_LEVEL": LOG_LEVEL, "LOG_FILE_PATH": LOG_FILE_PATH}
+        self._logger = None
+
+    def __getattr__(self, name):
+        if self._logger is None:
+            self._logger = configure_return_logger(**self._config)
+        value = getattr(self._logger, name)
+        # Cache the bound logging methods, later calls skip __getattr__
+        setattr(self, name, value)
+        return value
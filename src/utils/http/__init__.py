@@ -0,0 +1,58 @@
+"""
+All the HTTP layer helpers (caching, compression, etc.) used by the API are defined here
+"""
+
+from .caching import (
+    CachePolicy,
+    BASE_PACKAGE_POLICY,
+    VERSIONED_PACKAGE_POLICY,
+    PACKAGE_LISTING_POLICY,
+    PACKAGE_SEARCH_POLICY,
+    PACKAGE_CHANGES_POLICY,
+    make_etag,
+    conditional_headers,
+    conditional_json_response
+)
+from .compression import (
+    CompressionMiddleware,
+    negotiate_encoding
+)
+from .admission import AdmissionControlMiddleware, admission_controller
+
+
+__version__ = "v1.0.0-phoenix-release"
+
+
+__annotations__ = {
+    "version": __version__,
+    "CachePolicy": "Cache-Control policy of a route",
+    "BASE_PACKAGE_POLICY": "Cache policy for base package details",
+    "VERSIONED_PACKAGE_POLICY": "Cache policy for versioned package details",
+    "PACKAGE_LISTING_POLICY": "Cache policy for versioned package listings",
+    "PACKAGE_SEARCH_POLICY": "Cache policy for base package search results",
+    "PACKAGE_CHANGES_POLICY": "Cache policy for the catalog change feed",
+    "make_etag": "Function to build a strong ETag from row versions or a response body",
+    "conditional_headers": "Function to build the caching headers of a response and check the request validators",
+    "conditional_json_response": "Function to build a JSON response that honours conditional request headers",
+    "CompressionMiddleware": "ASGI middleware for negotiated gzip / brotli response compression",
+    "negotiate_encoding": "Function to pick a content coding from an Accept-Encoding header",
+    "AdmissionControlMiddleware": "ASGI middleware shedding low priority requests under overload",
+    "admission_controller": "Per worker admission controller with the adaptive concurrency limit"
+}
+
+
+__all__ = [
+    "CachePolicy",
+    "BASE_PACKAGE_POLICY",
+    "VERSIONED_PACKAGE_POLICY",
+    "PACKAGE_LISTING_POLICY",
+    "PACKAGE_SEARCH_POLICY",
+    "PACKAGE_CHANGES_POLICY",
+    "make_etag",
+    "conditional_headers",
+    "conditional_json_response",
+    "CompressionMiddleware",
+    "negotiate_encoding",
+    "AdmissionControlMiddleware",
+    "admission_controller"
+]
@@ -0,0 +1,229 @@
+"""
+Adaptive admission control and load shedding
+1. **AdaptiveLimit**:
+    - A concurrency limit that follows observed latency (gradient algorithm).
+    - It shrinks when latency rises above the long term baseline and grows back when it recovers.
+2. **AdmissionController**:
+    - Tracks in-flight requests, latency and pool wait times per route class.
+    - Low priority work (search, listings) is shed first, critical work (auth, downloads) last.
+3. **AdmissionControlMiddleware**:
+    - ASGI middleware rejecting shed requests with a fast 503 and a `Retry-After` header.
+"""
+
+from src.utils.base.libraries import (
+    ContextVar,
+    dataclass,
+    Optional,
+    ASGIApp,
+    Message,
+    Receive,
+    Scope,
+    Send,
+    orjson,
+    field,
+    math,
+    time,
+    re
+)
+from src.utils.base.constants import (
+    ADMISSION_INITIAL_LIMIT,
+    ADMISSION_MIN_LIMIT,
+    ADMISSION_MAX_LIMIT,
+    ADMISSION_POOL_WAIT_THRESHOLD,
+    ADMISSION_RETRY_AFTER
+)
+
+
+# Route classes, the lower the priority number the later it is shed
+CRITICAL, NORMAL, LOW = "critical", "normal", "low"
+ROUTE_CLASS_PRIORITY = {CRITICAL: 0, NORMAL: 1, LOW: 2}
+
+# Share of the concurrency limit each route class is allowed to fill
+ROUTE_CLASS_LIMIT_SHARE = {CRITICAL: 1.0, NORMAL: 0.8, LOW: 0.5}
+
+# Route class of the request being served (used to attribute pool waits)
+current_route_class: ContextVar[str] = ContextVar("current_route_class", default=NORMAL)
+
+
+class AdaptiveLimit:
+    """
+    Concurrency limit driven by latency (gradient algorithm)
+    The short term latency is compared to the long term baseline, when requests slow down
+    the gradient drops below 1 and the limit shrinks, otherwise it grows by a small queue allowance
+    """
+    def __init__(self, initial_limit: int, min_limit: int, max_limit: int, tolerance: float = 2.0, smoothing: float = 0.2):
+        self.limit = float(initial_limit)
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.tolerance = tolerance
+        self.smoothing = smoothing
+        self.short_rtt: Optional[float] = None
+        self.long_rtt: Optional[float] = None
+
+    def on_sample(self, latency: float) -> None:
+        """Update the limit with the latency of a completed request"""
+        if self.short_rtt is None:
+            self.short_rtt = self.long_rtt = latency
+            return
+
+        self.short_rtt = 0.5 * self.short_rtt + 0.5 * latency
+        self.long_rtt = 0.99 * self.long_rtt + 0.01 * latency
+
+        # Let the baseline recover quickly once latency goes back down
+        if self.long_rtt > self.short_rtt * 2:
+            self.long_rtt *= 0.95
+
+        gradient = max(0.5, min(1.0, self.tolerance * self.long_rtt / self.short_rtt))
+        new_limit = self.limit * gradient + math.sqrt(self.limit)
+        new_limit = (1 - self.smoothing) * self.limit + self.smoothing * new_limit
+        self.limit = max(float(self.min_limit), min(float(self.max_limit), new_limit))
+
+
+@dataclass
+class RouteClassStats:
+    """Counters of a route class"""
+    in_flight: int = 0
+    admitted: int = 0
+    shed: int = 0
+    latency_ewma: float = 0.0
+    pool_wait_ewma: float = 0.0
+    pool_wait_updated_at: float = 0.0
+
+    def current_pool_wait(self, decay_seconds: float = 1.0) -> float:
+        """Smoothed pool wait, decayed over time so shedding stops once no more waits are seen"""
+        elapsed = time.monotonic() - self.pool_wait_updated_at
+        return self.pool_wait_ewma * math.exp(-elapsed / decay_seconds)
+
+
+@dataclass
+class AdmissionController:
+    """
+    Per worker admission controller shared by the middleware and the connection pools
+    """
+    limit: AdaptiveLimit = field(default_factory=lambda: AdaptiveLimit(
+        initial_limit=ADMISSION_INITIAL_LIMIT,
+        min_limit=ADMISSION_MIN_LIMIT,
+        max_limit=ADMISSION_MAX_LIMIT
+    ))
+    pool_wait_threshold: float = ADMISSION_POOL_WAIT_THRESHOLD
+    routes: dict = field(default_factory=lambda: {route_class: RouteClassStats() for route_class in ROUTE_CLASS_PRIORITY})
+
+    @property
+    def in_flight(self) -> int:
+        """Total number of in-flight requests"""
+        return sum(stats.in_flight for stats in self.routes.values())
+
+    @property
+    def pool_wait(self) -> float:
+        """Worst smoothed pool wait time across route classes"""
+        return max(stats.current_pool_wait() for stats in self.routes.values())
+
+    def try_acquire(self, route_class: str) -> bool:
+        """Admit or shed a request of the given route class"""
+        stats = self.routes[route_class]
+
+        # Saturated pools shed everything that is not critical
+        if route_class != CRITICAL and self.pool_wait > self.pool_wait_threshold:
+            stats.shed += 1
+            return False
+
+        if self.in_flight >= self.limit.limit * ROUTE_CLASS_LIMIT_SHARE[route_class]:
+            stats.shed += 1
+            return False
+
+        stats.in_flight += 1
+        stats.admitted += 1
+        return True
+
+    def release(self, route_class: str, latency: float) -> None:
+        """Record the completion of an admitted request"""
+        stats = self.routes[route_class]
+        stats.in_flight -= 1
+        stats.latency_ewma = latency if not stats.latency_ewma else 0.9 * stats.latency_ewma + 0.1 * latency
+        self.limit.on_sample(latency)
+
+    def record_pool_wait(self, seconds: float) -> None:
+        """Record how long the current request waited for a pool connection"""
+        stats = self.routes[current_route_class.get()]
+        stats.pool_wait_ewma = 0.8 * stats.current_pool_wait() + 0.2 * seconds
+        stats.pool_wait_updated_at = time.monotonic()
+
+    def retry_after(self, route_class: str) -> int:
+        """Seconds a shed client should wait, low priority clients back off longer"""
+        return ADMISSION_RETRY_AFTER * (1 + ROUTE_CLASS_PRIORITY[route_class])
+
+    def stats(self) -> dict:
+        """Snapshot of the controller state"""
+        return {
+            "limit": round(self.limit.limit, 2),
+            "in_flight": self.in_flight,
+            "routes": {
+                route_class: {
+                    "in_flight": stats.in_flight,
+                    "admitted": stats.admitted,
+                    "shed": stats.shed,
+                    "latency_ewma": round(stats.latency_ewma, 6),
+                    "pool_wait_ewma": round(stats.current_pool_wait(), 6)
+                } for route_class, stats in self.routes.items()
+            }
+        }
+
+
+admission_controller = AdmissionController()
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware applying admission control to every HTTP request
+    app: ASGI application to wrap
+    route_classes: Pairs of (path regex, route class), unmatched paths are `normal`
+    """
+    def __init__(self, app: ASGIApp, route_classes: tuple, controller: AdmissionController = admission_controller):
+        self.app = app
+        self.route_classes = tuple((re.compile(pattern), route_class) for pattern, route_class in route_classes)
+        self.controller = controller
+
+    def _classify(self, path: str) -> str:
+        """Find the route class of a path"""
+        for pattern, route_class in self.route_classes:
+            if pattern.fullmatch(path):
+                return route_class
+        return NORMAL
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] == "OPTIONS":
+            await self.app(scope, receive, send)
+            return
+
+        route_class = self._classify(scope["path"])
+        if not self.controller.try_acquire(route_class):
+            await self._reject(route_class=route_class, send=send)
+            return
+
+        token = current_route_class.set(route_class)
+        started_at = time.perf_counter()
+        first_byte_at = None
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal first_byte_at
+            if message["type"] == "http.response.start" and first_byte_at is None:
+                first_byte_at = time.perf_counter()
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Time to first byte, so long streaming bodies do not skew the latency signal
+            self.controller.release(route_class=route_class, latency=(first_byte_at or time.perf_counter()) - started_at)
+            current_route_class.reset(token)
+
+    async def _reject(self, route_class: str, send: Send) -> None:
+        """Send a fast 503 with Retry-After"""
+        body = orjson.dumps({"message": "Oops! Server is busy, please retry later"})
+        headers = [
+            (b"content-type", b"application/json"),
+            (b"content-length", str(len(body)).encode("latin-1")),
+            (b"retry-after", str(self.controller.retry_after(route_class)).encode("latin-1"))
+        ]
+        await send({"type": "http.response.start", "status": 503, "headers": headers})
+        await send({"type": "http.response.body", "body": body})
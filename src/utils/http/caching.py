@@ -0,0 +1,143 @@
+"""
+HTTP conditional caching for the public GET routes
+It computes strong ETags (from a row version or from the response body), answers
+`If-None-Match` / `If-Modified-Since` with 304 and sets per-route `Cache-Control` policies
+"""
+
+from src.utils.base.libraries import (
+    format_datetime,
+    parsedate_to_datetime,
+    dataclass,
+    datetime,
+    timezone,
+    Optional,
+    Response,
+    Request,
+    hashlib,
+    orjson,
+    status
+)
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """
+    Cache-Control policy of a route
+    max_age: Freshness lifetime for browsers / clients (seconds)
+    s_maxage: Freshness lifetime for shared caches like CDNs (seconds)
+    stale_while_revalidate: How long a stale response can be served while it is revalidated (seconds)
+    stale_if_error: How long a stale response can be served when the origin errors (seconds)
+    """
+    max_age: int
+    s_maxage: Optional[int] = None
+    stale_while_revalidate: int = 0
+    stale_if_error: int = 0
+    public: bool = True
+
+    @property
+    def header(self) -> str:
+        """Render the policy as a Cache-Control header value"""
+        directives = ["public" if self.public else "private", f"max-age={self.max_age}"]
+        if self.s_maxage is not None:
+            directives.append(f"s-maxage={self.s_maxage}")
+        if self.stale_while_revalidate:
+            directives.append(f"stale-while-revalidate={self.stale_while_revalidate}")
+        if self.stale_if_error:
+            directives.append(f"stale-if-error={self.stale_if_error}")
+        return ", ".join(directives)
+
+
+# Per-route policies
+BASE_PACKAGE_POLICY = CachePolicy(max_age=60, s_maxage=300, stale_while_revalidate=600, stale_if_error=86400)
+VERSIONED_PACKAGE_POLICY = CachePolicy(max_age=3600, s_maxage=86400, stale_while_revalidate=86400, stale_if_error=86400)
+PACKAGE_LISTING_POLICY = CachePolicy(max_age=30, s_maxage=60, stale_while_revalidate=300, stale_if_error=3600)
+PACKAGE_SEARCH_POLICY = CachePolicy(max_age=30, s_maxage=60, stale_while_revalidate=120, stale_if_error=3600)
+PACKAGE_CHANGES_POLICY = CachePolicy(max_age=5, s_maxage=5, stale_if_error=300)
+
+
+def make_etag(*parts) -> str:
+    """
+    Build a strong ETag from the given parts (row versions, ids, timestamps or raw bytes)
+    """
+    if len(parts) == 1 and isinstance(parts[0], bytes):
+        payload = parts[0]
+    else:
+        payload = orjson.dumps(parts, option=orjson.OPT_SORT_KEYS)
+    return f'"{hashlib.blake2b(payload, digest_size=16).hexdigest()}"'
+
+
+def _to_utc(value) -> Optional[datetime]:
+    """Normalize a datetime or ISO string into an aware UTC datetime truncated to seconds"""
+    if value is None:
+        return None
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    if value.tzinfo is None:
+        # TIMESTAMP columns are stored without a time zone and are treated as UTC
+        value = value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc).replace(microsecond=0)
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    """Weak comparison of If-None-Match against the current ETag (RFC 9110)"""
+    if if_none_match.strip() == "*":
+        return True
+    current = etag.removeprefix("W/")
+    return any(candidate.strip().removeprefix("W/") == current for candidate in if_none_match.split(","))
+
+
+def _not_modified(request: Request, etag: str, last_modified: Optional[datetime]) -> bool:
+    """Check the request validators, If-None-Match takes precedence over If-Modified-Since"""
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        return _etag_matches(if_none_match=if_none_match, etag=etag)
+
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since and last_modified:
+        try:
+            return last_modified <= parsedate_to_datetime(if_modified_since)
+        except (TypeError, ValueError):
+            return False
+
+    return False
+
+
+def conditional_headers(request: Request, etag: str, policy: CachePolicy, last_modified=None) -> tuple[dict, bool]:
+    """
+    Caching headers of a response and whether the request validators still match (answer 304)
+    """
+    last_modified = _to_utc(last_modified)
+    headers = {"ETag": etag, "Cache-Control": policy.header}
+    if last_modified:
+        headers["Last-Modified"] = format_datetime(last_modified, usegmt=True)
+
+    return headers, _not_modified(request=request, etag=etag, last_modified=last_modified)
+
+
+def conditional_json_response(request: Request, content, policy: CachePolicy, last_modified=None, validator: Optional[tuple] = None) -> Response:
+    """
+    Build a cacheable JSON response for a GET route
+    When a `validator` (row version parts) is given, the ETag is derived from it and a 304 is
+    answered before the content is serialized; otherwise the ETag is the hash of the body
+    """
+    body = None
+
+    if validator is not None:
+        etag = make_etag(*validator)
+    else:
+        body = orjson.dumps(content)
+        etag = make_etag(body)
+
+    headers, not_modified = conditional_headers(request=request, etag=etag, policy=policy, last_modified=last_modified)
+    if not_modified:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    if body is None:
+        body = orjson.dumps(content)
+
+    return Response(
+        status_code=status.HTTP_200_OK,
+        content=body,
+        media_type="application/json",
+        headers=headers
+    )
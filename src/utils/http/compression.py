@@ -0,0 +1,193 @@
+"""
+Negotiated response compression (gzip, plus brotli when it is installed)
+1. **CompressionMiddleware**:
+    - Compresses responses of allow-listed routes once they cross a size threshold.
+    - Streaming responses are compressed chunk by chunk.
+    - Once an encoding is negotiated, the ETag is weak on every response (compressed or not, and on 304),
+      so the client always sees the same validator for the representation.
+"""
+
+from src.utils.base.libraries import (
+    MutableHeaders,
+    Headers,
+    ASGIApp,
+    Message,
+    Receive,
+    Scope,
+    Send,
+    Optional,
+    brotli,
+    gzip,
+    zlib,
+    re
+)
+from src.utils.base.constants import COMPRESSION_MIN_SIZE, GZIP_COMPRESS_LEVEL, BROTLI_COMPRESS_QUALITY
+
+
+# Encodings in server preference order
+SUPPORTED_ENCODINGS = ("br", "gzip") if brotli else ("gzip",)
+
+# Only textual payloads are worth compressing
+COMPRESSIBLE_MEDIA_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+
+def negotiate_encoding(accept_encoding: str, available: tuple = SUPPORTED_ENCODINGS) -> Optional[str]:
+    """
+    Pick the content coding to use from an Accept-Encoding header
+    Client q-values are honoured, ties are broken by the server preference order
+    """
+    if not accept_encoding:
+        return None
+
+    weights = {}
+    for item in accept_encoding.split(","):
+        coding, _, params = item.strip().partition(";")
+        coding = coding.strip().lower()
+        weight = 1.0
+        if params.strip().startswith("q="):
+            try:
+                weight = float(params.strip()[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+
+    best_encoding, best_weight = None, 0.0
+    for encoding in available:
+        weight = weights.get(encoding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best_encoding, best_weight = encoding, weight
+
+    return best_encoding
+
+
+def compress_bytes(data: bytes, encoding: str) -> bytes:
+    """Compress a complete body with the given content coding"""
+    if encoding == "br":
+        return brotli.compress(data, quality=BROTLI_COMPRESS_QUALITY)
+    return gzip.compress(data, compresslevel=GZIP_COMPRESS_LEVEL, mtime=0)
+
+
+class _StreamCompressor:
+    """Incremental compressor used for streaming bodies"""
+    def __init__(self, encoding: str):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=BROTLI_COMPRESS_QUALITY)
+        else:
+            self._compressor = zlib.compressobj(GZIP_COMPRESS_LEVEL, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        """Compress a chunk and flush it so the client receives it without delay"""
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        """Terminate the compressed stream"""
+        if self.encoding == "br":
+            return self._compressor.finish()
+        return self._compressor.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """
+    ASGI middleware compressing responses of allow-listed routes
+    app: ASGI application to wrap
+    allowed_paths: Regex patterns of the paths whose responses may be compressed
+    minimum_size: Bodies smaller than this (in bytes) are sent uncompressed
+    """
+    def __init__(self, app: ASGIApp, allowed_paths: tuple, minimum_size: int = COMPRESSION_MIN_SIZE):
+        self.app = app
+        self.allowed_paths = tuple(re.compile(pattern) for pattern in allowed_paths)
+        self.minimum_size = minimum_size
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not any(pattern.fullmatch(scope["path"]) for pattern in self.allowed_paths):
+            await self.app(scope, receive, send)
+            return
+
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""))
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(send=send, encoding=encoding, minimum_size=self.minimum_size)
+        await self.app(scope, receive, responder)
+
+
+class _CompressionResponder:
+    """Wraps `send` and compresses the body once the response headers are known"""
+    def __init__(self, send: Send, encoding: str, minimum_size: int):
+        self.send = send
+        self.encoding = encoding
+        self.minimum_size = minimum_size
+        self.start_message: Optional[Message] = None
+        self.compressor: Optional[_StreamCompressor] = None
+        self.passthrough = False
+
+    def _is_compressible(self, headers: MutableHeaders) -> bool:
+        """Skip already encoded bodies and binary payloads"""
+        if "content-encoding" in headers:
+            return False
+        content_type = headers.get("content-type", "")
+        return content_type.startswith(COMPRESSIBLE_MEDIA_TYPES)
+
+    def _set_encoding_headers(self, headers: MutableHeaders) -> None:
+        headers["Content-Encoding"] = self.encoding
+
+    @staticmethod
+    def _weaken_etag(headers: MutableHeaders) -> None:
+        """Weak ETag, the bytes differ once compressed (also set on small bodies and 304s, which are not)"""
+        etag = headers.get("etag")
+        if etag and not etag.startswith("W/"):
+            headers["ETag"] = f"W/{etag}"
+
+    async def __call__(self, message: Message) -> None:
+        if message["type"] == "http.response.start":
+            self.start_message = message
+            headers = MutableHeaders(raw=message["headers"])
+            headers.add_vary_header("Accept-Encoding")
+            self.passthrough = message["status"] < 200 or message["status"] in (204, 304) or not self._is_compressible(headers)
+            if message["status"] == 304 or not self.passthrough:
+                self._weaken_etag(headers)
+            return
+
+        if message["type"] != "http.response.body":
+            await self.send(message)
+            return
+
+        if self.passthrough:
+            if self.start_message is not None:
+                await self.send(self.start_message)
+                self.start_message = None
+            await self.send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.compressor is None and not more_body:
+            # Complete body in a single message: compress it at once when it is big enough
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            if len(body) >= self.minimum_size:
+                body = compress_bytes(data=body, encoding=self.encoding)
+                self._set_encoding_headers(headers)
+                headers["Content-Length"] = str(len(body))
+            await self.send(self.start_message)
+            await self.send({"type": "http.response.body", "body": body, "more_body": False})
+            return
+
+        if self.compressor is None:
+            # Streaming body: the final size is unknown, compress chunk by chunk
+            headers = MutableHeaders(raw=self.start_message["headers"])
+            self._set_encoding_headers(headers)
+            if "content-length" in headers:
+                del headers["content-length"]
+            self.compressor = _StreamCompressor(encoding=self.encoding)
+            await self.send(self.start_message)
+
+        chunk = self.compressor.compress(body) if body else b""
+        if not more_body:
+            chunk += self.compressor.finish()
+        await self.send({"type": "http.response.body", "body": chunk, "more_body": more_body})
+
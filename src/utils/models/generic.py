@@ -2,14 +2,15 @@
 This module contains the basic models for the application
 """
 
-from src.utils.base.libraries import BaseModel, Field
+from src.utils.base.libraries import BaseModel, Field, Optional
 
 
 class All_Exceptions(Exception):
     """Class for handling wrong input exceptions"""
-    def __init__(self , message: str , status_code: int):
+    def __init__(self , message: str , status_code: int, headers: Optional[dict] = None):
         self.message = message
         self.status_code = status_code
+        self.headers = headers
 
 
 class Error(BaseModel):
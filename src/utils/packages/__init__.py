@@ -0,0 +1,61 @@
+"""
+All the package archive helpers (inspection, seek index, storage) used by the API are defined here
+"""
+
+from .inspection import PackageArchiveError, InspectionLimits, inspect_package_archive
+from .inspection_pool import inspect_package, shutdown_inspection_pool
+from .seek_index import GunzipReader, CheckpointWriter, read_archive_member
+from .storage import (
+    package_index_path,
+    resolve_index_path,
+    seekable_upload_path,
+    save_upload,
+    store_package_file,
+    read_package_file,
+    locate_package_archive,
+    remove_file
+)
+
+
+__version__ = "v1.0.0-phoenix-release"
+
+
+__annotations__ = {
+    "version": __version__,
+    "PackageArchiveError": "Exception for invalid package archives",
+    "InspectionLimits": "Limits a package archive must stay within",
+    "inspect_package_archive": "Function to validate and describe a package archive (blocking, CPU bound)",
+    "inspect_package": "Function to inspect a package archive in the inspection process pool",
+    "shutdown_inspection_pool": "Function to stop the inspection process pool",
+    "GunzipReader": "File wrapper inflating a gzip stream of one or more members",
+    "CheckpointWriter": "Gzip writer with a restart point every CHECKPOINT_INTERVAL bytes",
+    "read_archive_member": "Function to read one file of a seekable archive (blocking)",
+    "package_index_path": "Function to build the index path of a package archive",
+    "resolve_index_path": "Function to resolve an index path to its location on disk",
+    "seekable_upload_path": "Function to get the path of the seekable copy of an upload",
+    "save_upload": "Function to save an uploaded archive to the storage volume",
+    "store_package_file": "Function to move a saved upload, its seekable copy and seek index into the package index",
+    "read_package_file": "Function to read one file of a published archive",
+    "locate_package_archive": "Function to get the location on disk of a published archive",
+    "remove_file": "Function to delete a file if it still exists"
+}
+
+
+__all__ = [
+    "PackageArchiveError",
+    "InspectionLimits",
+    "inspect_package_archive",
+    "inspect_package",
+    "shutdown_inspection_pool",
+    "GunzipReader",
+    "CheckpointWriter",
+    "read_archive_member",
+    "package_index_path",
+    "resolve_index_path",
+    "seekable_upload_path",
+    "save_upload",
+    "store_package_file",
+    "read_package_file",
+    "locate_package_archive",
+    "remove_file"
+]
@@ -0,0 +1,153 @@
+"""
+Inspection of an uploaded package archive (`.tar.gz`), run in the worker processes of the inspection pool
+The archive is streamed once: every entry is checked against the limits and hashed, the manifest
+(`nikl.json` at the root of the archive) is parsed, and the archive itself is hashed on the way.
+With an `output_path`, the tar stream is also recompressed there as a seekable archive (see `seek_index.py`).
+"""
+
+from src.utils.base.libraries import dataclass, hashlib, posixpath, tarfile, zlib, json, re, time, Optional
+from .seek_index import GunzipReader, CheckpointWriter
+
+
+MANIFEST_NAME = "nikl.json"
+MANIFEST_MAX_SIZE = 64 * 1024
+NAME_PATTERN = re.compile(r"^[A-Za-z0-9][A-Za-z0-9_.-]{3,99}$")  # Also a directory name of the index
+VERSION_PATTERN = re.compile(r"^\d+\.\d+\.\d+(?:[-+][0-9A-Za-z.-]+)?$")
+CHUNK_SIZE = 256 * 1024
+
+
+class PackageArchiveError(Exception):
+    """Invalid package archive, the message is returned to the publisher"""
+
+
+@dataclass(frozen=True)
+class InspectionLimits:
+    """Limits an archive must stay within (checked while streaming, before anything is trusted)"""
+    max_entries: int
+    max_file_size: int
+    max_unpacked_size: int
+    max_seconds: Optional[float] = None  # Also stops the pool process, which an abandoned wait does not
+
+
+class _HashingReader:
+    """Read-only file wrapper hashing and counting the bytes read through it, until the optional deadline"""
+    def __init__(self, raw, max_seconds: Optional[float] = None):
+        self.raw = raw
+        self.sha256 = hashlib.sha256()
+        self.size = 0
+        self.max_seconds = max_seconds
+        self.deadline = time.monotonic() + max_seconds if max_seconds is not None else None
+
+    def read(self, size: int = -1) -> bytes:
+        # Every compressed byte goes through here, so no stage of the inspection outlives the deadline by more than a chunk
+        if self.deadline is not None and time.monotonic() > self.deadline:
+            raise PackageArchiveError(f"Archive took longer than {self.max_seconds}s to inspect")
+        data = self.raw.read(size)
+        self.sha256.update(data)
+        self.size += len(data)
+        return data
+
+
+def _safe_path(name: str) -> str:
+    """Normalized relative path of an entry, rejecting absolute paths and path traversal"""
+    path = posixpath.normpath(name)
+    if name.startswith("/") or "\\" in name or path == ".." or path.startswith("../") or "\x00" in name:
+        raise PackageArchiveError(f"Unsafe path in archive: {name!r}")
+    return path
+
+
+def _parse_manifest(data: bytes) -> dict:
+    try:
+        manifest = json.loads(data)
+    except ValueError as e:
+        raise PackageArchiveError(f"{MANIFEST_NAME} is not valid JSON: {e}")
+
+    if not isinstance(manifest, dict):
+        raise PackageArchiveError(f"{MANIFEST_NAME} must be a JSON object")
+    name, version = manifest.get("name"), manifest.get("version")
+    if not isinstance(name, str) or not NAME_PATTERN.match(name):
+        raise PackageArchiveError(f"{MANIFEST_NAME}: `name` must be 4 to 100 letters, digits, `.`, `_` or `-`")
+    if not isinstance(version, str) or len(version) > 20 or not VERSION_PATTERN.match(version):
+        raise PackageArchiveError(f"{MANIFEST_NAME}: `version` must look like 1.2.3 (at most 20 characters)")
+    return manifest
+
+
+def inspect_package_archive(archive_path: str, limits: InspectionLimits, output_path: Optional[str] = None) -> dict:
+    """
+    Validate a package archive and describe it
+    Returns `{"manifest", "files": [{"path", "size", "sha256"}], "sha256", "size", "unpacked_size"}`
+    With an `output_path`, the seekable copy of the archive is written there and its index is returned under `seek_index`
+    """
+    files, seen_paths, members = [], set(), {}
+    manifest, entries, unpacked_size = None, 0, 0
+    output = open(output_path, "wb") if output_path else None
+    writer = CheckpointWriter(output) if output else None
+
+    with open(archive_path, "rb") as raw:
+        reader = _HashingReader(raw, max_seconds=limits.max_seconds)
+        try:
+            # Stream mode: members are read in order, in a single pass over the compressed data
+            tar_stream = GunzipReader(reader, sink=writer.write if writer else None)
+            with tarfile.open(fileobj=tar_stream, mode="r|") as archive:
+                for member in archive:
+                    entries += 1
+                    if entries > limits.max_entries:
+                        raise PackageArchiveError(f"Archive has more than {limits.max_entries} entries")
+
+                    path = _safe_path(member.name)
+                    if path in seen_paths:
+                        raise PackageArchiveError(f"Duplicate entry in archive: {path}")
+                    seen_paths.add(path)
+                    if member.isdir():
+                        continue
+                    if not member.isfile() or member.issparse():
+                        raise PackageArchiveError(f"Only regular files and directories are allowed: {path}")
+
+                    if member.size > limits.max_file_size:
+                        raise PackageArchiveError(f"{path} is larger than {limits.max_file_size} bytes")
+                    unpacked_size += member.size
+                    if unpacked_size > limits.max_unpacked_size:
+                        raise PackageArchiveError(f"Archive unpacks to more than {limits.max_unpacked_size} bytes")
+
+                    content, digest = archive.extractfile(member), hashlib.sha256()
+                    if path == MANIFEST_NAME:
+                        if member.size > MANIFEST_MAX_SIZE:
+                            raise PackageArchiveError(f"{MANIFEST_NAME} is larger than {MANIFEST_MAX_SIZE} bytes")
+                        data = content.read()
+                        digest.update(data)
+                        manifest = _parse_manifest(data)
+                    else:
+                        for chunk in iter(lambda: content.read(CHUNK_SIZE), b""):
+                            digest.update(chunk)
+                    files.append({"path": path, "size": member.size, "sha256": digest.hexdigest()})
+                    members[path] = [member.offset_data, member.size]
+
+            if writer:
+                # End of archive marker, whatever part of it the tar reader consumed
+                writer.write(bytes(tarfile.BLOCKSIZE * 2))
+                writer.close()
+
+        except (tarfile.TarError, EOFError, OSError, zlib.error) as e:
+            raise PackageArchiveError(f"Not a valid .tar.gz archive: {e}")
+
+        finally:
+            if output:
+                output.close()
+
+        # Rest of the file after the end of archive marker (padding), so the hash covers the whole file
+        while reader.read(CHUNK_SIZE):
+            pass
+
+    if manifest is None:
+        raise PackageArchiveError(f"{MANIFEST_NAME} is missing at the root of the archive")
+
+    inspection = {
+        "manifest": manifest,
+        "files": files,
+        "sha256": reader.sha256.hexdigest(),
+        "size": reader.size,
+        "unpacked_size": unpacked_size
+    }
+    if writer:
+        inspection["seek_index"] = {"checkpoints": writer.checkpoints, "members": members}
+    return inspection
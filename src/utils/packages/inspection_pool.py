@@ -0,0 +1,84 @@
+"""
+Process pool running the package archive inspections
+Decompressing and hashing an archive is CPU bound, in a separate process it neither blocks the event
+loop nor holds the GIL of the worker, and concurrent uploads are inspected in parallel on several cores.
+The pool of a worker is started on the first upload and shut down with the lifespan.
+"""
+
+from src.utils.base.libraries import concurrent, multiprocessing, asyncio, Optional, logging, status
+from src.utils.base.constants import (
+    PACKAGE_MAX_ENTRIES,
+    PACKAGE_MAX_FILE_SIZE,
+    PACKAGE_MAX_UNPACKED_SIZE,
+    PACKAGE_INSPECTION_PROCESSES,
+    PACKAGE_INSPECTION_TIMEOUT
+)
+from src.utils.models import All_Exceptions
+from .inspection import InspectionLimits, PackageArchiveError, inspect_package_archive
+
+
+INSPECTION_LIMITS = InspectionLimits(
+    max_entries=PACKAGE_MAX_ENTRIES,
+    max_file_size=PACKAGE_MAX_FILE_SIZE,
+    max_unpacked_size=PACKAGE_MAX_UNPACKED_SIZE,
+    max_seconds=PACKAGE_INSPECTION_TIMEOUT
+)
+
+# Inspections per pool process before it is replaced (bounds the memory a process can accumulate)
+MAX_TASKS_PER_PROCESS = 100
+
+# Started on the first upload (importing the process pool machinery is deferred until then)
+_executor: Optional["concurrent.futures.ProcessPoolExecutor"] = None
+
+
+def _get_executor() -> "concurrent.futures.ProcessPoolExecutor":
+    global _executor
+    if _executor is None:
+        # Not forked from the worker (its event loop and connections must not be copied)
+        start_method = "forkserver" if "forkserver" in multiprocessing.get_all_start_methods() else "spawn"
+        _executor = concurrent.futures.ProcessPoolExecutor(
+            max_workers=PACKAGE_INSPECTION_PROCESSES,
+            mp_context=multiprocessing.get_context(start_method),
+            max_tasks_per_child=MAX_TASKS_PER_PROCESS
+        )
+    return _executor
+
+
+async def inspect_package(archive_path: str, output_path: Optional[str] = None) -> dict:
+    """
+    Inspect a package archive in the process pool (see `inspect_package_archive`)
+    """
+    global _executor
+    loop = asyncio.get_running_loop()
+    try:
+        return await asyncio.wait_for(
+            loop.run_in_executor(_get_executor(), inspect_package_archive, archive_path, INSPECTION_LIMITS, output_path),
+            timeout=PACKAGE_INSPECTION_TIMEOUT
+        )
+
+    except PackageArchiveError as e:
+        raise All_Exceptions(message=f"Invalid package archive: {e}", status_code=status.HTTP_422_UNPROCESSABLE_ENTITY)
+
+    except asyncio.TimeoutError:
+        # Queued or still running, a running inspection stops itself at its own deadline (`max_seconds`)
+        raise All_Exceptions(
+            message=f"Package archive inspection took longer than {PACKAGE_INSPECTION_TIMEOUT}s",
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY
+        )
+
+    except concurrent.futures.BrokenExecutor as e:
+        # A pool process died (e.g. killed for memory), start a new pool on the next upload
+        logging.error(f"Package inspection pool broken: {e}")
+        _executor = None
+        raise All_Exceptions(
+            message="Package inspection is temporarily unavailable, please retry later",
+            status_code=status.HTTP_503_SERVICE_UNAVAILABLE
+        )
+
+
+def shutdown_inspection_pool() -> None:
+    """Stop the pool processes (pending inspections are cancelled)"""
+    global _executor
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+        _executor = None
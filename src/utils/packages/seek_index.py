@@ -0,0 +1,126 @@
+"""
+Seekable package archives, so a single file of a published version is read without inflating the archive from its start
+1. **Publish**:
+    - The inspection recompresses the tar stream into independent gzip members of `CHECKPOINT_INTERVAL`
+      uncompressed bytes each, every member start is a restart point.
+    - That copy is internal (`<version>.tar.gz.seekable` next to the archive), downloads serve the original upload:
+      streaming readers such as Python's `tarfile.open(mode="r|gz")` stop at the end of the first gzip member.
+2. **Index** (`<version>.tar.gz.idx` next to the archive, JSON):
+    - `checkpoints`: `[uncompressed offset, compressed offset]` of every restart point
+    - `members`: `{path: [uncompressed offset of the data, size]}` of every file
+3. **Read**:
+    - Seek to the last restart point before the file data and inflate at most `CHECKPOINT_INTERVAL` + file size bytes.
+"""
+
+from src.utils.base.libraries import bisect, zlib, Optional
+
+
+INDEX_SUFFIX = ".idx"
+SEEKABLE_SUFFIX = ".seekable"
+CHECKPOINT_INTERVAL = 1024 * 1024
+CHUNK_SIZE = 256 * 1024
+GZIP_WBITS = 31  # zlib stream with a gzip header and trailer
+
+
+class GunzipReader:
+    """
+    Read-only file wrapper inflating a gzip stream of one or more members
+    sink: Called with every inflated chunk (the inspection writes the recompressed archive with it)
+    """
+    def __init__(self, raw, sink=None):
+        self.raw = raw
+        self.sink = sink
+        self._inflater = zlib.decompressobj(wbits=GZIP_WBITS)
+
+    def read(self, size: int = -1) -> bytes:
+        output = bytearray()
+        while size < 0 or len(output) < size:
+            if self._inflater.eof:
+                # Next member, or the end of the stream
+                data = self._inflater.unused_data or self.raw.read(CHUNK_SIZE)
+                if not data:
+                    break
+                self._inflater = zlib.decompressobj(wbits=GZIP_WBITS)
+            else:
+                data = self._inflater.unconsumed_tail or self.raw.read(CHUNK_SIZE)
+                if not data:
+                    raise EOFError("Compressed data ended before the end of the gzip member")
+            # Bounded, so a small compressed input never inflates into a huge buffer
+            output += self._inflater.decompress(data, CHUNK_SIZE if size < 0 else size - len(output))
+
+        data = bytes(output)
+        if self.sink is not None and data:
+            self.sink(data)
+        return data
+
+
+class CheckpointWriter:
+    """Gzip writer starting a new member every `interval` uncompressed bytes"""
+    def __init__(self, output, interval: int = CHECKPOINT_INTERVAL, level: int = 6):
+        self.output = output
+        self.interval = interval
+        self.level = level
+        self.size = 0
+        self.uncompressed_size = 0
+        self.checkpoints = []
+        self._deflater = None
+        self._member_size = 0
+
+    def _emit(self, data: bytes) -> None:
+        if data:
+            self.output.write(data)
+            self.size += len(data)
+
+    def write(self, data: bytes) -> None:
+        view = memoryview(data)
+        while view:
+            if self._deflater is None:
+                self.checkpoints.append([self.uncompressed_size, self.size])
+                self._deflater = zlib.compressobj(self.level, zlib.DEFLATED, GZIP_WBITS)
+                self._member_size = 0
+
+            part = view[:self.interval - self._member_size]
+            self._emit(self._deflater.compress(part))
+            self._member_size += len(part)
+            self.uncompressed_size += len(part)
+            view = view[len(part):]
+
+            if self._member_size >= self.interval:
+                self._emit(self._deflater.flush())
+                self._deflater = None
+
+    def close(self) -> None:
+        """Finish the last member (the output file is closed by its owner)"""
+        if self._deflater is not None:
+            self._emit(self._deflater.flush())
+            self._deflater = None
+
+
+def read_archive_member(archive_path: str, seek_index: dict, member_path: str) -> Optional[bytes]:
+    """
+    Content of a file of a seekable archive, `None` when the archive has no such file
+    """
+    member = seek_index["members"].get(member_path)
+    if member is None:
+        return None
+    offset, size = member
+
+    # Last restart point at or before the data of the file
+    checkpoints = seek_index["checkpoints"]
+    position = bisect.bisect_right(checkpoints, offset, key=lambda checkpoint: checkpoint[0]) - 1
+    uncompressed_offset, compressed_offset = checkpoints[position]
+
+    with open(archive_path, "rb") as raw:
+        raw.seek(compressed_offset)
+        reader = GunzipReader(raw)
+        skip = offset - uncompressed_offset
+        while skip:
+            skipped = len(reader.read(min(skip, CHUNK_SIZE)))
+            if not skipped:
+                raise EOFError(f"{archive_path} ended before {member_path}")
+            skip -= skipped
+        data = reader.read(size)
+
+    if len(data) != size:
+        raise EOFError(f"{archive_path} ended inside {member_path}")
+    return data
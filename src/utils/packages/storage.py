@@ -0,0 +1,127 @@
+"""
+Storage of the package archives on the local file system, following the package index structure
+(`/m/math/1.0.0.tar.gz`, see `docs/packages.md`) under `PACKAGE_STORAGE_PATH`, with the seekable copy of
+every archive and its seek index next to it (`/m/math/1.0.0.tar.gz.seekable`, `/m/math/1.0.0.tar.gz.idx`)
+File system calls run in a thread, so a slow disk does not block the event loop
+"""
+
+from src.utils.base.libraries import UploadFile, asyncio, lru_cache, orjson, os, uuid, status, Optional
+from src.utils.base.constants import PACKAGE_STORAGE_PATH, PACKAGE_MAX_UPLOAD_SIZE
+from src.utils.models import All_Exceptions
+from .seek_index import INDEX_SUFFIX, SEEKABLE_SUFFIX, read_archive_member
+
+
+UPLOADS_DIRECTORY = os.path.join(PACKAGE_STORAGE_PATH, ".uploads")
+CHUNK_SIZE = 1024 * 1024
+
+
+def package_index_path(package_name: str, version: str) -> str:
+    """Path of a package archive in the index (stored in `versioned_packages.file_path`)"""
+    return f"/{package_name[0].lower()}/{package_name}/{version}.tar.gz"
+
+
+def resolve_index_path(index_path: str) -> str:
+    """Location of an index path on disk"""
+    return os.path.join(PACKAGE_STORAGE_PATH, index_path.lstrip("/"))
+
+
+def seekable_upload_path(upload_path: str) -> str:
+    """Path the inspection writes the seekable copy of an upload to"""
+    return upload_path.removesuffix(".tar.gz") + ".seekable.tar.gz"
+
+
+def _open_upload_file() -> tuple:
+    os.makedirs(UPLOADS_DIRECTORY, exist_ok=True)
+    path = os.path.join(UPLOADS_DIRECTORY, f"{uuid.uuid4()}.tar.gz")
+    return path, open(path, "wb")
+
+
+async def save_upload(upload: UploadFile, max_size: int = PACKAGE_MAX_UPLOAD_SIZE) -> str:
+    """
+    Copy an uploaded archive to a file of the storage volume (so it can be moved into the index without a copy)
+    """
+    path, output = await asyncio.to_thread(_open_upload_file)
+    size = 0
+    try:
+        while chunk := await upload.read(CHUNK_SIZE):
+            size += len(chunk)
+            if size > max_size:
+                raise All_Exceptions(
+                    message=f"Package archive is larger than {max_size} bytes",
+                    status_code=status.HTTP_413_REQUEST_ENTITY_TOO_LARGE
+                )
+            await asyncio.to_thread(output.write, chunk)
+    except BaseException:
+        output.close()
+        await remove_file(path)
+        raise
+    output.close()
+    return path
+
+
+def _move_into_index(source_path: str, index_path: str, seekable_path: Optional[str], seek_index: Optional[dict]) -> None:
+    destination = resolve_index_path(index_path)
+    os.makedirs(os.path.dirname(destination), exist_ok=True)
+    if seekable_path is not None:
+        # Moved first, so an archive in the index always has its seekable copy and seek index
+        temporary_path = f"{source_path}{INDEX_SUFFIX}"
+        with open(temporary_path, "wb") as output:
+            output.write(orjson.dumps(seek_index))
+        os.replace(temporary_path, destination + INDEX_SUFFIX)
+        os.replace(seekable_path, destination + SEEKABLE_SUFFIX)
+    os.replace(source_path, destination)
+
+
+async def store_package_file(source_path: str, index_path: str, seekable_path: Optional[str] = None, seek_index: Optional[dict] = None) -> None:
+    """Move a saved upload (and its seekable copy with its seek index) to its place in the index (atomic, same volume)"""
+    await asyncio.to_thread(_move_into_index, source_path, index_path, seekable_path, seek_index)
+
+
+@lru_cache(maxsize=256)
+def _load_seek_index(archive_path: str) -> dict:
+    # Published archives never change, so their index is kept per process
+    with open(archive_path + INDEX_SUFFIX, "rb") as index_file:
+        return orjson.loads(index_file.read())
+
+
+def _read_member(index_path: str, member_path: str) -> Optional[bytes]:
+    archive_path = resolve_index_path(index_path)
+    try:
+        seek_index = _load_seek_index(archive_path)
+        return read_archive_member(archive_path=archive_path + SEEKABLE_SUFFIX, seek_index=seek_index, member_path=member_path)
+    except FileNotFoundError:
+        return None
+
+
+async def read_package_file(index_path: str, member_path: str) -> bytes:
+    """
+    Content of a file of a published archive, only the bytes of its seekable copy after the nearest restart point are inflated
+    """
+    content = await asyncio.to_thread(_read_member, index_path, member_path)
+    if content is None:
+        raise All_Exceptions(
+            message=f"File {member_path} is not available in this package version",
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+    return content
+
+
+async def locate_package_archive(index_path: str) -> str:
+    """
+    Location on disk of a published archive, 404 when it is missing from the storage volume
+    """
+    archive_path = resolve_index_path(index_path)
+    if not await asyncio.to_thread(os.path.isfile, archive_path):
+        raise All_Exceptions(
+            message="The archive of this package version is not available",
+            status_code=status.HTTP_404_NOT_FOUND
+        )
+    return archive_path
+
+
+async def remove_file(path: str) -> None:
+    """Delete a file if it still exists"""
+    try:
+        await asyncio.to_thread(os.remove, path)
+    except FileNotFoundError:
+        pass
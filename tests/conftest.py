@@ -0,0 +1,11 @@
+"""
+Test setup: the environment of the app modules, set before anything from `src` is imported
+"""
+
+import os
+import tempfile
+
+os.environ.setdefault("LOG_FILE_PATH", os.path.join(tempfile.gettempdir(), "nikl-test-logs.jsonl"))
+os.environ.setdefault("LOG_LEVEL", "30")
+
+from src.utils.base import libraries  # noqa: E402,F401 (before the constants, the two modules import each other)
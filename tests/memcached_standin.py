@@ -0,0 +1,120 @@
+"""
+In-process stand-in for a Memcached server (text protocol), so the real aiomcache clients can be tested
+1. **Commands**: get, gets, set, add, cas, delete, incr, decr, touch, flush_all (the subset used by the API)
+2. **Faults**:
+    - `delays`: seconds to wait before answering a command on a key (slow node, timeouts)
+    - `stop()` / `start()`: the node goes down (open connections are closed) and comes back on the same port,
+      with its data unless `flush` was called meanwhile
+"""
+
+import asyncio
+import itertools
+import time
+
+
+class MemcachedStandIn:
+    def __init__(self, delays: dict = None):
+        self.delays = dict(delays or {})
+        self.items: dict = {}   # key -> (value, flags, expires at, cas)
+        self.port = 0
+        self.commands = []
+        self._cas = itertools.count(1)
+        self._server = None
+        self._writers = set()
+
+    @property
+    def address(self) -> tuple:
+        return ("127.0.0.1", self.port)
+
+    async def start(self) -> "MemcachedStandIn":
+        self._server = await asyncio.start_server(self._handle, "127.0.0.1", self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self
+
+    async def stop(self) -> None:
+        self._server.close()
+        for writer in list(self._writers):
+            writer.close()
+        await self._server.wait_closed()
+
+    def _live(self, key: bytes):
+        item = self.items.get(key)
+        if item and item[2] and item[2] <= time.time():
+            del self.items[key]
+            return None
+        return item
+
+    def _store(self, key: bytes, value: bytes, flags: int, exptime: int) -> None:
+        self.items[key] = (value, flags, time.time() + exptime if exptime else 0, next(self._cas))
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        self._writers.add(writer)
+        try:
+            while True:
+                line = await reader.readline()
+                if not line:
+                    break
+                parts = line.split()
+                command = parts[0].decode("ascii")
+                self.commands.append((command, parts[1] if len(parts) > 1 else None))
+                data = None
+                if command in ("set", "add", "cas"):
+                    data = (await reader.readexactly(int(parts[4]) + 2))[:-2]
+                if len(parts) > 1 and parts[1] in self.delays:
+                    await asyncio.sleep(self.delays[parts[1]])
+                writer.write(self._reply(command, parts[1:], data))
+                await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            self._writers.discard(writer)
+            writer.close()
+
+    def _reply(self, command: str, arguments: list, data: bytes) -> bytes:
+        if command in ("get", "gets"):
+            reply = b""
+            for key in arguments:
+                item = self._live(key)
+                if item:
+                    cas = b" %d" % item[3] if command == "gets" else b""
+                    reply += b"VALUE %s %d %d%s\r\n%s\r\n" % (key, item[1], len(item[0]), cas, item[0])
+            return reply + b"END\r\n"
+
+        if command in ("set", "add", "cas"):
+            key, flags, exptime = arguments[0], int(arguments[1]), int(arguments[2])
+            item = self._live(key)
+            if command == "add" and item:
+                return b"NOT_STORED\r\n"
+            if command == "cas":
+                if not item:
+                    return b"NOT_FOUND\r\n"
+                if item[3] != int(arguments[4]):
+                    return b"EXISTS\r\n"
+            self._store(key, data, flags, exptime)
+            return b"STORED\r\n"
+
+        if command == "delete":
+            return b"DELETED\r\n" if self._live(arguments[0]) and self.items.pop(arguments[0]) else b"NOT_FOUND\r\n"
+
+        if command in ("incr", "decr"):
+            item = self._live(arguments[0])
+            if not item:
+                return b"NOT_FOUND\r\n"
+            delta = int(arguments[1]) if command == "incr" else -int(arguments[1])
+            value = str(max(0, int(item[0]) + delta)).encode("ascii")
+            self.items[arguments[0]] = (value, item[1], item[2], next(self._cas))
+            return value + b"\r\n"
+
+        if command == "touch":
+            item = self._live(arguments[0])
+            if not item:
+                return b"NOT_FOUND\r\n"
+            exptime = int(arguments[1])
+            self.items[arguments[0]] = (item[0], item[1], time.time() + exptime if exptime else 0, item[3])
+            return b"TOUCHED\r\n"
+
+        if command == "flush_all":
+            self.items.clear()
+            return b"OK\r\n"
+
+        return b"ERROR\r\n"
@@ -0,0 +1,188 @@
+"""
+Sharded Memcached client (`src/database/cache_cluster.py`) against in-process Memcached stand-ins
+"""
+
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from src.database import cache_cluster
+from src.database.cache_cluster import HashRing, ShardedMemcachedClient, CacheUnavailableError
+from tests.memcached_standin import MemcachedStandIn
+
+
+KEYS = [f"key-{index}".encode("utf-8") for index in range(1000)]
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+async def _cluster(count: int, op_timeout: float = 0.5, pool_size: int = 2):
+    servers = [await MemcachedStandIn().start() for _ in range(count)]
+    client = ShardedMemcachedClient(servers=[server.address for server in servers], pool_size=pool_size, op_timeout=op_timeout)
+    return servers, client
+
+
+def _server_of(servers: list, node) -> MemcachedStandIn:
+    return next(server for server in servers if server.port == node.port)
+
+
+@pytest.fixture
+def fast_ejection(monkeypatch):
+    monkeypatch.setattr(cache_cluster, "MEMCACHED_FAILURE_THRESHOLD", 2)
+    monkeypatch.setattr(cache_cluster, "MEMCACHED_RETRY_BACKOFF", 0.2)
+    monkeypatch.setattr(cache_cluster, "MEMCACHED_MAX_RETRY_BACKOFF", 0.8)
+
+
+# ======= Hash ring =======
+
+def test_ring_spreads_keys_over_the_nodes():
+    nodes = [SimpleNamespace(name=f"node-{index}:11211") for index in range(3)]
+    ring = HashRing(nodes=nodes, virtual_nodes=160)
+    owners = [next(ring.iter_nodes(key)).name for key in KEYS]
+    for node in nodes:
+        assert owners.count(node.name) > len(KEYS) * 0.2
+
+
+def test_ring_only_moves_the_keys_of_a_new_node():
+    nodes = [SimpleNamespace(name=f"node-{index}:11211") for index in range(4)]
+    before = HashRing(nodes=nodes[:3])
+    after = HashRing(nodes=nodes)
+    for key in KEYS:
+        owner_before, owner_after = next(before.iter_nodes(key)), next(after.iter_nodes(key))
+        assert owner_after is owner_before or owner_after is nodes[3]
+
+
+def test_ring_yields_every_node_once():
+    nodes = [SimpleNamespace(name=f"node-{index}:11211") for index in range(3)]
+    ring = HashRing(nodes=nodes)
+    assert sorted(node.name for node in ring.iter_nodes(b"key")) == sorted(node.name for node in nodes)
+
+
+def test_keys_are_stored_on_their_owner():
+    async def scenario():
+        servers, client = await _cluster(3)
+        for key in KEYS[:100]:
+            await client.set(key, b"value")
+        for key in KEYS[:100]:
+            owner = _server_of(servers, client.node_for(key))
+            assert [server for server in servers if key in server.items] == [owner]
+        assert await client.multi_get(*KEYS[:100]) == (b"value",) * 100
+        await client.close()
+
+    run(scenario())
+
+
+# ======= Timeouts =======
+
+def test_timed_out_command_does_not_desync_the_connection():
+    async def scenario():
+        servers, client = await _cluster(1, op_timeout=0.1, pool_size=1)
+        await client.set(b"slow", b"41")
+        await client.set(b"other", b"6")
+        servers[0].delays[b"slow"] = 0.3
+
+        with pytest.raises(CacheUnavailableError):
+            await client.incr(b"slow")
+        await asyncio.sleep(0.3)
+
+        # The late reply of `slow` (42) must not be read as the reply of `other`
+        assert await client.incr(b"other") == 7
+        assert servers[0].items[b"slow"][0] == b"42"
+        await client.close()
+
+    run(scenario())
+
+
+def test_cancelled_command_does_not_desync_the_connection():
+    async def scenario():
+        servers, client = await _cluster(1, pool_size=1)
+        await client.set(b"slow", b"1")
+        await client.set(b"other", b"1")
+        servers[0].delays[b"slow"] = 0.3
+
+        task = asyncio.create_task(client.get(b"slow"))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+        assert await client.get(b"other") == b"1"
+        await client.close()
+
+    run(scenario())
+
+
+# ======= Ejection and backoff =======
+
+def test_failed_node_is_ejected_and_its_keys_fail_over(fast_ejection):
+    async def scenario():
+        servers, client = await _cluster(3)
+        key = KEYS[0]
+        owner = client.node_for(key)
+        await _server_of(servers, owner).stop()
+
+        # The failure that ejects the node is retried once on the next node of the ring
+        with pytest.raises(CacheUnavailableError):
+            await client.set(key, b"value")
+        assert await client.set(key, b"value")
+        assert not owner.available
+        fallback = client.node_for(key)
+        assert fallback is not owner
+        assert key in _server_of(servers, fallback).items
+        await client.close()
+
+    run(scenario())
+
+
+def test_ejection_backoff_doubles_while_the_node_stays_down(fast_ejection):
+    async def scenario():
+        servers, client = await _cluster(2)
+        key = KEYS[0]
+        owner = client.node_for(key)
+        await _server_of(servers, owner).stop()
+
+        for _ in range(2):
+            with pytest.raises(CacheUnavailableError):
+                await client._call(owner, "get", key)
+        assert owner.backoff == pytest.approx(0.4)
+
+        # Single retry once the backoff elapsed, failing again ejects it for twice as long
+        await asyncio.sleep(0.25)
+        assert owner.available
+        with pytest.raises(CacheUnavailableError):
+            await client._call(owner, "get", key)
+        assert not owner.available
+        assert owner.backoff == pytest.approx(0.8)
+        await client.close()
+
+    run(scenario())
+
+
+def test_node_back_from_an_ejection_is_flushed(fast_ejection):
+    async def scenario():
+        servers, client = await _cluster(2)
+        key = KEYS[0]
+        owner = client.node_for(key)
+        owner_server = _server_of(servers, owner)
+        await client.set(key, b"old")
+
+        # Down, the key is written again on the next node meanwhile
+        await owner_server.stop()
+        for _ in range(2):
+            with pytest.raises(CacheUnavailableError):
+                await client._call(owner, "get", key)
+        await client.set(key, b"new")
+
+        # Back with its old data, which must not be served again
+        await owner_server.start()
+        await asyncio.sleep(0.25)
+        assert client.node_for(key) is owner
+        assert await client.get(key) is None
+        assert owner.flushes == 1 and not owner.needs_flush
+        assert [command for command, _ in owner_server.commands].count("flush_all") == 1
+        await client.close()
+
+    run(scenario())
@@ -0,0 +1,114 @@
+"""
+Circuit breaker (`src/database/circuit_breaker.py`) guarding the sharded Memcached client
+"""
+
+import asyncio
+
+import aiomcache
+import pytest
+
+from src.database.cache_cluster import ShardedMemcachedClient, CacheUnavailableError
+from src.database.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+from tests.memcached_standin import MemcachedStandIn
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def _client(breaker: CircuitBreaker) -> ShardedMemcachedClient:
+    return ShardedMemcachedClient(servers=[("127.0.0.1", 11211)], breaker=breaker)
+
+
+def _half_open(half_open_calls: int = 1) -> CircuitBreaker:
+    breaker = CircuitBreaker(name="test", failure_threshold=1, reset_timeout=0, half_open_calls=half_open_calls)
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    return breaker
+
+
+async def _fail(exception: BaseException):
+    raise exception
+
+
+def test_circuit_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(name="test", failure_threshold=2, reset_timeout=60)
+    breaker.record_failure()
+    breaker.record_success()
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.is_open
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+
+
+def test_successful_probe_closes_the_circuit():
+    async def scenario():
+        breaker = _half_open()
+        client = _client(breaker)
+        assert await client._guarded(lambda: asyncio.sleep(0, result="ok")) == "ok"
+        assert breaker.state == CLOSED and breaker.probes_in_flight == 0
+
+    run(scenario())
+
+
+def test_failed_probe_reopens_the_circuit_and_frees_its_slot():
+    async def scenario():
+        breaker = _half_open()
+        client = _client(breaker)
+        with pytest.raises(CacheUnavailableError):
+            await client._guarded(lambda: _fail(CacheUnavailableError("down")))
+        assert breaker.state == OPEN and breaker.probes_in_flight == 0
+
+    run(scenario())
+
+
+def test_client_error_of_a_probe_only_frees_its_slot():
+    async def scenario():
+        breaker = _half_open()
+        client = _client(breaker)
+        with pytest.raises(ValueError):
+            await client._guarded(lambda: _fail(ValueError("bad reply")))
+        assert breaker.state == HALF_OPEN and breaker.probes_in_flight == 0
+
+    run(scenario())
+
+
+def test_invalid_keys_never_open_the_circuit():
+    async def scenario():
+        server = await MemcachedStandIn().start()
+        breaker = CircuitBreaker(name="test", failure_threshold=2, reset_timeout=60)
+        client = ShardedMemcachedClient(servers=[server.address], breaker=breaker)
+        await client.set(b"healthy", b"1")
+        # Rejected by aiomcache before anything is sent (too long, whitespace)
+        for key in (b"x" * 300, b"bad key", b"bad\nkey") * 2:
+            with pytest.raises(aiomcache.exceptions.ValidationException):
+                await client.get(key)
+        assert breaker.state == CLOSED and breaker.consecutive_failures == 0
+        assert await client.get(b"healthy") == b"1"
+        await client.close()
+        await server.stop()
+
+    run(scenario())
+
+
+def test_cancelled_probe_frees_its_slot():
+    async def scenario():
+        breaker = _half_open()
+        client = _client(breaker)
+        probe = asyncio.create_task(client._guarded(lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        assert breaker.state == HALF_OPEN and breaker.probes_in_flight == 1
+        with pytest.raises(CircuitOpenError):
+            breaker.before_call()
+
+        probe.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await probe
+        # No outcome, the next call probes again
+        assert breaker.state == HALF_OPEN and breaker.probes_in_flight == 0
+        assert await client._guarded(lambda: asyncio.sleep(0, result="ok")) == "ok"
+        assert breaker.state == CLOSED
+
+    run(scenario())
@@ -0,0 +1,54 @@
+"""
+Negotiated response compression (`src/utils/http/compression.py`)
+"""
+
+import asyncio
+
+import httpx
+from starlette.applications import Starlette
+from starlette.requests import Request
+from starlette.responses import JSONResponse, Response
+from starlette.routing import Route
+
+from src.utils.http import CompressionMiddleware
+
+
+ETAG = '"listing-v1"'
+
+
+def _listing(request: Request) -> Response:
+    if request.headers.get("if-none-match"):
+        return Response(status_code=304, headers={"ETag": ETAG})
+    size = int(request.query_params.get("size", 4096))
+    return JSONResponse({"data": "x" * size}, headers={"ETag": ETAG})
+
+
+def _get(path: str, headers: dict) -> httpx.Response:
+    app = CompressionMiddleware(Starlette(routes=[Route("/listing", _listing)]), allowed_paths=(r"/listing",), minimum_size=1024)
+
+    async def request():
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://test") as client:
+            return await client.get(path, headers=headers)
+
+    return asyncio.run(request())
+
+
+def test_large_body_is_compressed_with_a_weak_etag():
+    response = _get("/listing", {"Accept-Encoding": "gzip"})
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["etag"] == f"W/{ETAG}"
+    assert "Accept-Encoding" in response.headers["vary"]
+
+
+def test_etag_is_the_same_on_small_bodies_and_304s():
+    small = _get("/listing?size=10", {"Accept-Encoding": "gzip"})
+    not_modified = _get("/listing", {"Accept-Encoding": "gzip", "If-None-Match": f"W/{ETAG}"})
+    assert "content-encoding" not in small.headers
+    assert not_modified.status_code == 304
+    assert small.headers["etag"] == not_modified.headers["etag"] == f"W/{ETAG}"
+
+
+def test_etag_stays_strong_without_an_encoding():
+    response = _get("/listing", {"Accept-Encoding": "identity"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"] == ETAG
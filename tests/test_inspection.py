@@ -0,0 +1,35 @@
+"""
+Package archive inspection (`src/utils/packages/inspection.py`)
+"""
+
+import io
+import json
+import tarfile
+
+import pytest
+
+from src.utils.packages import InspectionLimits, PackageArchiveError, inspect_package_archive
+
+
+def _archive(tmp_path) -> str:
+    path = tmp_path / "package.tar.gz"
+    with tarfile.open(path, "w:gz") as archive:
+        for name, data in (("nikl.json", json.dumps({"name": "math", "version": "1.0.0"}).encode()), ("math.nk", b"x" * 1024)):
+            member = tarfile.TarInfo(name)
+            member.size = len(data)
+            archive.addfile(member, io.BytesIO(data))
+    return str(path)
+
+
+def test_archive_within_the_limits_is_described(tmp_path):
+    limits = InspectionLimits(max_entries=10, max_file_size=4096, max_unpacked_size=8192, max_seconds=60)
+    inspection = inspect_package_archive(_archive(tmp_path), limits)
+    assert inspection["manifest"]["name"] == "math"
+    assert [file["path"] for file in inspection["files"]] == ["nikl.json", "math.nk"]
+
+
+def test_inspection_stops_at_its_deadline(tmp_path):
+    # The pool process must not keep inspecting once the request gave up
+    limits = InspectionLimits(max_entries=10, max_file_size=4096, max_unpacked_size=8192, max_seconds=-1)
+    with pytest.raises(PackageArchiveError, match="longer than"):
+        inspect_package_archive(_archive(tmp_path), limits)
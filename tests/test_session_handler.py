@@ -0,0 +1,66 @@
+"""
+Session lookups (`src/database/session_handler.py`)
+"""
+
+import asyncio
+import uuid
+
+import pytest
+
+from src.database import session_handler
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+class _UnreachableCache:
+    """Fails the test on any call, the lookup must not reach Memcached"""
+    def __getattr__(self, name):
+        raise AssertionError(f"Memcached {name} called")
+
+
+@pytest.mark.parametrize("session_cookie", ["x" * 300, "bad cookie", "bad\nkey", str(uuid.uuid4()).upper(), "{" + str(uuid.uuid4()) + "}"])
+def test_invalid_session_cookie_is_no_session(monkeypatch, session_cookie):
+    monkeypatch.setattr(session_handler, "SESSION_MODE", "cache")
+
+    async def scenario():
+        assert await session_handler.get_user_session(cache_session=_UnreachableCache(), session_cookie=session_cookie) is None
+
+    run(scenario())
+
+
+class _EvictingCache:
+    """The generation counter exists when it is added, and is evicted before it is read back"""
+    def __init__(self, evictions: int):
+        self.evictions = evictions
+        self.items = {}
+
+    async def get(self, key):
+        return self.items.get(key)
+
+    async def add(self, key, value, exptime=0):
+        if self.evictions:
+            self.evictions -= 1
+            return False
+        self.items[key] = value
+        return True
+
+    async def touch(self, key, exptime):
+        return key in self.items
+
+
+def test_generation_evicted_between_add_and_get_is_created_again():
+    async def scenario():
+        generation = await session_handler._get_or_create_generation(cache_session=_EvictingCache(evictions=2), user_id="user")
+        assert isinstance(generation, int)
+
+    run(scenario())
+
+
+def test_generation_that_keeps_being_evicted_is_a_cache_error():
+    async def scenario():
+        with pytest.raises(session_handler.CacheContentionError):
+            await session_handler._get_or_create_generation(cache_session=_EvictingCache(evictions=100), user_id="user")
+
+    run(scenario())